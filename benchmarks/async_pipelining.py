@@ -0,0 +1,63 @@
+"""
+Produce throughput of `AsyncNioFluxMQClient` over a single connection against the number of concurrent producers,
+whose requests are pipelined, next to the blocking `NioFluxMQClient` which waits for every response.
+
+    python benchmarks/async_pipelining.py --concurrency 1 8 64 256 --messages 20000
+"""
+import argparse
+import asyncio
+import logging
+import threading
+import time
+
+from nioflux.util.transport_layer import random_port
+
+from nioflux_mq.client import NioFluxMQClient, AsyncNioFluxMQClient
+from nioflux_mq.server import NioFluxMQServer
+
+
+def run_blocking(server: NioFluxMQServer, messages: int, size: int) -> float:
+    with NioFluxMQClient(host=server.host, port=server.port, pool_size=1) as client:
+        client.register_topic('topic_blocking')
+        payload = b'x' * size
+        started_at = time.perf_counter()
+        for _ in range(messages):
+            client.produce(payload, 'topic_blocking')
+        return messages / (time.perf_counter() - started_at)
+
+
+async def run_async(server: NioFluxMQServer, concurrency: int, messages: int, size: int) -> float:
+    topic = f'topic_{concurrency}'
+    async with AsyncNioFluxMQClient(host=server.host, port=server.port, max_in_flight=concurrency) as client:
+        await client.register_topic(topic)
+        payload = b'x' * size
+
+        async def producer(n: int):
+            for _ in range(n):
+                assert (await client.produce(payload, topic)).success
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*[producer(messages // concurrency) for _ in range(concurrency)])
+        return messages // concurrency * concurrency / (time.perf_counter() - started_at)
+
+
+if __name__ == '__main__':
+    logging.getLogger('nioflux').setLevel(logging.WARNING)
+    logging.getLogger('nioflux.server').setLevel(logging.WARNING)
+    logging.getLogger('nioflux.pipeline').setLevel(logging.WARNING)
+    logging.getLogger('nioflux.mq').setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 64, 256])
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--size', type=int, default=128, help='payload size in bytes')
+    args = parser.parse_args()
+    server = NioFluxMQServer(host='127.0.0.1', port=random_port())
+    threading.Thread(target=server.run, daemon=True).start()
+    time.sleep(.5)
+    try:
+        print(f'client=blocking concurrency=1   messages/s={run_blocking(server, args.messages, args.size):>10.1f}')
+        for concurrency in args.concurrency:
+            throughput = asyncio.run(run_async(server, concurrency, args.messages, args.size))
+            print(f'client=async    concurrency={concurrency:<3d} messages/s={throughput:>10.1f}')
+    finally:
+        server.close()
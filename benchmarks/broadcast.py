@@ -0,0 +1,55 @@
+"""
+Broadcast cost against the number of topics, in process: broadcasts are appended once to a shared log,
+so their produce latency stays flat however many topics there are, while consuming them from one topic
+merges them with its own messages.
+
+    python benchmarks/broadcast.py --topics 1 100 1000 10000 --broadcasts 10000
+"""
+import argparse
+import logging
+import time
+
+from nioflux_mq.mq import MessageQueue
+
+
+def percentile(latencies: list[float], q: float) -> float:
+    latencies = sorted(latencies)
+    return latencies[min(int(len(latencies) * q), len(latencies) - 1)]
+
+
+def run(topics: int, broadcasts: int, size: int) -> tuple[float, float, float]:
+    mq = MessageQueue(gc_interval=1 << 30)
+    try:
+        for t in range(topics):
+            mq.register_topic(f'topic_{t}')
+        mq.register_consumer('consumer')
+        payload = b'x' * size
+        latencies = []
+        started_at = time.perf_counter()
+        for i in range(broadcasts):
+            called_at = time.perf_counter()
+            mq.produce(payload)
+            latencies.append(time.perf_counter() - called_at)
+            # interleaved with the topic's own messages, so that consume merges both
+            mq.produce(payload, 'topic_0')
+        produced_at = time.perf_counter()
+        while len(mq.consume_batch('consumer', 'topic_0', n=100, advance=True)) > 0:
+            pass
+        consumed_at = time.perf_counter()
+        return (broadcasts / (produced_at - started_at), percentile(latencies, .99),
+                2 * broadcasts / (consumed_at - produced_at))
+    finally:
+        mq.close()
+
+
+if __name__ == '__main__':
+    logging.getLogger('nioflux.mq').setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--topics', type=int, nargs='+', default=[1, 100, 1000, 10000])
+    parser.add_argument('--broadcasts', type=int, default=10000)
+    parser.add_argument('--size', type=int, default=128, help='payload size in bytes')
+    args = parser.parse_args()
+    for topics in args.topics:
+        throughput, p99, consume_throughput = run(topics, args.broadcasts, args.size)
+        print(f'topics={topics:<6d} broadcast+produce pairs/s={throughput:>10.1f} '
+              f'broadcast p99={p99 * 1e6:>8.1f}us consume msg/s={consume_throughput:>10.1f}')
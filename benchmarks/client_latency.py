@@ -0,0 +1,70 @@
+"""
+Per-request latency of NioFluxMQClient over pooled persistent connections,
+against one TCP connection per request (`nioflux.util.tcp_send`, the client's previous transport).
+
+    python benchmarks/client_latency.py --requests 2000
+"""
+import argparse
+import json
+import logging
+import statistics
+import threading
+import time
+
+from nioflux.util import tcp_send
+from nioflux.util.transport_layer import random_port
+
+from nioflux_mq.client import NioFluxMQClient
+from nioflux_mq.server import NioFluxMQServer
+
+
+def serve() -> NioFluxMQServer:
+    server = NioFluxMQServer(host='127.0.0.1', port=random_port())
+    threading.Thread(target=server.run, daemon=True).start()
+    time.sleep(.5)
+    return server
+
+
+def report(label: str, latencies: list[float]):
+    latencies = sorted(latencies)
+    p = lambda q: latencies[min(int(len(latencies) * q), len(latencies) - 1)] * 1e6
+    print(f'{label:<12s} mean={statistics.fmean(latencies) * 1e6:>9.1f}us '
+          f'p50={p(.5):>9.1f}us p99={p(.99):>9.1f}us')
+
+
+def one_shot(server: NioFluxMQServer, n: int) -> list[float]:
+    latencies = []
+    for i in range(n):
+        request = json.dumps({'instruction': 'produce',
+                              'payload': {'message': f'message_{i}', 'topic': 'topic_0', 'ttl': -1.}})
+        started_at = time.perf_counter()
+        tcp_send(request.encode('utf-8') + server.eot, host=server.host, port=server.port, wait=True)
+        latencies.append(time.perf_counter() - started_at)
+    return latencies
+
+
+def pooled(client: NioFluxMQClient, n: int) -> list[float]:
+    latencies = []
+    for i in range(n):
+        started_at = time.perf_counter()
+        client.produce(f'message_{i}'.encode('utf-8'), 'topic_0')
+        latencies.append(time.perf_counter() - started_at)
+    return latencies
+
+
+if __name__ == '__main__':
+    logging.getLogger('nioflux').setLevel(logging.WARNING)
+    logging.getLogger('nioflux.server').setLevel(logging.WARNING)
+    logging.getLogger('nioflux.pipeline').setLevel(logging.WARNING)
+    logging.getLogger('nioflux.mq').setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+    server = serve()
+    try:
+        with NioFluxMQClient(host=server.host, port=server.port, pool_size=1) as client:
+            client.register_topic('topic_0')
+            report('one-shot', one_shot(server, args.requests))
+            report('pooled', pooled(client, args.requests))
+    finally:
+        server.close()
@@ -0,0 +1,68 @@
+"""
+Compare two JSON reports of `microbench.py` or `loadgen.py`, typically of two versions, run after run.
+A result regresses when its throughput drops, or its p99 latency grows, by more than `--threshold`.
+Exits with status 1 if any result regresses.
+
+    python benchmarks/compare.py before.json after.json --threshold 0.1
+"""
+import argparse
+import json
+import sys
+
+
+def measurements(result: dict) -> dict[str, dict]:
+    # microbench results are measured themselves, loadgen results hold a produce and a consume measurement
+    if 'throughput' in result:
+        return {'': result}
+    return {name: measurement for name, measurement in result.items()
+            if isinstance(measurement, dict) and 'throughput' in measurement}
+
+
+def key_of(result: dict) -> tuple:
+    return tuple(sorted((name, value) for name, value in result.items()
+                        if not isinstance(value, dict) and name not in ('ops', 'requests', 'messages', 'throughput')))
+
+
+def compare(before: dict, after: dict, threshold: float) -> list[tuple[str, str, float, float, bool]]:
+    """
+    :return: `(result, metric, before, after, regressed)` of every measurement present in both reports.
+    """
+    before_results = {key_of(result): result for result in before['results']}
+    rows = []
+    for result in after['results']:
+        previous = before_results.get(key_of(result))
+        if previous is None:
+            continue
+        label = ' '.join(f'{name}={value}' for name, value in key_of(result))
+        previous_measurements = measurements(previous)
+        for name, measurement in measurements(result).items():
+            if name not in previous_measurements or measurement['latency'] is None:
+                continue
+            _label = f'{label} {name}'.strip()
+            old, new = previous_measurements[name]['throughput'], measurement['throughput']
+            rows.append((_label, 'throughput', old, new, new < old * (1 - threshold)))
+            if previous_measurements[name]['latency'] is not None:
+                old, new = previous_measurements[name]['latency']['p99'], measurement['latency']['p99']
+                rows.append((_label, 'p99', old, new, new > old * (1 + threshold)))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('before', type=str)
+    parser.add_argument('after', type=str)
+    parser.add_argument('--threshold', type=float, default=.1, help='relative change tolerated')
+    args = parser.parse_args()
+    with open(args.before, encoding='utf-8') as f:
+        _before = json.load(f)
+    with open(args.after, encoding='utf-8') as f:
+        _after = json.load(f)
+    print(f'before: {_before["environment"]["commit"]}, after: {_after["environment"]["commit"]}')
+    regressions = 0
+    for label, metric, old, new, regressed in compare(_before, _after, args.threshold):
+        change = (new - old) / old * 100 if old > 0 else .0
+        regressions += regressed
+        print(f'{"REGRESSED" if regressed else "":<10s}{label:<72s} {metric:<10s} '
+              f'{old:>14.6g} -> {new:>14.6g} ({change:+.1f}%)')
+    print(f'{regressions} regressions.')
+    sys.exit(1 if regressions > 0 else 0)
@@ -0,0 +1,76 @@
+"""
+Compressed topics against plain ones, in process: JSON event payloads are produced in batches to a topic
+of each compression, reporting the memory they hold, the size of a snapshot, the bytes of a binary codec
+response carrying them, and produce and consume throughput.
+
+    python benchmarks/compression.py --messages 100000 --batch-size 100
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from nioflux_mq.codec import BinaryCodec
+from nioflux_mq.mq import MessageQueue
+from nioflux_mq.mq.compression import compressions
+
+
+def events(n: int) -> list[bytes]:
+    _random = random.Random(0)
+    pages, kinds = [f'/shop/category/{i}' for i in range(20)], ('view', 'click', 'add_to_cart', 'purchase')
+    return [json.dumps({'event': _random.choice(kinds), 'user_id': _random.randrange(100000),
+                        'page': _random.choice(pages), 'session': f'{_random.getrandbits(64):016x}',
+                        'timestamp': 1700000000 + i}).encode() for i in range(n)]
+
+
+def run(compression: str | None, messages: int, batch_size: int) -> dict:
+    mq = MessageQueue(gc_interval=1 << 30)
+    try:
+        mq.register_topic('events', compression=compression)
+        mq.register_consumer('consumer')
+        # payloads are allocated while traced and dropped once produced, so that what is left is what the topic holds
+        tracemalloc.start()
+        payloads = events(messages)
+        started_at = time.perf_counter()
+        for i in range(0, len(payloads), batch_size):
+            mq.produce_batch(payloads[i:i + batch_size], 'events')
+        produced_at = time.perf_counter()
+        del payloads
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        # what a binary pipeline sends, compressed as stored
+        response = len(BinaryCodec().encode({'info': mq.consume_batch('consumer', 'events', n=batch_size,
+                                                                      decompress=False)}))
+        consume_started_at = time.perf_counter()
+        while len(mq.consume_batch('consumer', 'events', n=batch_size, advance=True)) > 0:
+            pass
+        consumed_at = time.perf_counter()
+        with tempfile.TemporaryDirectory() as _dir:
+            path = os.path.join(_dir, 'snapshot')
+            mq.save(path)
+            snapshot = os.path.getsize(path)
+        return {'memory': memory, 'snapshot': snapshot, 'response': response,
+                'produce': messages / (produced_at - started_at),
+                'consume': messages / (consumed_at - consume_started_at)}
+    finally:
+        mq.close()
+
+
+if __name__ == '__main__':
+    logging.getLogger('nioflux.mq').setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--compressions', type=str, nargs='+', choices=['none', *compressions()],
+                        default=['none', *compressions()])
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=100, help='messages per produce and consume call')
+    args = parser.parse_args()
+    print(f'{sum(len(payload) for payload in events(args.messages))} payload bytes')
+    for name in args.compressions:
+        result = run(None if name == 'none' else name, args.messages, args.batch_size)
+        print(f'{name:<5s} memory={result["memory"]:>11d}B snapshot={result["snapshot"]:>11d}B '
+              f'response={result["response"]:>7d}B produce msg/s={result["produce"]:>10.1f} '
+              f'consume msg/s={result["consume"]:>10.1f}')
@@ -0,0 +1,71 @@
+"""
+Consumption throughput of a consumer group against the number of its members, on a partitioned topic.
+Every member polls batches off its own partitions and spends `--work` seconds per message, like a worker would.
+
+    python benchmarks/consumer_groups.py --partitions 8 --workers 1 2 4 8 --messages 4000 --work 0.0005
+"""
+import argparse
+import logging
+import threading
+import time
+
+from nioflux.util.transport_layer import random_port
+
+from nioflux_mq.client import NioFluxMQClient
+from nioflux_mq.server import NioFluxMQServer
+
+
+def run(server: NioFluxMQServer, partitions: int, workers: int, messages: int, batch_size: int,
+        work: float) -> float:
+    topic, group = f'topic_{workers}', f'group_{workers}'
+    with NioFluxMQClient(host=server.host, port=server.port, pool_size=1) as client:
+        client.register_topic(topic, partitions=partitions)
+        for i in range(0, messages, 1000):
+            client.produce_batch([b'x' * 128] * min(1000, messages - i), topic)
+        for i in range(workers):
+            client.register_consumer(f'{group}_worker_{i}', group=group, topic=topic)
+    consumed = []
+
+    def worker(i: int):
+        n = 0
+        with NioFluxMQClient(host=server.host, port=server.port, pool_size=1) as _client:
+            while True:
+                batch = _client.consume_batch(f'{group}_worker_{i}', topic, n=batch_size, advance=True).data
+                if len(batch) < 1:
+                    break
+                time.sleep(work * len(batch))
+                n += len(batch)
+        consumed.append(n)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    started_at = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started_at
+    assert sum(consumed) == messages, f'{sum(consumed)} of {messages} messages consumed'
+    return messages / duration
+
+
+if __name__ == '__main__':
+    logging.getLogger('nioflux').setLevel(logging.WARNING)
+    logging.getLogger('nioflux.server').setLevel(logging.WARNING)
+    logging.getLogger('nioflux.pipeline').setLevel(logging.WARNING)
+    logging.getLogger('nioflux.mq').setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--partitions', type=int, default=8)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--messages', type=int, default=4000)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--work', type=float, default=.0005, help='seconds of work per message')
+    args = parser.parse_args()
+    server = NioFluxMQServer(host='127.0.0.1', port=random_port())
+    threading.Thread(target=server.run, daemon=True).start()
+    time.sleep(.5)
+    try:
+        for workers in args.workers:
+            throughput = run(server, args.partitions, workers, args.messages, args.batch_size, args.work)
+            print(f'workers={workers:<3d} partitions={args.partitions:<3d} messages/s={throughput:>10.1f}')
+    finally:
+        server.close()
@@ -0,0 +1,65 @@
+"""
+Selective consumption, in process: a consumer wants the messages of one header value out of many,
+and either reads every message and drops the others itself, or has the queue find them through the index
+of the topic. Reports the time taken and the bytes of the binary codec responses each way.
+
+    python benchmarks/filtered.py --messages 100000 --selectivity 0.01 0.1 0.5
+"""
+import argparse
+import logging
+import time
+
+from nioflux_mq.codec import BinaryCodec
+from nioflux_mq.mq import MessageQueue
+
+
+def run(messages: int, selectivity: float, batch_size: int, size: int) -> tuple[tuple[float, int], tuple[float, int]]:
+    mq = MessageQueue(gc_interval=1 << 30)
+    codec = BinaryCodec()
+    try:
+        mq.register_topic('events')
+        mq.register_consumer('client_side')
+        mq.register_consumer('server_side')
+        every = max(int(1 / selectivity), 1)
+        payload = b'x' * size
+        for i in range(0, messages, 1000):
+            mq.produce_batch([payload] * 1000, 'events',
+                             headers=[{'region': 'eu' if (i + j) % every == 0 else 'us'} for j in range(1000)])
+        wanted, transferred = 0, 0
+        started_at = time.perf_counter()
+        while True:
+            batch = mq.consume_batch('client_side', 'events', n=batch_size, advance=True)
+            if len(batch) < 1:
+                break
+            transferred += len(codec.encode({'info': batch}))
+            wanted += sum(1 for message in batch if message.headers['region'] == 'eu')
+        client_side = (time.perf_counter() - started_at, transferred)
+        found, transferred = 0, 0
+        started_at = time.perf_counter()
+        while True:
+            batch = mq.consume_batch('server_side', 'events', n=batch_size, advance=True, headers={'region': 'eu'})
+            if len(batch) < 1:
+                break
+            transferred += len(codec.encode({'info': batch}))
+            found += len(batch)
+        server_side = (time.perf_counter() - started_at, transferred)
+        assert found == wanted, f'{found} messages found, {wanted} wanted'
+        return client_side, server_side
+    finally:
+        mq.close()
+
+
+if __name__ == '__main__':
+    logging.getLogger('nioflux.mq').setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--selectivity', type=float, nargs='+', default=[.001, .01, .1, .5],
+                        help='share of the messages the consumer wants')
+    parser.add_argument('--batch-size', type=int, default=100, help='messages per consume call')
+    parser.add_argument('--size', type=int, default=128, help='payload size in bytes')
+    args = parser.parse_args()
+    for selectivity in args.selectivity:
+        (client_time, client_bytes), (server_time, server_bytes) = run(args.messages, selectivity, args.batch_size,
+                                                                       args.size)
+        print(f'selectivity={selectivity:<6g} client-side {client_time * 1e3:>9.1f}ms {client_bytes:>11d}B   '
+              f'server-side {server_time * 1e3:>9.1f}ms {server_bytes:>11d}B')
@@ -0,0 +1,163 @@
+"""
+End-to-end load generator: producer and consumer threads drive `NioFluxMQServer` through `NioFluxMQClient`.
+Consumers share a topic of one partition per consumer as a consumer group, so every message is consumed once.
+Runs once per payload size, results are written as JSON, throughput in messages per second and latency
+percentiles of the requests in seconds, to compare across versions with `benchmarks/compare.py`.
+The server runs in process unless `--port` points at a running one.
+
+    python benchmarks/loadgen.py --producers 4 --consumers 4 --requests 2000 --sizes 64 1024 16384 --output before.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+
+from nioflux.util.transport_layer import random_port
+
+from nioflux_mq.client import NioFluxMQClient
+from nioflux_mq.codec import JsonCodec, BinaryCodec
+from nioflux_mq.mq.topic_executor import EXECUTIONS, EXECUTION_INLINE
+from nioflux_mq.server import NioFluxMQServer
+
+CODECS = {'json': JsonCodec, 'binary': BinaryCodec}
+
+
+def summary(latencies: list[float], messages: int, duration: float) -> dict:
+    latencies = sorted(latencies)
+    if len(latencies) < 1:
+        return {'requests': 0, 'messages': messages, 'throughput': .0, 'latency': None}
+    p = lambda q: latencies[min(int(len(latencies) * q), len(latencies) - 1)]
+    return {
+        'requests': len(latencies),
+        'messages': messages,
+        'throughput': messages / duration if duration > 0 else .0,
+        'latency': {'mean': sum(latencies) / len(latencies), 'p50': p(.5), 'p90': p(.9), 'p99': p(.99),
+                    'p999': p(.999), 'max': latencies[-1]}
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'time': time.time()}
+
+
+def run(host: str, port: int, codec: str, size: int, producers: int, consumers: int, requests: int,
+        batch_size: int, timeout: float) -> dict:
+    topic, group = f'topic_{size}_{time.time_ns()}', f'group_{size}_{time.time_ns()}'
+    connect = lambda: NioFluxMQClient(host=host, port=port, pool_size=1, codec=CODECS[codec]())
+    with connect() as client:
+        client.register_topic(topic, partitions=max(consumers, 1))
+        for i in range(consumers):
+            client.register_consumer(f'{group}_{i}', group=group, topic=topic)
+    expected = producers * requests * batch_size
+    produce_latencies, consume_latencies = [[] for _ in range(producers)], [[] for _ in range(consumers)]
+    consumed, lock = [0], threading.Lock()
+    barrier = threading.Barrier(producers + consumers + 1)
+
+    def producer(i: int):
+        # text, which both codecs carry
+        batch, latencies = [b'x' * size] * batch_size, produce_latencies[i]
+        with connect() as _client:
+            barrier.wait()
+            for _ in range(requests):
+                called_at = time.perf_counter()
+                if batch_size == 1:
+                    _client.produce(batch[0], topic)
+                else:
+                    _client.produce_batch(batch, topic)
+                latencies.append(time.perf_counter() - called_at)
+
+    def consumer(i: int):
+        latencies = consume_latencies[i]
+        with connect() as _client:
+            barrier.wait()
+            while consumed[0] < expected:
+                called_at = time.perf_counter()
+                messages = _client.consume_batch(f'{group}_{i}', topic, n=batch_size, advance=True,
+                                                 timeout=timeout).data
+                latencies.append(time.perf_counter() - called_at)
+                if len(messages) < 1 and not any(thread.is_alive() for thread in producer_threads):
+                    # the partitions of this consumer are drained
+                    break
+                with lock:
+                    consumed[0] += len(messages)
+
+    producer_threads = [threading.Thread(target=producer, args=(i,)) for i in range(producers)]
+    consumer_threads = [threading.Thread(target=consumer, args=(i,)) for i in range(consumers)]
+    for thread in (*producer_threads, *consumer_threads):
+        thread.start()
+    barrier.wait()
+    started_at = time.perf_counter()
+    for thread in producer_threads:
+        thread.join()
+    produced_at = time.perf_counter()
+    for thread in consumer_threads:
+        thread.join()
+    consumed_at = time.perf_counter()
+    with connect() as client:
+        client.unregister_topic(topic)
+    return {
+        'size': size,
+        'producers': producers,
+        'consumers': consumers,
+        'batch_size': batch_size,
+        'produce': summary([latency for latencies in produce_latencies for latency in latencies],
+                           expected, produced_at - started_at),
+        'consume': summary([latency for latencies in consume_latencies for latency in latencies],
+                           consumed[0], consumed_at - started_at)
+    }
+
+
+if __name__ == '__main__':
+    logging.getLogger('nioflux').setLevel(logging.WARNING)
+    logging.getLogger('nioflux.server').setLevel(logging.WARNING)
+    logging.getLogger('nioflux.pipeline').setLevel(logging.WARNING)
+    logging.getLogger('nioflux.mq').setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None, help='port of a running server, one is started if not given')
+    parser.add_argument('--execution', type=str, choices=EXECUTIONS, default=EXECUTION_INLINE,
+                        help='execution of the server started in process')
+    parser.add_argument('--codec', type=str, choices=list(CODECS.keys()), default='json')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[64, 1024, 16384], help='payload sizes in bytes')
+    parser.add_argument('--producers', type=int, default=4)
+    parser.add_argument('--consumers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=2000, help='requests per producer')
+    parser.add_argument('--batch-size', type=int, default=1, help='messages per produce and consume request')
+    parser.add_argument('--timeout', type=float, default=.1, help='long poll timeout of consumers')
+    parser.add_argument('--output', type=str, default=None, help='JSON file to write, stdout by default')
+    args = parser.parse_args()
+    server = None
+    if args.port is None:
+        server = NioFluxMQServer(host=args.host, port=random_port(), execution=args.execution)
+        threading.Thread(target=server.run, daemon=True).start()
+        time.sleep(.5)
+    try:
+        results = []
+        for size in args.sizes:
+            result = run(args.host, server.port if server is not None else args.port, args.codec, size,
+                         args.producers, args.consumers, args.requests, args.batch_size, args.timeout)
+            results.append(result)
+            print(f'size={size:<6d} produce msg/s={result["produce"]["throughput"]:>10.1f} '
+                  f'p99={result["produce"]["latency"]["p99"] * 1e3:>8.3f}ms '
+                  f'consume msg/s={result["consume"]["throughput"]:>10.1f} '
+                  f'p99={result["consume"]["latency"]["p99"] * 1e3:>8.3f}ms', file=sys.stderr)
+    finally:
+        if server is not None:
+            server.close()
+    report = {'suite': 'loadgen', 'environment': environment(), 'parameters': vars(args), 'results': results}
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
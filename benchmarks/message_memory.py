@@ -0,0 +1,68 @@
+"""
+Memory held per million messages stored in a topic, excluding payloads (every message shares one),
+against a list of `Message` objects and against the dict-backed dataclass with uuid4 hex ids
+messages used to be stored as.
+
+    python benchmarks/message_memory.py --messages 1000000
+"""
+import argparse
+import gc
+import logging
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass
+
+from nioflux_mq.mq.message import Message
+from nioflux_mq.mq.topic_log import TopicLog
+
+
+@dataclass
+class LegacyMessage:
+    id: str
+    payload: bytes
+    timestamp: float
+    ttl: float
+    timeout: bool = False
+
+
+def measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = build()
+        gc.collect()
+        held = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del kept
+    return held
+
+
+if __name__ == '__main__':
+    logging.getLogger('nioflux.mq').setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=1000000)
+    parser.add_argument('--segment-size', type=int, default=1024)
+    args = parser.parse_args()
+    payload = b'x' * 16
+    n = args.messages
+
+    def legacy():
+        return [LegacyMessage(id=uuid.uuid4().hex, payload=payload, timestamp=time.perf_counter(), ttl=-1.)
+                for _ in range(n)]
+
+    def objects():
+        return [Message.build(payload, -1.) for _ in range(n)]
+
+    def topic_log():
+        log = TopicLog(segment_size=args.segment_size)
+        for _ in range(n):
+            log.append(Message.build(payload, -1.))
+        return log
+
+    for name, build in (('legacy dataclass', legacy), ('slotted objects', objects), ('topic log', topic_log)):
+        held = measure(build)
+        print(f'{name:<18s} {held / n * 1e6 / (1 << 20):>9.1f} MiB per million messages '
+              f'{held / n:>7.1f} B per message')
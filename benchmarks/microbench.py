@@ -0,0 +1,147 @@
+"""
+In-process `MessageQueue` microbenchmarks of produce, consume, advance, gc, save and load,
+over every combination of topic count, consumer count and backlog size (messages retained, spread over the topics).
+Results are written as JSON, throughput in operations per second and latency percentiles in seconds,
+to compare across versions with `benchmarks/compare.py`.
+
+    python benchmarks/microbench.py --topics 1 16 --consumers 1 16 --backlog 0 100000 --output before.json
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from nioflux_mq.mq import MessageQueue
+
+BENCHMARKS = ('produce', 'consume', 'advance', 'gc', 'save', 'load')
+
+
+def summary(latencies: list[float], duration: float) -> dict:
+    latencies = sorted(latencies)
+    p = lambda q: latencies[min(int(len(latencies) * q), len(latencies) - 1)]
+    return {
+        'ops': len(latencies),
+        'throughput': len(latencies) / duration if duration > 0 else .0,
+        'latency': {'mean': sum(latencies) / len(latencies), 'p50': p(.5), 'p90': p(.9), 'p99': p(.99),
+                    'p999': p(.999), 'max': latencies[-1]}
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'time': time.time()}
+
+
+def build(topics: int, consumers: int, backlog: int, size: int, ttl: float = -1.) -> MessageQueue:
+    # no background gc, collect is measured on its own
+    mq = MessageQueue(gc_interval=1 << 30)
+    payload = b'x' * size
+    for t in range(topics):
+        mq.register_topic(f'topic_{t}')
+        per_topic = backlog // topics + (1 if t < backlog % topics else 0)
+        for i in range(0, per_topic, 10000):
+            mq.produce_batch([payload] * min(10000, per_topic - i), f'topic_{t}', ttl=ttl)
+    for c in range(consumers):
+        mq.register_consumer(f'consumer_{c}')
+    return mq
+
+
+def timed(fn, calls: list[tuple]) -> dict:
+    latencies = []
+    started_at = time.perf_counter()
+    for args in calls:
+        called_at = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - called_at)
+    return summary(latencies, time.perf_counter() - started_at)
+
+
+def bench_calls(name: str, topics: int, consumers: int, backlog: int, ops: int, size: int) -> dict:
+    mq = build(topics, consumers, backlog, size)
+    try:
+        payload = b'x' * size
+        pairs = [(f'consumer_{i % consumers}', f'topic_{i % topics}') for i in range(ops)]
+        match name:
+            case 'produce':
+                return timed(mq.produce, [(payload, f'topic_{i % topics}') for i in range(ops)])
+            case 'consume':
+                return timed(mq.consume, pairs)
+            case 'advance':
+                return timed(mq.advance, pairs)
+    finally:
+        mq.close()
+
+
+def bench_gc(topics: int, consumers: int, backlog: int, repeat: int, size: int) -> dict:
+    # every message of the backlog is due, a cycle expires all of them and drops their segments
+    latencies = []
+    for _ in range(repeat):
+        mq = build(topics, consumers, backlog, size, ttl=.0)
+        try:
+            called_at = time.perf_counter()
+            mq.collect()
+            latencies.append(time.perf_counter() - called_at)
+        finally:
+            mq.close()
+    return summary(latencies, sum(latencies))
+
+
+def bench_snapshot(name: str, topics: int, consumers: int, backlog: int, repeat: int, size: int) -> dict:
+    mq = build(topics, consumers, backlog, size)
+    try:
+        with tempfile.TemporaryDirectory() as _dir:
+            path = os.path.join(_dir, 'snapshot')
+            mq.save(path)
+            fn = mq.save if name == 'save' else mq.load
+            return timed(fn, [(path,)] * repeat)
+    finally:
+        mq.close()
+
+
+def run(name: str, topics: int, consumers: int, backlog: int, ops: int, repeat: int, size: int) -> dict:
+    if name == 'gc':
+        result = bench_gc(topics, consumers, backlog, repeat, size)
+    elif name in ('save', 'load'):
+        result = bench_snapshot(name, topics, consumers, backlog, repeat, size)
+    else:
+        result = bench_calls(name, topics, consumers, backlog, ops, size)
+    return {'benchmark': name, 'topics': topics, 'consumers': consumers, 'backlog': backlog, **result}
+
+
+if __name__ == '__main__':
+    logging.getLogger('nioflux.mq').setLevel(logging.WARNING)
+    logging.getLogger('nioflux.mq.gc').setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--benchmarks', type=str, nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument('--topics', type=int, nargs='+', default=[1, 16])
+    parser.add_argument('--consumers', type=int, nargs='+', default=[1, 16])
+    parser.add_argument('--backlog', type=int, nargs='+', default=[0, 100000])
+    parser.add_argument('--ops', type=int, default=20000, help='calls per produce, consume and advance run')
+    parser.add_argument('--repeat', type=int, default=5, help='calls per gc, save and load run')
+    parser.add_argument('--size', type=int, default=128, help='payload size in bytes')
+    parser.add_argument('--output', type=str, default=None, help='JSON file to write, stdout by default')
+    args = parser.parse_args()
+    results = []
+    for name, topics, consumers, backlog in itertools.product(args.benchmarks, args.topics, args.consumers,
+                                                              args.backlog):
+        result = run(name, topics, consumers, backlog, args.ops, args.repeat, args.size)
+        results.append(result)
+        print(f'{name:<8s} topics={topics:<4d} consumers={consumers:<4d} backlog={backlog:<8d} '
+              f'ops/s={result["throughput"]:>12.1f} p99={result["latency"]["p99"] * 1e6:>10.1f}us', file=sys.stderr)
+    report = {'suite': 'microbench', 'environment': environment(), 'parameters': vars(args), 'results': results}
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
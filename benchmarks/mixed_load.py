@@ -0,0 +1,86 @@
+"""
+Produce latency percentiles while snapshots of a large backlog are taken back to back,
+with the message queue called on the event loop (`inline`) and on worker threads (`thread`).
+
+    python benchmarks/mixed_load.py --producers 8 --requests 2000 --backlog 500000
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from nioflux.util.transport_layer import random_port
+
+from nioflux_mq.client import NioFluxMQClient
+from nioflux_mq.mq.topic_executor import EXECUTIONS
+from nioflux_mq.server import NioFluxMQServer
+
+
+def percentiles(latencies: list[float]) -> str:
+    latencies = sorted(latencies)
+    p = lambda q: latencies[min(int(len(latencies) * q), len(latencies) - 1)] * 1e3
+    return (f'mean={statistics.fmean(latencies) * 1e3:>8.3f}ms p50={p(.5):>8.3f}ms p99={p(.99):>8.3f}ms '
+            f'p999={p(.999):>8.3f}ms max={latencies[-1] * 1e3:>8.3f}ms')
+
+
+def run(execution: str, producers: int, requests: int, backlog: int, topics: int, workers: int):
+    server = NioFluxMQServer(host='127.0.0.1', port=random_port(), execution=execution, workers=workers)
+    threading.Thread(target=server.run, daemon=True).start()
+    time.sleep(.5)
+    try:
+        with NioFluxMQClient(host=server.host, port=server.port, pool_size=producers + 1) as client:
+            for i in range(topics):
+                client.register_topic(f'topic_{i}')
+            for i in range(topics):
+                for _ in range(0, backlog // topics, 1000):
+                    client.produce_batch([b'x' * 128] * 1000, f'topic_{i}')
+            latencies, snapshots, done = [], [], threading.Event()
+
+            def producer(i: int):
+                for j in range(requests):
+                    started_at = time.perf_counter()
+                    client.produce(f'message_{j}'.encode('utf-8'), f'topic_{i % topics}')
+                    latencies.append(time.perf_counter() - started_at)
+
+            def snapshotter():
+                while not done.is_set():
+                    started_at = time.perf_counter()
+                    client.snapshot()
+                    snapshots.append(time.perf_counter() - started_at)
+
+            snapshot_thread = threading.Thread(target=snapshotter)
+            snapshot_thread.start()
+            threads = [threading.Thread(target=producer, args=(i,)) for i in range(producers)]
+            started_at = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            duration = time.perf_counter() - started_at
+            done.set()
+            snapshot_thread.join()
+            print(f'execution={execution:<7s} produces/s={len(latencies) / duration:>9.1f} '
+                  f'snapshots={len(snapshots):<4d} {percentiles(latencies)}')
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    logging.getLogger('nioflux').setLevel(logging.WARNING)
+    logging.getLogger('nioflux.server').setLevel(logging.WARNING)
+    logging.getLogger('nioflux.pipeline').setLevel(logging.WARNING)
+    logging.getLogger('nioflux.mq').setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--producers', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000, help='produces per producer')
+    parser.add_argument('--backlog', type=int, default=500000, help='messages queued before the run')
+    parser.add_argument('--topics', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as _dir:
+        os.environ['MQ_SNAPSHOT_DIR'] = _dir
+        for execution in EXECUTIONS:
+            run(execution, args.producers, args.requests, args.backlog, args.topics, args.workers)
@@ -0,0 +1,82 @@
+"""
+Produce, then replay from the start, a topic several times the size of the memory with mmap storage,
+reporting throughput both ways and the anonymous (heap) memory of the process, which has to stay flat
+while the topic grows: payloads live in segment files and the page cache, not on the heap.
+
+    python benchmarks/mmap_replay.py --ram-multiple 3 --payload-size 4096
+    python benchmarks/mmap_replay.py --gigabytes 1
+"""
+import argparse
+import logging
+import os
+import resource
+import tempfile
+import time
+import zlib
+
+from nioflux_mq.mq import MessageQueue
+from nioflux_mq.mq.storage import STORAGE_MMAP
+
+
+def physical_memory() -> int:
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+
+
+def anonymous_memory() -> int:
+    # resident memory not backed by a file, the page cache holding mapped segments is not counted
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('RssAnon:'):
+                    return int(line.split()[1]) * 1024
+    except FileNotFoundError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+if __name__ == '__main__':
+    logging.getLogger('nioflux.mq').setLevel(logging.WARNING)
+    logging.getLogger('nioflux.mq.gc').setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ram-multiple', type=float, default=3.)
+    parser.add_argument('--gigabytes', type=float, default=None, help='topic size, overrides --ram-multiple')
+    parser.add_argument('--payload-size', type=int, default=4096)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--segment-size', type=int, default=16384)
+    parser.add_argument('--directory', type=str, default=None, help='where segment files go, a temporary '
+                                                                      'directory by default')
+    args = parser.parse_args()
+    total = int(args.gigabytes * (1 << 30)) if args.gigabytes is not None \
+        else int(physical_memory() * args.ram_multiple)
+    n = total // args.payload_size
+    payload = os.urandom(args.payload_size)
+    with tempfile.TemporaryDirectory(dir=args.directory) as _dir:
+        mq = MessageQueue(storage=STORAGE_MMAP, storage_dir=_dir, segment_size=args.segment_size)
+        try:
+            mq.register_topic('topic_0')
+            mq.register_consumer('consumer_0')
+            print(f'messages={n} payload={args.payload_size}B topic={total / (1 << 30):.2f}GiB '
+                  f'memory={physical_memory() / (1 << 30):.2f}GiB anon={anonymous_memory() / (1 << 20):.1f}MiB')
+            started_at = time.perf_counter()
+            for i in range(0, n, args.batch_size):
+                mq.produce_batch([payload] * min(args.batch_size, n - i), 'topic_0')
+            duration = time.perf_counter() - started_at
+            print(f'produce  {n / duration:>10.1f} msg/s {total / duration / (1 << 20):>8.1f} MiB/s '
+                  f'anon={anonymous_memory() / (1 << 20):.1f}MiB')
+            started_at = time.perf_counter()
+            replayed, replayed_bytes = 0, 0
+            while True:
+                messages = mq.consume_batch('consumer_0', 'topic_0', n=args.batch_size, advance=True)
+                if len(messages) < 1:
+                    break
+                for message in messages:
+                    # read every byte of the payload, faulting its pages in
+                    zlib.crc32(message.payload)
+                    replayed_bytes += len(message.payload)
+                replayed += len(messages)
+            duration = time.perf_counter() - started_at
+            assert replayed == n and replayed_bytes == n * args.payload_size
+            print(f'replay   {replayed / duration:>10.1f} msg/s {replayed_bytes / duration / (1 << 20):>8.1f} MiB/s '
+                  f'anon={anonymous_memory() / (1 << 20):.1f}MiB')
+        finally:
+            mq.close()
@@ -0,0 +1,71 @@
+"""
+Aggregate produce throughput of a sharded broker against the number of its shards.
+Every client process produces batches round-robin over its own topics, which spread over the shards.
+Scaling is bounded by the cores of the machine, shards and clients all compete for them.
+
+    python benchmarks/shard_scaling.py --shards 1 2 4 --clients 4 --topics 16 --batches 200
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+
+from nioflux.util.transport_layer import random_port
+
+from nioflux_mq.client import ShardedNioFluxMQClient
+from nioflux_mq.server.shards import start_shards, stop_shards
+
+# module level, so that the spawned shard and client processes are quiet too
+logging.getLogger('nioflux').setLevel(logging.WARNING)
+logging.getLogger('nioflux.server').setLevel(logging.WARNING)
+logging.getLogger('nioflux.pipeline').setLevel(logging.WARNING)
+logging.getLogger('nioflux.mq').setLevel(logging.WARNING)
+
+
+def client(port: int, shards: int, topics: list[str], batches: int, batch_size: int, size: int):
+    with ShardedNioFluxMQClient.connect(host='127.0.0.1', port=port, shards=shards, pool_size=1) as _client:
+        batch = [b'x' * size] * batch_size
+        for i in range(batches):
+            assert _client.produce_batch(batch, topics[i % len(topics)]).success
+
+
+def run(shards: int, clients: int, topics: int, batches: int, batch_size: int, size: int) -> float:
+    port = random_port()
+    processes = start_shards(host='127.0.0.1', port=port, shards=shards)
+    try:
+        time.sleep(1.)
+        names = [f'topic_{i}' for i in range(topics)]
+        with ShardedNioFluxMQClient.connect(host='127.0.0.1', port=port, shards=shards, pool_size=1) as _client:
+            for name in names:
+                _client.register_topic(name)
+        context = multiprocessing.get_context('spawn')
+        producers = [context.Process(target=client, args=(port, shards, names[i::clients], batches,
+                                                          batch_size, size)) for i in range(clients)]
+        started_at = time.perf_counter()
+        for producer in producers:
+            producer.start()
+        for producer in producers:
+            producer.join()
+        duration = time.perf_counter() - started_at
+        assert all(producer.exitcode == 0 for producer in producers)
+        return clients * batches * batch_size / duration
+    finally:
+        stop_shards(processes)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--topics', type=int, default=16)
+    parser.add_argument('--batches', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--size', type=int, default=128, help='payload size in bytes')
+    args = parser.parse_args()
+    os.environ.setdefault('MQ_SNAPSHOT_DIR', tempfile.mkdtemp())
+    print(f'cores={os.cpu_count()}')
+    for shards in args.shards:
+        throughput = run(shards, args.clients, args.topics, args.batches, args.batch_size, args.size)
+        print(f'shards={shards:<3d} clients={args.clients:<3d} messages/s={throughput:>10.1f}')
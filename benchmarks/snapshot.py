@@ -0,0 +1,40 @@
+"""
+Snapshot stall (time every lock is held to freeze the queue) against total snapshot duration,
+and the size of the snapshot file, for a growing backlog.
+
+    python benchmarks/snapshot.py --messages 10000 100000 1000000
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from nioflux_mq.mq import MessageQueue
+
+
+if __name__ == '__main__':
+    logging.getLogger('nioflux.mq').setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--payload-size', type=int, default=128)
+    args = parser.parse_args()
+    payload = os.urandom(args.payload_size)
+    with tempfile.TemporaryDirectory() as _dir:
+        for n in args.messages:
+            mq = MessageQueue()
+            try:
+                mq.register_topic('topic_0')
+                mq.register_consumer('consumer_0')
+                mq.produce_batch([payload] * n, 'topic_0')
+                path = os.path.join(_dir, 'snapshot')
+                mq.save(path)
+                stats = mq.snapshot_stats
+                started_at = time.perf_counter()
+                mq.load(path)
+                load_duration = time.perf_counter() - started_at
+                print(f'messages={n:<8d} stall={stats["stall"] * 1e3:>8.3f}ms '
+                      f'duration={stats["duration"] * 1e3:>9.1f}ms load={load_duration * 1e3:>9.1f}ms '
+                      f'bytes={stats["bytes"]}')
+            finally:
+                mq.close()
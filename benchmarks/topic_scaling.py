@@ -0,0 +1,84 @@
+"""
+Multi-threaded MessageQueue contention, scaled by topic count.
+
+Each loader thread runs produce_batch -> consume_batch rounds of `--batch` messages, holding the lock
+of the topic it loads for a whole batch, while a probe thread times single produce -> consume -> advance
+rounds on a topic of its own. Loaders either share the probe's topic, so that it waits for their batches,
+or each own a topic, so that it only competes with them for the interpreter.
+
+Python threads run one at a time under the GIL, so total throughput does not grow with the number of topics,
+it is reported for reference only. What per topic locks buy is the probe's tail latency: a topic is not
+held back by the batches of other topics.
+
+    python benchmarks/topic_scaling.py --ops 5000 --topics 1 2 4 8 --batch 500
+"""
+import argparse
+import logging
+import statistics
+import threading
+import time
+
+from nioflux_mq.mq import MessageQueue
+
+
+def run(n_loaders: int, ops: int, batch: int, shared: bool) -> tuple[float, float, float]:
+    """
+    :return: rounds per second of the probe and the loaders together, and the probe's p50 and p99 latencies in ms.
+    """
+    mq = MessageQueue()
+    try:
+        for i in range(n_loaders + 1):
+            mq.register_topic(f'topic_{i}')
+            mq.register_consumer(f'consumer_{i}')
+        barrier = threading.Barrier(n_loaders + 2)
+        stop = threading.Event()
+        rounds = [0] * (n_loaders + 1)
+        latencies = []
+        payloads = [b'payload'] * batch
+
+        def loader(i: int):
+            topic, consumer = 'topic_0' if shared else f'topic_{i}', f'consumer_{i}'
+            barrier.wait()
+            while not stop.is_set():
+                mq.produce_batch(payloads, topic)
+                mq.consume_batch(consumer, topic, batch, advance=True)
+                rounds[i] += 1
+
+        def probe():
+            barrier.wait()
+            for _ in range(ops):
+                started_at = time.perf_counter()
+                mq.produce(b'payload', 'topic_0')
+                mq.consume('consumer_0', 'topic_0')
+                mq.advance('consumer_0', 'topic_0')
+                latencies.append(time.perf_counter() - started_at)
+            rounds[0] = ops
+            stop.set()
+
+        threads = ([threading.Thread(target=loader, args=(i,)) for i in range(1, n_loaders + 1)]
+                   + [threading.Thread(target=probe)])
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        started_at = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started_at
+        quantiles = statistics.quantiles(latencies, n=100)
+        return sum(rounds) / elapsed, quantiles[49] * 1000, quantiles[98] * 1000
+    finally:
+        mq.close()
+
+
+if __name__ == '__main__':
+    logging.getLogger('nioflux.mq').setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ops', type=int, default=5000, help='rounds of the probe')
+    parser.add_argument('--topics', type=int, nargs='+', default=[1, 2, 4, 8], help='numbers of loader threads')
+    parser.add_argument('--batch', type=int, default=500, help='messages per loader batch')
+    args = parser.parse_args()
+    for n in args.topics:
+        for shared in (True, False):
+            throughput, p50, p99 = run(n, args.ops, args.batch, shared)
+            print(f'loaders={n:<4d} {"shared topic" if shared else "own topics  "} rounds/s={throughput:>10.1f} '
+                  f'probe p50={p50:>8.3f}ms p99={p99:>8.3f}ms')
@@ -0,0 +1,50 @@
+"""
+Durable produce throughput under each write-ahead log fsync policy.
+Every producer thread waits for its produce to be durable before the next one, like a server acknowledging it.
+
+    python benchmarks/wal_produce.py --producers 16 --messages 500
+"""
+import argparse
+import logging
+import tempfile
+import threading
+import time
+
+from nioflux_mq.mq import MessageQueue
+from nioflux_mq.snapshot.write_ahead_log import WriteAheadLog, FSYNC_POLICIES
+
+
+def run(policy: str | None, producers: int, messages: int, group_commit_interval: float) -> float:
+    with tempfile.TemporaryDirectory() as _dir:
+        wal = WriteAheadLog(_dir, fsync=policy, group_commit_interval=group_commit_interval) \
+            if policy is not None else None
+        mq = MessageQueue(wal=wal)
+        try:
+            mq.register_topic('topic_0')
+
+            def producer():
+                for _ in range(messages):
+                    mq.produce(b'x' * 128, 'topic_0')
+                    mq.sync().result()
+
+            threads = [threading.Thread(target=producer) for _ in range(producers)]
+            started_at = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return producers * messages / (time.perf_counter() - started_at)
+        finally:
+            mq.close()
+
+
+if __name__ == '__main__':
+    logging.getLogger('nioflux.mq').setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--producers', type=int, default=16)
+    parser.add_argument('--messages', type=int, default=500, help='messages per producer')
+    parser.add_argument('--group-commit-interval', type=float, default=.005)
+    args = parser.parse_args()
+    for policy in (None, *FSYNC_POLICIES):
+        throughput = run(policy, args.producers, args.messages, args.group_commit_interval)
+        print(f'fsync={str(policy):<8s} durable produces/s={throughput:>10.1f}')
@@ -0,0 +1,37 @@
+"""
+Bytes on the wire and CPU time per message of JsonCodec against BinaryCodec,
+for a produce request plus the consume response carrying the message back.
+
+    python benchmarks/wire_codec.py --messages 20000 --sizes 64 1024 65536
+"""
+import argparse
+import time
+
+from nioflux_mq.codec import JsonCodec, BinaryCodec
+from nioflux_mq.mq.message import Message
+
+
+def run(codec, payload: bytes, n: int) -> tuple[int, float]:
+    message = Message.build(payload=payload, ttl=-1.)
+    request = {'instruction': 'produce', 'payload': {'message': payload, 'topic': 'topic_0', 'ttl': -1.}}
+    response = {'success': True, 'info': message, 'err': []}
+    wire_bytes = len(codec.encode(request)) + len(codec.encode(response))
+    started_at = time.process_time()
+    for _ in range(n):
+        codec.decode(codec.split(bytearray(codec.encode(request))))
+        codec.decode(codec.split(bytearray(codec.encode(response))))
+    return wire_bytes, (time.process_time() - started_at) / n
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[64, 1024, 65536])
+    args = parser.parse_args()
+    for size in args.sizes:
+        # JSON-safe text so that both codecs can carry it, the binary codec also carries arbitrary bytes
+        payload = (b'{"k": "v\\n"}' * (size // 12 + 1))[:size]
+        for codec in (JsonCodec(), BinaryCodec()):
+            wire_bytes, cpu = run(codec, payload, max(args.messages * 64 // max(size, 64), 100))
+            print(f'{type(codec).__name__:<12s} payload={size:<7d} wire_bytes={wire_bytes:<8d} '
+                  f'cpu_per_message={cpu * 1e6:>9.2f}us')
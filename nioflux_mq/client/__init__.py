@@ -1 +1,3 @@
 from .client import NioFluxMQClient
+from .sharded_client import ShardedNioFluxMQClient
+from .async_client import AsyncNioFluxMQClient
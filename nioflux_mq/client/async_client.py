@@ -0,0 +1,374 @@
+import asyncio
+import itertools
+
+from typing_extensions import AsyncIterator
+
+from nioflux.server.server import DEFAULT_EOT, DEFAULT_TIMEOUT, DEFAULT_BUFFER_SIZE
+
+from nioflux_mq.mq.message import Message
+from nioflux_mq.codec import Codec, JsonCodec
+from nioflux_mq.client.response import Response
+
+DEFAULT_MAX_IN_FLIGHT = 256
+DEFAULT_POLL_TIMEOUT = 1.
+
+
+class AsyncConnection:
+    def __init__(self, host: str, port: int, codec: Codec, timeout: float = DEFAULT_TIMEOUT,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        """
+        A connection pipelining requests: requests are written without waiting for the responses
+        of those before them, every request carries an id the server echoes, by which its response is matched.
+        At most `max_in_flight` requests await their responses at once.
+        """
+        self._host = host
+        self._port = port
+        self._codec = codec
+        self._timeout = timeout
+        self._buffer_size = buffer_size
+        self._ids = itertools.count()
+        self._in_flight: dict[int, asyncio.Future] = dict()
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._receiver: asyncio.Task | None = None
+
+    @property
+    def closed(self) -> bool:
+        return self._writer is None or self._writer.is_closing() or self._receiver.done()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    async def open(self):
+        self._reader, self._writer = await asyncio.wait_for(asyncio.open_connection(self._host, self._port),
+                                                            self._timeout)
+        self._receiver = asyncio.create_task(self._receive())
+
+    async def _receive(self):
+        buffer = bytearray()
+        err = ConnectionResetError('connection closed by server.')
+        try:
+            while True:
+                response = self._codec.split(buffer)
+                while response is not None:
+                    response = self._codec.decode(response)
+                    future = self._in_flight.pop(response.get('id'), None)
+                    # a response nobody waits for anymore, its request timed out
+                    if future is not None and not future.done():
+                        future.set_result(response)
+                    response = self._codec.split(buffer)
+                block = await self._reader.read(self._buffer_size)
+                if len(block) < 1:
+                    break
+                buffer += block
+        except (ConnectionError, ValueError) as e:
+            err = e
+        finally:
+            in_flight, self._in_flight = self._in_flight, dict()
+            for future in in_flight.values():
+                if not future.done():
+                    future.set_exception(err)
+
+    async def request(self, request: dict, wait: float | None = None) -> dict:
+        """
+        :param wait: seconds the server may hold the request before responding, on top of the timeout.
+        """
+        if self.closed:
+            raise ConnectionResetError('connection closed.')
+        async with self._slots:
+            _id = next(self._ids)
+            future = asyncio.get_running_loop().create_future()
+            self._in_flight[_id] = future
+            try:
+                self._writer.write(self._codec.encode({**request, 'id': _id}))
+                await self._writer.drain()
+                return await asyncio.wait_for(future, self._timeout + wait if wait else self._timeout)
+            finally:
+                self._in_flight.pop(_id, None)
+
+    async def close(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+        if self._receiver is not None:
+            await self._receiver
+
+
+class AsyncNioFluxMQClient:
+    def __init__(self, host: str, port: int, eot: bytes = DEFAULT_EOT, timeout: float = DEFAULT_TIMEOUT,
+                 codec: Codec | None = None, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        """
+        Asyncio client pipelining every request over a single connection, opened by `open` or `connect`.
+        Concurrent requests do not wait for each other's responses, but the server still serves
+        the requests of a connection in order, so long polls are best made through `messages` and `batches`,
+        which poll over connections of their own.
+
+        :param codec: wire codec, `JsonCodec` by default, `BinaryCodec` carries payloads as raw bytes.
+        :param max_in_flight: requests awaiting their responses at once, further requests wait for a slot.
+        """
+        self._host = host
+        self._port = port
+        self._eot = eot
+        self._timeout = timeout
+        self._codec = codec if codec is not None else JsonCodec(eot=eot)
+        self._max_in_flight = max_in_flight
+        self._connection = self._new_connection()
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @property
+    def host(self):
+        return self._host
+
+    @property
+    def port(self):
+        return self._port
+
+    @staticmethod
+    async def connect(host: str, port: int, eot: bytes = DEFAULT_EOT, codec: Codec | None = None,
+                      max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        client = AsyncNioFluxMQClient(host=host, port=port, eot=eot, codec=codec, max_in_flight=max_in_flight)
+        await client.open()
+        return client
+
+    def _new_connection(self) -> AsyncConnection:
+        return AsyncConnection(host=self._host, port=self._port, codec=self._codec, timeout=self._timeout,
+                               max_in_flight=self._max_in_flight)
+
+    async def open(self):
+        await self._connection.open()
+
+    async def close(self):
+        await self._connection.close()
+
+    async def request(self, instruction: str, payload: dict | None = None, wait: float | None = None,
+                      connection: AsyncConnection | None = None) -> Response:
+        if self._connection.closed and connection is None:
+            # reopened once the server dropped it, requests in flight at the time have failed
+            self._connection = self._new_connection()
+            await self._connection.open()
+        response = await (connection if connection is not None else self._connection).request({
+            'instruction': instruction,
+            'payload': payload
+        }, wait=wait)
+        return Response(
+            success=response['success'],
+            data=response['info'],
+            err=response['err']
+        )
+
+    @property
+    async def topics(self) -> Response:
+        return await self.request('topics')
+
+    @property
+    async def consumers(self) -> Response:
+        return await self.request('consumers')
+
+    @property
+    async def groups(self) -> Response:
+        return await self.request('groups')
+
+    async def snapshot(self) -> Response:
+        return await self.request('snapshot')
+
+    async def stats(self) -> Response:
+        return await self.request('stats')
+
+    async def usage(self) -> Response:
+        return await self.request('usage')
+
+    async def register_topic(self, topic: str, storage: str | None = None, partitions: int = 1,
+                             compression: str | None = None) -> Response:
+        return await self.request('register_topic', {
+            'topic': topic,
+            'storage': storage,
+            'partitions': partitions,
+            'compression': compression
+        })
+
+    async def unregister_topic(self, topic: str) -> Response:
+        return await self.request('unregister_topic', {
+            'topic': topic
+        })
+
+    async def register_consumer(self, consumer: str, group: str | None = None, topic: str | None = None) -> Response:
+        return await self.request('register_consumer', {
+            'consumer': consumer,
+            'group': group,
+            'topic': topic
+        })
+
+    async def unregister_consumer(self, consumer: str) -> Response:
+        return await self.request('unregister_consumer', {
+            'consumer': consumer
+        })
+
+    async def join_group(self, consumer: str, group: str, topic: str) -> Response:
+        return await self.request('join_group', {
+            'consumer': consumer,
+            'group': group,
+            'topic': topic
+        })
+
+    async def leave_group(self, consumer: str, group: str) -> Response:
+        return await self.request('leave_group', {
+            'consumer': consumer,
+            'group': group
+        })
+
+    async def produce(self, message: bytes, topic: str | None = None, ttl: float = -1.,
+                      key: str | bytes | None = None, headers: dict[str, str] | None = None) -> Response:
+        return await self.request('produce', {
+            'message': message,
+            'topic': topic,
+            'ttl': ttl,
+            'key': key,
+            'headers': headers
+        })
+
+    async def produce_batch(self, messages: list[bytes], topic: str | None = None,
+                            ttl: float | list[float] = -1., key: str | bytes | None = None,
+                            headers: dict[str, str] | list[dict[str, str] | None] | None = None) -> Response:
+        return await self.request('produce_batch', {
+            'messages': messages,
+            'topic': topic,
+            'ttl': ttl,
+            'key': key,
+            'headers': headers
+        })
+
+    async def consume(self, consumer: str, topic: str, timeout: float | None = None,
+                      decompress: bool = True, key: str | None = None,
+                      headers: dict[str, str] | None = None) -> Response:
+        """
+        :param decompress: see `NioFluxMQClient.consume`.
+        :param key: see `NioFluxMQClient.consume`.
+        :param headers: see `NioFluxMQClient.consume`.
+        """
+        response = await self.request('consume', {
+            'consumer': consumer,
+            'topic': topic,
+            'timeout': timeout,
+            'key': key,
+            'headers': headers
+        }, wait=timeout)
+        return response.decompressed() if decompress else response
+
+    async def consume_batch(self, consumer: str, topic: str, n: int, advance: bool = False,
+                            timeout: float | None = None, decompress: bool = True, key: str | None = None,
+                            headers: dict[str, str] | None = None) -> Response:
+        response = await self.request('consume_batch', {
+            'consumer': consumer,
+            'topic': topic,
+            'n': n,
+            'advance': advance,
+            'timeout': timeout,
+            'key': key,
+            'headers': headers
+        }, wait=timeout)
+        return response.decompressed() if decompress else response
+
+    async def poll(self, consumer: str, topic: str, timeout: float | None = None,
+                   decompress: bool = True, key: str | None = None,
+                   headers: dict[str, str] | None = None) -> Response:
+        response = await self.request('poll', {
+            'consumer': consumer,
+            'topic': topic,
+            'timeout': timeout,
+            'key': key,
+            'headers': headers
+        }, wait=timeout)
+        return response.decompressed() if decompress else response
+
+    async def advance(self, consumer: str, topic: str, n: int = 1) -> Response:
+        return await self.request('advance', {
+            'consumer': consumer,
+            'topic': topic,
+            'n': n
+        })
+
+    async def retreat(self, consumer: str, topic: str, n: int = 1) -> Response:
+        return await self.request('retreat', {
+            'consumer': consumer,
+            'topic': topic,
+            'n': n
+        })
+
+    async def seek_to_time(self, consumer: str, topic: str, timestamp: float) -> Response:
+        """
+        Move `consumer` to the first message of `topic` produced at `timestamp` or later,
+        in seconds since the epoch, as `Message.timestamp`.
+        """
+        return await self.request('seek_to_time', {
+            'consumer': consumer,
+            'topic': topic,
+            'timestamp': timestamp
+        })
+
+    async def seek_to_offset(self, consumer: str, topic: str, offset: int, partition: int = 0) -> Response:
+        return await self.request('seek_to_offset', {
+            'consumer': consumer,
+            'topic': topic,
+            'offset': offset,
+            'partition': partition
+        })
+
+    async def seek_to_end(self, consumer: str, topic: str) -> Response:
+        return await self.request('seek_to_end', {
+            'consumer': consumer,
+            'topic': topic
+        })
+
+    async def messages(self, consumer: str, topic: str, timeout: float = DEFAULT_POLL_TIMEOUT,
+                       key: str | None = None, headers: dict[str, str] | None = None) -> AsyncIterator[Message]:
+        """
+        Poll `topic` for `consumer` until the iteration is broken off, long polling up to `timeout`
+        seconds at a time over a connection of its own.
+
+        :param key: only the messages of this key, see `NioFluxMQClient.consume`.
+        :param headers: only the messages with every one of these headers.
+        """
+        async for message in self._poll_loop('poll', {'consumer': consumer, 'topic': topic, 'key': key,
+                                                      'headers': headers}, timeout):
+            if message is not None:
+                yield message
+
+    async def batches(self, consumer: str, topic: str, n: int, timeout: float = DEFAULT_POLL_TIMEOUT,
+                      key: str | None = None, headers: dict[str, str] | None = None) -> AsyncIterator[list[Message]]:
+        """
+        Consume batches of up to `n` messages of `topic` for `consumer`, advancing past each,
+        until the iteration is broken off.
+
+        :param key: see `messages`.
+        :param headers: see `messages`.
+        """
+        async for batch in self._poll_loop('consume_batch', {'consumer': consumer, 'topic': topic, 'n': n,
+                                                             'advance': True, 'key': key, 'headers': headers},
+                                           timeout):
+            if len(batch) > 0:
+                yield batch
+
+    async def _poll_loop(self, instruction: str, payload: dict, timeout: float) -> AsyncIterator:
+        connection = self._new_connection()
+        await connection.open()
+        try:
+            while True:
+                response = await self.request(instruction, {**payload, 'timeout': timeout}, wait=timeout,
+                                              connection=connection)
+                if not response.success:
+                    raise ValueError(f'{instruction} failed: {response.err}')
+                yield response.decompressed().data
+        finally:
+            await connection.close()
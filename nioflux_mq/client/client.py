@@ -1,17 +1,31 @@
 import json
 
-from nioflux.util import tcp_send
-from nioflux.server.server import DEFAULT_EOT
+from nioflux.server.server import DEFAULT_EOT, DEFAULT_TIMEOUT
 
 from nioflux_mq.mq.message import Message
+from nioflux_mq.codec import Codec, JsonCodec
 from nioflux_mq.client.response import Response
+from nioflux_mq.client.connection_pool import ConnectionPool, DEFAULT_POOL_SIZE
+from nioflux_mq.snapshot.replication_log import DEFAULT_FETCH_BYTES
 
 
 class NioFluxMQClient:
-    def __init__(self, host: str, port: int, eot: bytes = DEFAULT_EOT):
+    def __init__(self, host: str, port: int, eot: bytes = DEFAULT_EOT,
+                 pool_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT, codec: Codec | None = None):
+        """
+        :param codec: wire codec, `JsonCodec` by default, `BinaryCodec` carries payloads as raw bytes.
+        """
         self._host = host
         self._port = port
         self._eot = eot
+        self._codec = codec if codec is not None else JsonCodec(eot=eot)
+        self._pool = ConnectionPool(host=host, port=port, codec=self._codec, size=pool_size, timeout=timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
     @property
     def host(self):
@@ -22,16 +36,25 @@ class NioFluxMQClient:
         return self._port
 
     @staticmethod
-    def connect(host: str, port: int, eot: bytes = DEFAULT_EOT):
-        return NioFluxMQClient(host=host, port=port, eot=eot)
+    def connect(host: str, port: int, eot: bytes = DEFAULT_EOT, pool_size: int = DEFAULT_POOL_SIZE,
+                codec: Codec | None = None):
+        return NioFluxMQClient(host=host, port=port, eot=eot, pool_size=pool_size, codec=codec)
+
+    def close(self):
+        self._pool.close()
+
+    def request(self, instruction: str, payload: dict | None = None, wait: float | None = None) -> Response:
+        return self.response_postprocess(self._pool.request(self._codec.encode({
+            'instruction': instruction,
+            'payload': payload
+        }), wait=wait), codec=self._codec)
 
     @staticmethod
-    def response_postprocess(response: bytes) -> Response:
-        _dict = json.loads(response.decode('utf-8'))
-        if isinstance(_dict['info'], dict):
-            if _dict['info'].get('__class__') == 'Message':
-                _dict['info'] = json.loads(json.dumps(_dict['info'], ensure_ascii=True),
-                                           object_hook=Message.deserialize)
+    def response_postprocess(response: bytes, codec: Codec | None = None) -> Response:
+        if codec is None:
+            _dict = json.loads(response.decode('utf-8'), object_hook=Message.deserialize)
+        else:
+            _dict = codec.decode(response)
         return Response(
             success=_dict['success'],
             data=_dict['info'],
@@ -40,91 +63,218 @@ class NioFluxMQClient:
 
     @property
     def topics(self) -> Response:
-        return self.response_postprocess(tcp_send(json.dumps({
-            'instruction': 'topics',
-            'payload': None
-        }).encode('utf-8') + self._eot, host=self._host, port=self._port, wait=True))
+        return self.request('topics')
 
     @property
     def consumers(self) -> Response:
-        return self.response_postprocess(tcp_send(json.dumps({
-            'instruction': 'consumers',
-            'payload': None
-        }).encode('utf-8') + self._eot, host=self._host, port=self._port, wait=True))
+        return self.request('consumers')
+
+    @property
+    def groups(self) -> Response:
+        return self.request('groups')
 
     def snapshot(self) -> Response:
-        return self.response_postprocess(tcp_send(json.dumps({
-            'instruction': 'snapshot',
-            'payload': None
-        }).encode('utf-8') + self._eot, host=self._host, port=self._port, wait=True))
-
-    def register_topic(self, topic: str) -> Response:
-        return self.response_postprocess(tcp_send(json.dumps({
-            'instruction': 'register_topic',
-            'payload': {
-                'topic': topic
-            }
-        }).encode('utf-8') + self._eot, host=self._host, port=self._port, wait=True))
+        return self.request('snapshot')
+
+    def stats(self) -> Response:
+        """
+        :return: produce and consume counts and rates, backlog, consumer lag, lock waits, gc cycles, snapshots
+        and instruction latencies, see `MessageQueue.stats`. Rates are over the time since the previous call.
+        """
+        return self.request('stats')
+
+    def usage(self) -> Response:
+        """
+        :return: the payload bytes and messages the server retains against its quotas, as a whole and by topic,
+        see `MessageQueue.usage`, for producers to slow down before they are refused.
+        """
+        return self.request('usage')
+
+    def register_topic(self, topic: str, storage: str | None = None, partitions: int = 1,
+                       compression: str | None = None) -> Response:
+        """
+        :param storage: `memory` or `mmap`, the server's default storage if not given.
+        :param partitions: number of partitions to split the topic into, for consumer groups to share.
+        :param compression: `zlib`, `lzma` or any registered on the server, the payloads of each produced batch
+        are compressed together, uncompressed if not given.
+        """
+        return self.request('register_topic', {
+            'topic': topic,
+            'storage': storage,
+            'partitions': partitions,
+            'compression': compression
+        })
 
     def unregister_topic(self, topic: str) -> Response:
-        return self.response_postprocess(tcp_send(json.dumps({
-            'instruction': 'unregister_topic',
-            'payload': {
-                'topic': topic
-            }
-        }).encode('utf-8') + self._eot, host=self._host, port=self._port, wait=True))
-
-    def register_consumer(self, consumer: str) -> Response:
-        return self.response_postprocess(tcp_send(json.dumps({
-            'instruction': 'register_consumer',
-            'payload': {
-                'consumer': consumer
-            }
-        }).encode('utf-8') + self._eot, host=self._host, port=self._port, wait=True))
+        return self.request('unregister_topic', {
+            'topic': topic
+        })
+
+    def register_consumer(self, consumer: str, group: str | None = None, topic: str | None = None) -> Response:
+        """
+        :param group: a consumer group of `topic` to join at once, see `join_group`.
+        """
+        return self.request('register_consumer', {
+            'consumer': consumer,
+            'group': group,
+            'topic': topic
+        })
 
     def unregister_consumer(self, consumer: str) -> Response:
-        return self.response_postprocess(tcp_send(json.dumps({
-            'instruction': 'unregister_consumer',
-            'payload': {
-                'consumer': consumer
-            }
-        }).encode('utf-8') + self._eot, host=self._host, port=self._port, wait=True))
-
-    def produce(self, message: bytes, topic: str | None = None, ttl: float = -1.) -> Response:
-        return self.response_postprocess(tcp_send(json.dumps({
-            'instruction': 'produce',
-            'payload': {
-                'message': message.decode('utf-8'),
-                'topic': topic,
-                'ttl': ttl
-            }
-        }).encode('utf-8') + self._eot, host=self._host, port=self._port, wait=True))
-
-    def consume(self, consumer: str, topic: str) -> Response:
-        return self.response_postprocess(tcp_send(json.dumps({
-            'instruction': 'consume',
-            'payload': {
-                'consumer': consumer,
-                'topic': topic
-            }
-        }).encode('utf-8') + self._eot, host=self._host, port=self._port, wait=True))
+        return self.request('unregister_consumer', {
+            'consumer': consumer
+        })
+
+    def join_group(self, consumer: str, group: str, topic: str) -> Response:
+        """
+        Join the consumer group `group` of `topic`, whose members share offsets and split its partitions.
+        Consume, poll, advance and retreat of `topic` then go through the group.
+        """
+        return self.request('join_group', {
+            'consumer': consumer,
+            'group': group,
+            'topic': topic
+        })
+
+    def leave_group(self, consumer: str, group: str) -> Response:
+        return self.request('leave_group', {
+            'consumer': consumer,
+            'group': group
+        })
+
+    def produce(self, message: bytes, topic: str | None = None, ttl: float = -1.,
+                key: str | bytes | None = None, headers: dict[str, str] | None = None) -> Response:
+        """
+        :param key: carried by the message for consumers to filter on, messages of a key always go
+        to the same partition, `None` spreads them round-robin.
+        :param headers: text attributes carried by the message for consumers to filter on.
+        """
+        return self.request('produce', {
+            'message': message,
+            'topic': topic,
+            'ttl': ttl,
+            'key': key,
+            'headers': headers
+        })
+
+    def produce_batch(self, messages: list[bytes], topic: str | None = None,
+                      ttl: float | list[float] = -1., key: str | bytes | None = None,
+                      headers: dict[str, str] | list[dict[str, str] | None] | None = None) -> Response:
+        """
+        :param headers: one set of headers for every message, or one per message.
+        """
+        return self.request('produce_batch', {
+            'messages': messages,
+            'topic': topic,
+            'ttl': ttl,
+            'key': key,
+            'headers': headers
+        })
+
+    def consume(self, consumer: str, topic: str, timeout: float | None = None, decompress: bool = True,
+                key: str | None = None, headers: dict[str, str] | None = None) -> Response:
+        """
+        :param timeout: seconds to wait for a message when the consumer is caught up, `None` returns at once.
+        :param decompress: whether to decompress payloads of compressed topics, which the binary codec carries
+        compressed, here rather than on the server. Otherwise they are left as `CompressedPayload`.
+        :param key: only read a message of this key, found by the server through the index of the topic,
+        the messages before it are skipped for good, see `MessageQueue.consume`.
+        :param headers: only read a message with every one of these headers, as `key`.
+        """
+        response = self.request('consume', {
+            'consumer': consumer,
+            'topic': topic,
+            'timeout': timeout,
+            'key': key,
+            'headers': headers
+        }, wait=timeout)
+        return response.decompressed() if decompress else response
+
+    def consume_batch(self, consumer: str, topic: str, n: int, advance: bool = False,
+                      timeout: float | None = None, decompress: bool = True, key: str | None = None,
+                      headers: dict[str, str] | None = None) -> Response:
+        response = self.request('consume_batch', {
+            'consumer': consumer,
+            'topic': topic,
+            'n': n,
+            'advance': advance,
+            'timeout': timeout,
+            'key': key,
+            'headers': headers
+        }, wait=timeout)
+        return response.decompressed() if decompress else response
+
+    def poll(self, consumer: str, topic: str, timeout: float | None = None, decompress: bool = True,
+             key: str | None = None, headers: dict[str, str] | None = None) -> Response:
+        response = self.request('poll', {
+            'consumer': consumer,
+            'topic': topic,
+            'timeout': timeout,
+            'key': key,
+            'headers': headers
+        }, wait=timeout)
+        return response.decompressed() if decompress else response
 
     def advance(self, consumer: str, topic: str, n: int = 1) -> Response:
-        return self.response_postprocess(tcp_send(json.dumps({
-            'instruction': 'advance',
-            'payload': {
-                'consumer': consumer,
-                'topic': topic,
-                'n': n
-            }
-        }).encode('utf-8') + self._eot, host=self._host, port=self._port, wait=True))
+        return self.request('advance', {
+            'consumer': consumer,
+            'topic': topic,
+            'n': n
+        })
 
     def retreat(self, consumer: str, topic: str, n: int = 1) -> Response:
-        return self.response_postprocess(tcp_send(json.dumps({
-            'instruction': 'retreat',
-            'payload': {
-                'consumer': consumer,
-                'topic': topic,
-                'n': n
-            }
-        }).encode('utf-8') + self._eot, host=self._host, port=self._port, wait=True))
+        return self.request('retreat', {
+            'consumer': consumer,
+            'topic': topic,
+            'n': n
+        })
+
+    def seek_to_time(self, consumer: str, topic: str, timestamp: float) -> Response:
+        """
+        Move `consumer` to the first message of `topic` produced at `timestamp` or later,
+        in seconds since the epoch, as `Message.timestamp`.
+        """
+        return self.request('seek_to_time', {
+            'consumer': consumer,
+            'topic': topic,
+            'timestamp': timestamp
+        })
+
+    def seek_to_offset(self, consumer: str, topic: str, offset: int, partition: int = 0) -> Response:
+        return self.request('seek_to_offset', {
+            'consumer': consumer,
+            'topic': topic,
+            'offset': offset,
+            'partition': partition
+        })
+
+    def seek_to_end(self, consumer: str, topic: str) -> Response:
+        return self.request('seek_to_end', {
+            'consumer': consumer,
+            'topic': topic
+        })
+
+    def replicate(self, follower: str, since: int | None = None, max_bytes: int = DEFAULT_FETCH_BYTES,
+                  timeout: float | None = None) -> Response:
+        """
+        Fetch the records of the server's replication log from `since` on, as the follower `follower`
+        which applied every record before it, see `nioflux_mq.server.follower.Follower`.
+        Records are bytes, which only the binary codec carries.
+
+        :param since: `None` fetches a snapshot to catch up from, as do records the server no longer keeps.
+        :param timeout: seconds to wait for a record when the follower is caught up, `None` returns at once.
+        :return: the sequence of the last record covered, the sequence of the server's last record as `head`,
+        and either the `records` or a binary `snapshot`.
+        """
+        return self.request('replicate', {
+            'follower': follower,
+            'since': since,
+            'max_bytes': max_bytes,
+            'timeout': timeout
+        }, wait=timeout)
+
+    def promote(self) -> Response:
+        """
+        Make a follower stop following its leader and accept writes, with every record it applied so far.
+        """
+        return self.request('promote')
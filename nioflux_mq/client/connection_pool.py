@@ -0,0 +1,146 @@
+import select
+import socket
+from threading import BoundedSemaphore, RLock
+
+from nioflux.server.server import DEFAULT_TIMEOUT, DEFAULT_BUFFER_SIZE
+
+from nioflux_mq.codec import Codec
+
+DEFAULT_POOL_SIZE = 4
+
+
+class Connection:
+    def __init__(self, host: str, port: int, codec: Codec,
+                 timeout: float = DEFAULT_TIMEOUT, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self._codec = codec
+        self._timeout = timeout
+        self._buffer_size = buffer_size
+        self._buffer = bytearray()
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    @property
+    def closed(self) -> bool:
+        return self._sock.fileno() < 0
+
+    @property
+    def healthy(self) -> bool:
+        """
+        An idle connection is healthy as long as nothing is readable on it,
+        a readable idle socket means the peer closed it or sent stray bytes.
+        """
+        if self.closed or len(self._buffer) > 0:
+            return False
+        try:
+            readable, _, _ = select.select([self._sock], [], [], 0)
+            return len(readable) < 1
+        except (OSError, ValueError):
+            return False
+
+    def request(self, frame: bytes, wait: float | None = None) -> bytes:
+        """
+        :param wait: seconds the server may hold the request before responding, on top of the socket timeout.
+        """
+        self._sock.settimeout(self._timeout + wait if wait else self._timeout)
+        self._sock.sendall(frame)
+        while True:
+            response = self._codec.split(self._buffer)
+            if response is not None:
+                return response
+            block = self._sock.recv(self._buffer_size)
+            if len(block) < 1:
+                raise ConnectionResetError('connection closed by server.')
+            self._buffer += block
+
+    def close(self):
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+
+
+class ConnectionPool:
+    def __init__(self, host: str, port: int, codec: Codec, size: int = DEFAULT_POOL_SIZE,
+                 timeout: float = DEFAULT_TIMEOUT, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        """
+        A bounded pool of long-lived connections. At most `size` connections are open at once,
+        idle connections are health checked before reuse and replaced when broken.
+        """
+        self._host = host
+        self._port = port
+        self._codec = codec
+        self._size = size
+        self._timeout = timeout
+        self._buffer_size = buffer_size
+        self._idle: list[Connection] = []
+        self._idle_lock = RLock()
+        self._slots = BoundedSemaphore(size)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def _connect(self) -> Connection:
+        return Connection(host=self._host, port=self._port, codec=self._codec,
+                          timeout=self._timeout, buffer_size=self._buffer_size)
+
+    def _acquire(self) -> tuple[Connection, bool]:
+        self._slots.acquire()
+        try:
+            while True:
+                with self._idle_lock:
+                    if len(self._idle) < 1:
+                        break
+                    connection = self._idle.pop()
+                if connection.healthy:
+                    return connection, True
+                connection.close()
+            return self._connect(), False
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, connection: Connection, broken: bool = False):
+        try:
+            if broken:
+                connection.close()
+            else:
+                with self._idle_lock:
+                    self._idle.append(connection)
+        finally:
+            self._slots.release()
+
+    def request(self, frame: bytes, wait: float | None = None) -> bytes:
+        connection, reused = self._acquire()
+        try:
+            response = connection.request(frame, wait=wait)
+        except (ConnectionError, socket.timeout) as e:
+            self._release(connection, broken=True)
+            if not reused or not isinstance(e, (BrokenPipeError, ConnectionResetError)):
+                raise
+            # the server may drop an idle connection right after the health check, reconnect once
+            connection, _ = self._acquire_fresh()
+            try:
+                response = connection.request(frame, wait=wait)
+            except BaseException:
+                self._release(connection, broken=True)
+                raise
+        except BaseException:
+            self._release(connection, broken=True)
+            raise
+        self._release(connection)
+        return response
+
+    def _acquire_fresh(self) -> tuple[Connection, bool]:
+        self._slots.acquire()
+        try:
+            return self._connect(), False
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def close(self):
+        with self._idle_lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
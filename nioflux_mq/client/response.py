@@ -1,9 +1,22 @@
 from dataclasses import dataclass
 from typing import Any
 
+from nioflux_mq.mq.message import Message
+from nioflux_mq.mq.compression import decompress_messages
+
 
 @dataclass
 class Response:
     success: bool
     data: Any
     err: list[Exception]
+
+    def decompressed(self) -> 'Response':
+        """
+        Decompress, in place, the payloads of the messages in `data` which compressed topics sent compressed.
+        """
+        if isinstance(self.data, Message):
+            decompress_messages([self.data])
+        elif isinstance(self.data, list):
+            decompress_messages([message for message in self.data if isinstance(message, Message)])
+        return self
@@ -0,0 +1,177 @@
+import zlib
+
+from nioflux.server.server import DEFAULT_EOT, DEFAULT_TIMEOUT
+
+from nioflux_mq.codec import Codec
+from nioflux_mq.client.client import NioFluxMQClient
+from nioflux_mq.client.response import Response
+from nioflux_mq.client.connection_pool import DEFAULT_POOL_SIZE
+
+
+def shard_of(topic: str, shards: int) -> int:
+    # a stable hash, every client routes a topic to the same shard
+    return zlib.crc32(topic.encode('utf-8')) % shards
+
+
+class ShardedNioFluxMQClient:
+    def __init__(self, addresses: list[tuple[str, int]], eot: bytes = DEFAULT_EOT,
+                 pool_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT, codec: Codec | None = None):
+        """
+        Client of a broker sharded over several server processes, each owning the topics `shard_of` maps to it.
+        Instructions on a topic go to its shard only. Consumers are registered on every shard,
+        `topics`, `consumers`, `groups` and `snapshot` are aggregated across shards,
+        and a produce without a topic is broadcast to every shard.
+
+        :param addresses: `(host, port)` of every shard, in shard order.
+        """
+        self._shards = [NioFluxMQClient(host=host, port=port, eot=eot, pool_size=pool_size, timeout=timeout,
+                                        codec=codec) for host, port in addresses]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def connect(host: str, port: int, shards: int, eot: bytes = DEFAULT_EOT, pool_size: int = DEFAULT_POOL_SIZE,
+                codec: Codec | None = None):
+        """
+        Connect to `shards` shards listening on consecutive ports from `port`,
+        as started by `python -m nioflux_mq.server --shards`.
+        """
+        return ShardedNioFluxMQClient(addresses=[(host, port + i) for i in range(shards)], eot=eot,
+                                      pool_size=pool_size, codec=codec)
+
+    @property
+    def shards(self) -> list[NioFluxMQClient]:
+        return self._shards.copy()
+
+    def shard(self, topic: str) -> NioFluxMQClient:
+        return self._shards[shard_of(topic, len(self._shards))]
+
+    def close(self):
+        for shard in self._shards:
+            shard.close()
+
+    @staticmethod
+    def _merge(responses: list[Response], data) -> Response:
+        return Response(
+            success=all(response.success for response in responses),
+            data=data,
+            err=[e for response in responses for e in response.err]
+        )
+
+    @property
+    def topics(self) -> Response:
+        responses = [shard.topics for shard in self._shards]
+        return self._merge(responses, [topic for response in responses for topic in response.data or []])
+
+    @property
+    def consumers(self) -> Response:
+        responses = [shard.consumers for shard in self._shards]
+        return self._merge(responses, sorted({consumer for response in responses for consumer in response.data or []}))
+
+    @property
+    def groups(self) -> Response:
+        responses = [shard.groups for shard in self._shards]
+        return self._merge(responses, {group: info for response in responses for group, info in
+                                       (response.data or dict()).items()})
+
+    def snapshot(self) -> Response:
+        """
+        Every shard snapshots its own topics, under its own snapshot directory.
+        """
+        responses = [shard.snapshot() for shard in self._shards]
+        return self._merge(responses, [response.data for response in responses])
+
+    def stats(self) -> Response:
+        """
+        :return: the stats of every shard, in shard order.
+        """
+        responses = [shard.stats() for shard in self._shards]
+        return self._merge(responses, [response.data for response in responses])
+
+    def usage(self) -> Response:
+        """
+        :return: the usage of every shard, in shard order, quotas apply to each shard on its own.
+        """
+        responses = [shard.usage() for shard in self._shards]
+        return self._merge(responses, [response.data for response in responses])
+
+    def register_topic(self, topic: str, storage: str | None = None, partitions: int = 1,
+                       compression: str | None = None) -> Response:
+        return self.shard(topic).register_topic(topic, storage=storage, partitions=partitions, compression=compression)
+
+    def unregister_topic(self, topic: str) -> Response:
+        return self.shard(topic).unregister_topic(topic)
+
+    def register_consumer(self, consumer: str, group: str | None = None, topic: str | None = None) -> Response:
+        """
+        Register the consumer on every shard, and join its group on the shard of `topic` only.
+        """
+        group_shard = self.shard(topic) if group is not None else None
+        responses = [shard.register_consumer(consumer, group=group, topic=topic) if shard is group_shard
+                     else shard.register_consumer(consumer) for shard in self._shards]
+        return self._merge(responses, any(response.data for response in responses))
+
+    def unregister_consumer(self, consumer: str) -> Response:
+        responses = [shard.unregister_consumer(consumer) for shard in self._shards]
+        return self._merge(responses, consumer if any(response.data for response in responses) else False)
+
+    def join_group(self, consumer: str, group: str, topic: str) -> Response:
+        return self.shard(topic).join_group(consumer, group, topic)
+
+    def leave_group(self, consumer: str, group: str) -> Response:
+        responses = [shard.leave_group(consumer, group) for shard in self._shards]
+        return self._merge(responses, any(response.data for response in responses))
+
+    def produce(self, message: bytes, topic: str | None = None, ttl: float = -1.,
+                key: str | bytes | None = None, headers: dict[str, str] | None = None) -> Response:
+        """
+        A broadcast is produced on every shard, each of which makes a message of its own,
+        the message made by the first shard is returned.
+        """
+        if topic is not None:
+            return self.shard(topic).produce(message, topic, ttl=ttl, key=key, headers=headers)
+        responses = [shard.produce(message, ttl=ttl, key=key, headers=headers) for shard in self._shards]
+        return self._merge(responses, responses[0].data)
+
+    def produce_batch(self, messages: list[bytes], topic: str | None = None,
+                      ttl: float | list[float] = -1., key: str | bytes | None = None,
+                      headers: dict[str, str] | list[dict[str, str] | None] | None = None) -> Response:
+        if topic is not None:
+            return self.shard(topic).produce_batch(messages, topic, ttl=ttl, key=key, headers=headers)
+        responses = [shard.produce_batch(messages, ttl=ttl, key=key, headers=headers) for shard in self._shards]
+        return self._merge(responses, responses[0].data)
+
+    def consume(self, consumer: str, topic: str, timeout: float | None = None, decompress: bool = True,
+                key: str | None = None, headers: dict[str, str] | None = None) -> Response:
+        return self.shard(topic).consume(consumer, topic, timeout=timeout, decompress=decompress, key=key,
+                                         headers=headers)
+
+    def consume_batch(self, consumer: str, topic: str, n: int, advance: bool = False,
+                      timeout: float | None = None, decompress: bool = True, key: str | None = None,
+                      headers: dict[str, str] | None = None) -> Response:
+        return self.shard(topic).consume_batch(consumer, topic, n, advance=advance, timeout=timeout,
+                                               decompress=decompress, key=key, headers=headers)
+
+    def poll(self, consumer: str, topic: str, timeout: float | None = None, decompress: bool = True,
+             key: str | None = None, headers: dict[str, str] | None = None) -> Response:
+        return self.shard(topic).poll(consumer, topic, timeout=timeout, decompress=decompress, key=key,
+                                      headers=headers)
+
+    def advance(self, consumer: str, topic: str, n: int = 1) -> Response:
+        return self.shard(topic).advance(consumer, topic, n)
+
+    def retreat(self, consumer: str, topic: str, n: int = 1) -> Response:
+        return self.shard(topic).retreat(consumer, topic, n)
+
+    def seek_to_time(self, consumer: str, topic: str, timestamp: float) -> Response:
+        return self.shard(topic).seek_to_time(consumer, topic, timestamp)
+
+    def seek_to_offset(self, consumer: str, topic: str, offset: int, partition: int = 0) -> Response:
+        return self.shard(topic).seek_to_offset(consumer, topic, offset, partition)
+
+    def seek_to_end(self, consumer: str, topic: str) -> Response:
+        return self.shard(topic).seek_to_end(consumer, topic)
@@ -0,0 +1,3 @@
+from .codec import Codec
+from .json_codec import JsonCodec
+from .binary_codec import BinaryCodec, BINARY_MAGIC
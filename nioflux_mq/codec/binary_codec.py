@@ -0,0 +1,97 @@
+import json
+import struct
+
+from typing_extensions import Any, override
+
+from array import array
+
+from nioflux_mq.mq.message import Message
+from nioflux_mq.mq.compression import CompressedBatch, CompressedPayload
+from nioflux_mq.codec.codec import Codec
+
+BINARY_MAGIC = b'NFMQ'
+# magic, header length, body length
+FRAME_PREFIX = struct.Struct('!4sII')
+BLOB_KEY = '__blob__'
+COMPRESSED_KEY = '__compressed__'
+BATCH_KEY = '__batch__'
+
+
+class BinaryCodec(Codec):
+    """
+    Length-prefixed frames: `FRAME_PREFIX | header | body`.
+    The header is compact JSON in which every bytes value is replaced by a `{"__blob__": [offset, length]}`
+    reference into the body, the body is the raw bytes of those blobs, concatenated.
+    Payloads are never text encoded or escaped.
+    Compressed payloads are sent as `{"__compressed__": [batch, index]}`, the first of a batch carrying
+    the batch itself under `"__batch__"`, so that each batch is sent once, compressed.
+    """
+    @override
+    def split(self, buffer: bytearray) -> bytes | None:
+        if len(buffer) < FRAME_PREFIX.size:
+            return None
+        magic, header_length, body_length = FRAME_PREFIX.unpack_from(buffer)
+        if magic != BINARY_MAGIC:
+            raise ValueError(f'Bad frame magic: {bytes(magic)}')
+        frame_length = FRAME_PREFIX.size + header_length + body_length
+        if len(buffer) < frame_length:
+            return None
+        frame = bytes(buffer[:frame_length])
+        del buffer[:frame_length]
+        return frame
+
+    def encode_buffers(self, obj: Any) -> list[bytes]:
+        """
+        Encode `obj` as a list of buffers whose concatenation is the frame,
+        so that blobs can be written out without being copied into a single frame.
+        """
+        blobs, body_length, batches = [], 0, dict()
+
+        def default(o: Any) -> Any:
+            nonlocal body_length
+            if isinstance(o, (bytes, bytearray, memoryview)):
+                blobs.append(o)
+                body_length += len(o)
+                return {BLOB_KEY: [body_length - len(o), len(o)]}
+            if isinstance(o, CompressedPayload):
+                batch = batches.get(id(o.batch))
+                if batch is not None:
+                    return {COMPRESSED_KEY: [batch, o.index]}
+                batches[id(o.batch)] = len(batches)
+                return {COMPRESSED_KEY: [len(batches) - 1, o.index],
+                        BATCH_KEY: {'compression': o.batch.compression, 'data': o.batch.data,
+                                    'ends': struct.pack(f'!{len(o.batch.ends)}I', *o.batch.ends)}}
+            if isinstance(o, Message):
+                # a copy of the fields, live messages are never touched
+                return {'__class__': 'Message', '__dict__': o.as_dict()}
+            raise TypeError(f'Object of type {type(o).__name__} is not binary serializable')
+
+        header = json.dumps(obj, default=default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return [FRAME_PREFIX.pack(BINARY_MAGIC, len(header), body_length), header, *blobs]
+
+    @override
+    def encode(self, obj: Any) -> bytes:
+        return b''.join(self.encode_buffers(obj))
+
+    @override
+    def decode(self, frame: bytes) -> Any:
+        _, header_length, _ = FRAME_PREFIX.unpack_from(frame)
+        header_end = FRAME_PREFIX.size + header_length
+        batches = []
+
+        def object_hook(dct: dict) -> Any:
+            if BLOB_KEY in dct:
+                offset, length = dct[BLOB_KEY]
+                return frame[header_end + offset:header_end + offset + length]
+            if COMPRESSED_KEY in dct:
+                batch, index = dct[COMPRESSED_KEY]
+                if BATCH_KEY in dct:
+                    _batch = dct[BATCH_KEY]
+                    ends = array('I', struct.unpack(f'!{len(_batch["ends"]) // 4}I', _batch['ends']))
+                    batches.append(CompressedBatch(compression=_batch['compression'], data=_batch['data'], ends=ends))
+                return CompressedPayload(batches[batch], index)
+            if dct.get('__class__') == 'Message':
+                return Message(**dct['__dict__'])
+            return dct
+
+        return json.loads(frame[FRAME_PREFIX.size:header_end].decode('utf-8'), object_hook=object_hook)
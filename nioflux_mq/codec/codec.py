@@ -0,0 +1,23 @@
+from abc import abstractmethod
+
+from typing_extensions import Any
+
+
+class Codec:
+    @abstractmethod
+    def split(self, buffer: bytearray) -> bytes | None:
+        """
+        Pop one complete frame off the front of `buffer`.
+
+        :return: the frame, or `None` if `buffer` doesn't hold a complete frame yet.
+        """
+        ...
+
+    @abstractmethod
+    def encode(self, obj: Any) -> bytes:
+        # a complete frame, ready to be written to the wire
+        ...
+
+    @abstractmethod
+    def decode(self, frame: bytes) -> Any:
+        ...
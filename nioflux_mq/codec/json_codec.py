@@ -0,0 +1,43 @@
+import json
+
+from typing_extensions import Any, override
+
+from nioflux.server.server import DEFAULT_EOT
+
+from nioflux_mq.mq.message import Message
+from nioflux_mq.codec.codec import Codec
+
+
+class JsonCodec(Codec):
+    def __init__(self, eot: bytes = DEFAULT_EOT):
+        """
+        EOT-delimited UTF-8 JSON frames, bytes are carried as UTF-8 text.
+        """
+        self._eot = eot
+
+    @property
+    def eot(self) -> bytes:
+        return self._eot
+
+    @staticmethod
+    def default(obj):
+        if isinstance(obj, (bytes, bytearray, memoryview)):
+            return bytes(obj).decode('utf-8')
+        return Message.serialize(obj)
+
+    @override
+    def split(self, buffer: bytearray) -> bytes | None:
+        eot_at = buffer.find(self._eot)
+        if eot_at < 0:
+            return None
+        frame = bytes(buffer[:eot_at])
+        del buffer[:eot_at + len(self._eot)]
+        return frame
+
+    @override
+    def encode(self, obj: Any) -> bytes:
+        return json.dumps(obj, default=self.default).encode('utf-8') + self._eot
+
+    @override
+    def decode(self, frame: bytes) -> Any:
+        return json.loads(frame.decode('utf-8'), object_hook=Message.deserialize)
@@ -0,0 +1,23 @@
+import asyncio
+
+from typing_extensions import Any
+from typing_extensions import override
+
+from nioflux.pipeline.stage import PipelineStage
+
+from nioflux_mq.mq import MessageQueue
+from nioflux_mq.codec.binary_codec import BinaryCodec
+
+
+class BinaryDumpHandler(PipelineStage):
+    def __init__(self):
+        super().__init__(label='binary_dump_handler')
+        self._codec = BinaryCodec()
+
+    @override
+    async def __call__(self, data: dict, extra: MessageQueue, err: list[Exception], fire: bool,
+                       io_ctx: tuple[asyncio.StreamReader, asyncio.StreamWriter] | None) -> tuple[Any, Any, list[Exception], bool]:
+        data['err'] = [str(e) for e in err]
+        # a list of buffers, payloads are written out as they are stored
+        data = self._codec.encode_buffers(data)
+        return data, extra, err, fire
@@ -0,0 +1,21 @@
+import asyncio
+
+from typing_extensions import Any
+from typing_extensions import override
+
+from nioflux.pipeline.stage import PipelineStage
+
+from nioflux_mq.mq import MessageQueue
+from nioflux_mq.codec.binary_codec import BinaryCodec
+
+
+class BinaryLoadHandler(PipelineStage):
+    def __init__(self):
+        super().__init__(label='binary_load_handler')
+        self._codec = BinaryCodec()
+
+    @override
+    async def __call__(self, data: bytes, extra: MessageQueue, err: list[Exception], fire: bool,
+                       io_ctx: tuple[asyncio.StreamReader, asyncio.StreamWriter] | None) -> tuple[Any, Any, list[Exception], bool]:
+        data = self._codec.decode(data)
+        return data, extra, err, fire
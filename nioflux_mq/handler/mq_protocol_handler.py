@@ -1,17 +1,139 @@
 import asyncio
-import os
+import time
 
-from typing_extensions import Any, override
+from typing_extensions import Any, override, TYPE_CHECKING
 
 from nioflux import PipelineStage
 
-from nioflux_mq.snapshot import __PATH__
+from nioflux_mq.snapshot import snapshot_path
 from nioflux_mq.mq.message_queue import MessageQueue
+from nioflux_mq.mq.topic_waiters import TopicWaiters
+from nioflux_mq.mq.topic_executor import TopicExecutor
+from nioflux_mq.mq.metrics import Histogram
+from nioflux_mq.mq.consumer_group import PARTITION_SEPARATOR
+from nioflux_mq.mq.quota import QuotaExceeded, POLICY_BLOCK, DEFAULT_BLOCK_TIMEOUT
+from nioflux_mq.snapshot.replication_log import ReplicationLog, ACK_LEADER, ACK_FOLLOWER, ACKS, DEFAULT_FETCH_BYTES
+
+if TYPE_CHECKING:
+    from nioflux_mq.server.follower import Follower
+
+# acknowledged once durable, consume too when filtered, see `_writes`
+DURABLE_INSTRUCTIONS = {'register_topic', 'unregister_topic', 'register_consumer', 'unregister_consumer',
+                        'join_group', 'leave_group',
+                        'produce', 'produce_batch', 'consume_batch', 'poll', 'advance', 'retreat',
+                        'seek_to_time', 'seek_to_offset', 'seek_to_end'}
+# served by a follower, consume and consume_batch only as long as they leave offsets alone
+READ_INSTRUCTIONS = {'snapshot', 'topics', 'consumers', 'groups', 'stats', 'usage', 'consume', 'consume_batch',
+                     'replicate', 'promote'}
+# may let segments be dropped, making room for produces blocked on a quota
+RELEASING_INSTRUCTIONS = {'unregister_topic', 'unregister_consumer', 'leave_group', 'consume', 'consume_batch',
+                          'poll', 'advance', 'seek_to_time', 'seek_to_offset', 'seek_to_end'}
+# waiters of replication log appends, of follower acknowledgements and of room under quotas,
+# no topic name contains the separator
+REPLICATION_TOPIC = f'{PARTITION_SEPARATOR}replication'
+ACK_TOPIC = f'{PARTITION_SEPARATOR}ack'
+QUOTA_TOPIC = f'{PARTITION_SEPARATOR}quota'
+DEFAULT_ACK_TIMEOUT = 5.
 
 
 class NioFluxMQProtocolHandler(PipelineStage):
-    def __init__(self):
+    def __init__(self, waiters: TopicWaiters | None = None, executor: TopicExecutor | None = None,
+                 latency: Histogram | None = None, decompress: bool = True, replication_ack: str = ACK_LEADER,
+                 ack_timeout: float = DEFAULT_ACK_TIMEOUT, follower: 'Follower | None' = None,
+                 block_timeout: float = DEFAULT_BLOCK_TIMEOUT):
+        """
+        :param waiters: waiters notified by the served `MessageQueue` on produce, they enable
+        long-polling through the `timeout` of consume, consume_batch and poll.
+        Without them, those instructions return at once when nothing is available.
+        :param executor: runs the calls to the `MessageQueue`, which may block on its locks,
+        off the event loop. Without it, they run on the event loop.
+        :param latency: histogram of the time taken to serve each instruction, labeled by instruction,
+        long polls included.
+        :param decompress: whether payloads of compressed topics are always decompressed before they are sent,
+        as text codecs need. Otherwise they are sent as stored, one block per batch, for the client to decompress,
+        unless the consume, consume_batch or poll request asks for `decompress`.
+        :param replication_ack: with a replication log, `leader` acknowledges operations once durable
+        on the leader, `follower` once a follower has also applied them, failing them after `ack_timeout`
+        seconds without a follower's acknowledgement, though they stay applied on the leader.
+        :param follower: the follower keeping the served queue a replica, the queue is read only
+        as long as it follows, see the `promote` instruction.
+        :param block_timeout: seconds a produce over a `block` quota is held back, waiting for consumers
+        to make room, before it fails. Without waiters, it fails at once.
+        """
         super().__init__(label='nioflux_mq_protocol_handler')
+        if replication_ack not in ACKS:
+            raise ValueError(f'Unsupported replication ack: {replication_ack}')
+        self._waiters = waiters
+        self._executor = executor
+        self._latency = latency
+        self._decompress = decompress
+        self._replication_ack = replication_ack
+        self._ack_timeout = ack_timeout
+        self._follower = follower
+        self._block_timeout = block_timeout
+
+    async def _call(self, topic: str | None, fn, /, **kwargs):
+        if self._executor is None:
+            return fn(**kwargs)
+        return await self._executor.run(topic, fn, **kwargs)
+
+    async def _long_poll(self, topic: str, check, timeout: float | None):
+        if self._waiters is None:
+            return await check()
+        return await self._waiters.wait_for(topic=topic, check=check, timeout=timeout)
+
+    @staticmethod
+    def _writes(instruction: str, payload: dict | None) -> bool:
+        if instruction in ('consume', 'consume_batch'):
+            # filtered reads move offsets to what they find
+            return payload.get('advance', False) or payload.get('key') is not None or bool(payload.get('headers'))
+        return instruction not in READ_INSTRUCTIONS
+
+    async def _produce(self, topic: str | None, fn, /, **kwargs):
+        exceeded = None
+
+        async def check():
+            nonlocal exceeded
+            try:
+                return await self._call(topic, fn, **kwargs)
+            except QuotaExceeded as e:
+                if e.quota is None or e.quota.policy != POLICY_BLOCK:
+                    raise
+                exceeded = e
+                return None
+        result = await self._long_poll(QUOTA_TOPIC, check, self._block_timeout)
+        if result is None:
+            raise exceeded
+        return result
+
+    async def _replicate(self, mq: MessageQueue, follower: str, since: int | None = None,
+                         max_bytes: int = DEFAULT_FETCH_BYTES, timeout: float | None = None) -> dict:
+        replication = mq.replication
+        if replication is None:
+            raise ValueError('Replication is not enabled.')
+        if since is not None:
+            # asking from `since` on, the follower has applied every record before it
+            replication.acknowledge(follower, since - 1)
+            if self._waiters is not None:
+                self._waiters.notify([ACK_TOPIC])
+            records = replication.since(since, max_bytes)
+            if records == []:
+                async def check():
+                    return replication.since(since, max_bytes)
+                records = await self._long_poll(REPLICATION_TOPIC, check, timeout)
+            if records is not None:
+                return {'sequence': since + len(records) - 1, 'head': replication.sequence, 'records': records}
+        # a new follower, or one too far behind
+        sequence, snapshot = await asyncio.wrap_future(await self._call(None, mq.replication_snapshot))
+        return {'sequence': sequence, 'head': replication.sequence, 'snapshot': snapshot}
+
+    async def _acknowledged(self, replication: ReplicationLog):
+        sequence = replication.sequence
+
+        async def check():
+            return True if replication.acknowledged() >= sequence else None
+        if await self._long_poll(ACK_TOPIC, check, self._ack_timeout) is None:
+            raise TimeoutError(f'Record {sequence} not acknowledged by a follower within {self._ack_timeout}s.')
 
     # noinspection PyTypedDict
     @override
@@ -20,36 +142,107 @@ class NioFluxMQProtocolHandler(PipelineStage):
         mq = extra
         instruction = data['instruction']
         payload = data['payload']
+        started_at = time.perf_counter()
         resp = {'success': True, 'info': None, 'err': []}
+        if 'id' in data:
+            # echoed, so that a client pipelining requests can tell whose response this is
+            resp['id'] = data['id']
+        if len(err) > 0:
+            # refused by an earlier stage, see `RateLimitHandler`
+            resp['success'] = False
+            return resp, mq, err, fire
         try:
+            if self._follower is not None and self._follower.following and self._writes(instruction, payload):
+                raise ValueError(f'Read only while following {self._follower.leader}: {instruction}')
             match instruction:
                 case 'snapshot':
-                    path = os.path.join(os.getenv('MQ_SNAPSHOT_DIR', __PATH__), 'snapshot')
-                    extra.save(path=path)
-                    resp['info'] = path
+                    path = snapshot_path()
+                    # serialized on the snapshot thread, the event loop only waits for it
+                    resp['info'] = await asyncio.wrap_future(await self._call(None, mq.snapshot, path=path))
                 case 'topics':
                     resp['info'] = list(mq.topics)
                 case 'consumers':
                     resp['info'] = list(mq.consumers)
+                case 'groups':
+                    resp['info'] = mq.groups
+                case 'stats':
+                    resp['info'] = await self._call(None, mq.stats)
+                    if self._latency is not None:
+                        resp['info']['instructions'] = {_instruction: self._latency.summary(_instruction)
+                                                        for _instruction in self._latency.values().keys()}
+                    if self._follower is not None:
+                        resp['info']['follower'] = self._follower.stats()
+                case 'usage':
+                    resp['info'] = await self._call(None, mq.usage)
                 case 'register_topic':
-                    resp['info'] = mq.register_topic(**payload)
+                    resp['info'] = await self._call(None, mq.register_topic, **payload)
                 case 'unregister_topic':
-                    resp['info'] = mq.unregister_topic(**payload)
+                    resp['info'] = await self._call(None, mq.unregister_topic, **payload)
                 case 'register_consumer':
-                    resp['info'] = mq.register_consumer(**payload)
+                    resp['info'] = await self._call(None, mq.register_consumer, **payload)
                 case 'unregister_consumer':
-                    resp['info'] = mq.unregister_consumer(**payload)
+                    resp['info'] = await self._call(None, mq.unregister_consumer, **payload)
+                case 'join_group':
+                    resp['info'] = await self._call(None, mq.join_group, **payload)
+                case 'leave_group':
+                    resp['info'] = await self._call(None, mq.leave_group, **payload)
                 case 'produce':
-                    payload['message'] = payload['message'].encode('utf-8')
-                    resp['info'] = mq.produce(**payload)
+                    if isinstance(payload['message'], str):
+                        payload['message'] = payload['message'].encode('utf-8')
+                    resp['info'] = await self._produce(payload.get('topic'), mq.produce, **payload)
+                case 'produce_batch':
+                    payload['messages'] = [message.encode('utf-8') if isinstance(message, str) else message
+                                           for message in payload['messages']]
+                    resp['info'] = await self._produce(payload.get('topic'), mq.produce_batch, **payload)
                 case 'consume':
-                    resp['info'] = mq.consume(**payload)
+                    timeout = payload.pop('timeout', None)
+                    payload['decompress'] = self._decompress or payload.get('decompress', False)
+                    resp['info'] = await self._long_poll(payload['topic'],
+                                                         lambda: self._call(payload['topic'], mq.consume, **payload),
+                                                         timeout)
+                case 'consume_batch':
+                    timeout = payload.pop('timeout', None)
+                    payload['decompress'] = self._decompress or payload.get('decompress', False)
+                    resp['info'] = await self._long_poll(payload['topic'],
+                                                         lambda: self._call(payload['topic'], mq.consume_batch,
+                                                                            **payload),
+                                                         timeout)
+                case 'poll':
+                    timeout = payload.pop('timeout', None)
+                    payload['decompress'] = self._decompress or payload.get('decompress', False)
+                    resp['info'] = await self._long_poll(payload['topic'],
+                                                         lambda: self._call(payload['topic'], mq.poll, **payload),
+                                                         timeout)
                 case 'advance':
-                    mq.advance(**payload)
+                    await self._call(payload['topic'], mq.advance, **payload)
                 case 'retreat':
-                    mq.retreat(**payload)
+                    await self._call(payload['topic'], mq.retreat, **payload)
+                case 'seek_to_time':
+                    await self._call(payload['topic'], mq.seek_to_time, **payload)
+                case 'seek_to_offset':
+                    await self._call(payload['topic'], mq.seek_to_offset, **payload)
+                case 'seek_to_end':
+                    await self._call(payload['topic'], mq.seek_to_end, **payload)
+                case 'replicate':
+                    resp['info'] = await self._replicate(mq, **payload)
+                case 'promote':
+                    resp['info'] = self._follower is not None and self._follower.following
+                    if resp['info']:
+                        # waits out the fetch in flight
+                        await asyncio.to_thread(self._follower.stop)
                 case _:
                     raise ValueError(f'Unsupported instruction: {instruction}')
+            if instruction in RELEASING_INSTRUCTIONS and self._waiters is not None \
+                    and self._waiters.waiting(QUOTA_TOPIC):
+                self._waiters.notify([QUOTA_TOPIC])
+            if instruction in DURABLE_INSTRUCTIONS or self._writes(instruction, payload):
+                # acknowledge only once the operation is durable under the write-ahead log's fsync policy,
+                # a filtered consume included, it moves the offset to the match it answers with
+                await asyncio.wrap_future(mq.sync())
+                if self._replication_ack == ACK_FOLLOWER and mq.replication is not None:
+                    await self._acknowledged(mq.replication)
+            if self._latency is not None:
+                self._latency.observe(time.perf_counter() - started_at, instruction)
         except Exception as e:
             err.append(e)
             resp['success'] = False
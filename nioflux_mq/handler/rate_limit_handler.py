@@ -0,0 +1,72 @@
+import asyncio
+import weakref
+
+from typing_extensions import Any
+from typing_extensions import override
+
+from nioflux.pipeline.stage import PipelineStage
+
+from nioflux_mq.mq import MessageQueue
+from nioflux_mq.mq.quota import TokenBucket, QuotaExceeded
+
+DEFAULT_MAX_DELAY = 1.
+
+
+class RateLimitHandler(PipelineStage):
+    def __init__(self, rate: float | None = None, byte_rate: float | None = None, burst: float = 1.,
+                 max_delay: float = DEFAULT_MAX_DELAY):
+        """
+        Rate limits of each producer connection, placed ahead of `NioFluxMQProtocolHandler`:
+        token buckets refilled at `rate` messages and `byte_rate` payload bytes per second,
+        each holding up to `burst` seconds of them. `None` leaves either unlimited.
+
+        A produce beyond them is held back until the buckets refill, so a connection is slowed down
+        to its rate, and refused with `QuotaExceeded` if that would take over `max_delay` seconds,
+        which the protocol handler answers without serving it. A produce costing more than a bucket holds
+        is refused outright, payloads cost their UTF-8 bytes whatever the codec.
+        """
+        super().__init__(label='rate_limit_handler')
+        self._rate = rate
+        self._byte_rate = byte_rate
+        self._burst = burst
+        self._max_delay = max_delay
+        # by connection, forgotten along with it
+        self._buckets: weakref.WeakKeyDictionary[asyncio.StreamWriter, list[TokenBucket]] = \
+            weakref.WeakKeyDictionary()
+
+    def _buckets_of(self, writer: asyncio.StreamWriter) -> list[TokenBucket]:
+        buckets = self._buckets.get(writer)
+        if buckets is None:
+            buckets = [TokenBucket(rate, rate * self._burst) if rate is not None else None
+                       for rate in (self._rate, self._byte_rate)]
+            self._buckets[writer] = buckets
+        return buckets
+
+    @override
+    async def __call__(self, data: dict, extra: MessageQueue, err: list[Exception], fire: bool,
+                       io_ctx: tuple[asyncio.StreamReader, asyncio.StreamWriter] | None) -> tuple[Any, Any, list[Exception], bool]:
+        instruction = data.get('instruction')
+        if io_ctx is None or instruction not in ('produce', 'produce_batch'):
+            return data, extra, err, fire
+        payload = data['payload']
+        messages = [payload['message']] if instruction == 'produce' else payload['messages']
+        # payloads arrive as text through the JSON codec, charged by their UTF-8 bytes
+        costs = (len(messages), sum(len(message.encode('utf-8')) if isinstance(message, str) else len(message)
+                                    for message in messages))
+        buckets = self._buckets_of(io_ctx[1])
+        for bucket, cost, unit in zip(buckets, costs, ('messages', 'bytes')):
+            if bucket is not None and cost > bucket.burst:
+                # the bucket never holds enough tokens for it, however long it waits
+                err.append(QuotaExceeded(f'Produce of {cost} {unit} exceeds the burst of the connection, '
+                                         f'{bucket.burst:.0f} {unit}, split it into smaller batches.'))
+                return data, extra, err, fire
+        delay = max((bucket.delay(cost) for bucket, cost in zip(buckets, costs) if bucket is not None), default=.0)
+        if delay > self._max_delay:
+            err.append(QuotaExceeded(f'Rate limit of the connection exceeded, retry in {delay:.3f}s.'))
+            return data, extra, err, fire
+        for bucket, cost in zip(buckets, costs):
+            if bucket is not None:
+                bucket.take(cost)
+        if delay > .0:
+            await asyncio.sleep(delay)
+        return data, extra, err, fire
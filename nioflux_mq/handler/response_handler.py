@@ -3,16 +3,23 @@ from typing_extensions import Any
 from typing_extensions import override
 
 from nioflux.pipeline.stage import PipelineStage
+from nioflux.server.server import DEFAULT_EOT
 
 from nioflux_mq.mq import MessageQueue
 
 
 class ResponseHandler(PipelineStage):
-    def __init__(self):
+    def __init__(self, eot: bytes = DEFAULT_EOT):
         super().__init__(label='response_handler')
+        self._eot = eot
 
     @override
-    async def __call__(self, data: bytes, extra: MessageQueue, err: list[Exception], fire: bool,
+    async def __call__(self, data: bytes | list[bytes], extra: MessageQueue, err: list[Exception], fire: bool,
                        io_ctx: tuple[asyncio.StreamReader, asyncio.StreamWriter] | None) -> tuple[Any, Any, list[Exception], bool]:
-        io_ctx[1].write(data)
+        if isinstance(data, list):
+            # self-delimiting frame given as a list of buffers
+            io_ctx[1].writelines(data)
+        else:
+            # responses are EOT-delimited as well, so a channel can carry many of them
+            io_ctx[1].write(data + self._eot)
         return data, extra, err, not fire
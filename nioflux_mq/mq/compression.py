@@ -0,0 +1,165 @@
+import lzma
+import zlib
+from abc import abstractmethod
+from array import array
+
+from nioflux_mq.mq.message import Message
+
+COMPRESSION_ZLIB = 'zlib'
+COMPRESSION_LZMA = 'lzma'
+
+
+class Compression:
+    name: str
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        ...
+
+    @abstractmethod
+    def decompress(self, data: bytes | memoryview) -> bytes:
+        ...
+
+
+class ZlibCompression(Compression):
+    name = COMPRESSION_ZLIB
+
+    def __init__(self, level: int = 6):
+        self._level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self._level)
+
+    def decompress(self, data: bytes | memoryview) -> bytes:
+        return zlib.decompress(data)
+
+
+class LzmaCompression(Compression):
+    """
+    Smaller than zlib, several times slower to compress.
+    """
+    name = COMPRESSION_LZMA
+
+    def __init__(self, preset: int = 6):
+        self._preset = preset
+
+    def compress(self, data: bytes) -> bytes:
+        return lzma.compress(data, format=lzma.FORMAT_XZ, preset=self._preset)
+
+    def decompress(self, data: bytes | memoryview) -> bytes:
+        return lzma.decompress(data, format=lzma.FORMAT_XZ)
+
+
+_COMPRESSIONS: dict[str, Compression] = {COMPRESSION_ZLIB: ZlibCompression(), COMPRESSION_LZMA: LzmaCompression()}
+
+
+def register_compression(compression: Compression):
+    """
+    Make `compression` available to topics by its name, in the server and in clients alike,
+    since both ends decompress.
+    """
+    _COMPRESSIONS[compression.name] = compression
+
+
+def compression_of(name: str) -> Compression:
+    compression = _COMPRESSIONS.get(name)
+    if compression is None:
+        raise ValueError(f'Unsupported compression: {name}')
+    return compression
+
+
+def compressions() -> list[str]:
+    return list(_COMPRESSIONS.keys())
+
+
+class CompressedBatch:
+    __slots__ = ('compression', 'data', 'ends')
+
+    def __init__(self, compression: str, data: bytes | memoryview, ends: array):
+        """
+        The payloads of messages produced together, concatenated and compressed as a single block,
+        which compresses far better than each payload on its own. `ends` holds where each payload ends
+        in the decompressed block.
+        """
+        self.compression = compression
+        self.data = data
+        self.ends = ends
+
+    @staticmethod
+    def build(compression: str, payloads: list[bytes | memoryview]) -> 'CompressedBatch':
+        ends, end = array('I'), 0
+        for payload in payloads:
+            end += len(payload)
+            ends.append(end)
+        return CompressedBatch(compression=compression, data=compression_of(compression).compress(b''.join(payloads)),
+                               ends=ends)
+
+    def __len__(self) -> int:
+        return len(self.ends)
+
+    def payloads(self) -> list[bytes]:
+        block = compression_of(self.compression).decompress(self.data)
+        return [block[start:end] for start, end in zip((0, *self.ends), self.ends)]
+
+
+class CompressedPayload:
+    __slots__ = ('batch', 'index')
+
+    def __init__(self, batch: CompressedBatch, index: int):
+        """
+        The payload of a message, the `index`-th of its batch, as stored in a compressed topic.
+        """
+        self.batch = batch
+        self.index = index
+
+    def decompress(self) -> bytes:
+        # the whole batch is decompressed, see `decompress_messages` to decompress many
+        return self.batch.payloads()[self.index]
+
+    def __repr__(self) -> str:
+        return f'CompressedPayload({self.batch.compression}, {self.index}/{len(self.batch)})'
+
+
+def stored_size(payload: bytes | memoryview | CompressedPayload) -> int:
+    # a compressed payload takes its share of the batch
+    if isinstance(payload, CompressedPayload):
+        return -(-len(payload.batch.data) // len(payload.batch))
+    return len(payload)
+
+
+def compress_messages(compression: str, messages: list[Message]) -> list[Message]:
+    """
+    :return: copies of `messages` whose payloads are compressed together as a single batch.
+    """
+    batch = CompressedBatch.build(compression, [message.payload for message in messages])
+    return [Message(id=message.id, payload=CompressedPayload(batch, i), timestamp=message.timestamp,
+                    ttl=message.ttl, timeout=message.timeout, key=message.key, headers=message.headers)
+            for i, message in enumerate(messages)]
+
+
+def decompress_message(message: Message) -> Message:
+    """
+    Replace the compressed payload of `message` with its bytes, in place.
+
+    :return: `message`.
+    """
+    if isinstance(message.payload, CompressedPayload):
+        message.payload = message.payload.decompress()
+    return message
+
+
+def decompress_messages(messages: list[Message]) -> list[Message]:
+    """
+    Replace compressed payloads of `messages` with their bytes, in place, decompressing each batch once.
+
+    :return: `messages`.
+    """
+    batches = dict()
+    for message in messages:
+        payload = message.payload
+        if isinstance(payload, CompressedPayload):
+            payloads = batches.get(id(payload.batch))
+            if payloads is None:
+                payloads = batches[id(payload.batch)] = payload.batch.payloads()
+            message.payload = payloads[payload.index]
+    return messages
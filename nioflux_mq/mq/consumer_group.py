@@ -0,0 +1,106 @@
+PARTITION_SEPARATOR = '\x1f'
+# name of the log broadcasts are written to, once for every topic, no topic name contains the separator
+BROADCAST_LOG = PARTITION_SEPARATOR
+BROADCAST_PARTITION = -1
+
+
+def partition_name(topic: str, partition: int) -> str:
+    """
+    Name of the log of a partition, the first partition of a topic is logged under the topic's own name,
+    so that a topic of one partition is a plain topic.
+    """
+    return topic if partition == 0 else f'{topic}{PARTITION_SEPARATOR}{partition}'
+
+
+def parse_partition_name(name: str) -> tuple[str, int]:
+    if name == BROADCAST_LOG:
+        return '', BROADCAST_PARTITION
+    topic, _, partition = name.partition(PARTITION_SEPARATOR)
+    return topic, int(partition) if len(partition) > 0 else 0
+
+
+def group_key(group: str) -> str:
+    # the key group offsets are stored under in a partition's log, it never collides with a consumer name
+    return f'{PARTITION_SEPARATOR}{group}'
+
+
+def broadcast_key(key: str, topic: str) -> str:
+    """
+    The key the broadcast offset of a consumer or group (`key`) is stored under for `topic`,
+    every topic reads the broadcasts on its own.
+    """
+    return f'{key}{PARTITION_SEPARATOR}{topic}'
+
+
+def parse_broadcast_key(key: str) -> tuple[str, str]:
+    _key, _, topic = key.rpartition(PARTITION_SEPARATOR)
+    return _key, topic
+
+
+def broadcast_start_key(topic: str) -> str:
+    # offset of the first broadcast to `topic`, those produced before it was registered are not for it
+    return f'{PARTITION_SEPARATOR}{PARTITION_SEPARATOR}{PARTITION_SEPARATOR}{topic}'
+
+
+class ConsumerGroup:
+    def __init__(self, name: str, topic: str, partitions: int):
+        """
+        Consumers sharing the offsets of a topic, each partition of which is read by a single member.
+        Partitions are assigned round-robin over the members in name order, and reassigned on every join
+        and leave. Members beyond the number of partitions stay idle.
+        """
+        self._name = name
+        self._topic = topic
+        self._partitions = partitions
+        self._members: list[str] = []
+        self._assignment: dict[str, tuple[int, ...]] = dict()
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def topic(self) -> str:
+        return self._topic
+
+    @property
+    def partitions(self) -> int:
+        return self._partitions
+
+    @property
+    def members(self) -> list[str]:
+        return self._members.copy()
+
+    @property
+    def assignment(self) -> dict[str, list[int]]:
+        return {member: list(partitions) for member, partitions in self._assignment.items()}
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def __contains__(self, member: str) -> bool:
+        return member in self._assignment
+
+    def partitions_of(self, member: str) -> tuple[int, ...]:
+        return self._assignment.get(member, ())
+
+    def _rebalance(self):
+        assignment = {member: [] for member in self._members}
+        for partition in range(self._partitions if len(self._members) > 0 else 0):
+            assignment[self._members[partition % len(self._members)]].append(partition)
+        # replaced as a whole, readers never see a partial assignment
+        self._assignment = {member: tuple(partitions) for member, partitions in assignment.items()}
+
+    def join(self, member: str) -> bool:
+        if member in self._members:
+            return False
+        self._members = sorted([*self._members, member])
+        self._rebalance()
+        return True
+
+    def leave(self, member: str) -> bool:
+        if member not in self._members:
+            return False
+        self._members = [_member for _member in self._members if _member != member]
+        self._rebalance()
+        return True
@@ -1,30 +1,119 @@
+import itertools
+import struct
 import time
-import uuid
 from dataclasses import dataclass
 
+ID_LENGTH = 16
+# set on the id length of a stored message whose id is followed by its key and headers, see `pack_attributes`
+ATTRIBUTES_FLAG = 0x8000
+# key length, -1 without a key, number of headers
+_ATTRIBUTES = struct.Struct('!iH')
+# header name length, header value length
+_HEADER = struct.Struct('!HI')
+# ids increase monotonically, seeded by the wall clock so they keep increasing across restarts
+__IDS = itertools.count(time.time_ns())
+# the latest time handed out by `clock`
+__LATEST = .0
+# timestamps below this were taken from `time.perf_counter()` by earlier versions, no uptime counts a billion seconds
+_WALL_CLOCK_FROM = 1e9
 
-@dataclass
+
+def format_id(n: int) -> str:
+    return format(n, f'0{ID_LENGTH}x')
+
+
+def parse_id(_id: str) -> int | None:
+    """
+    :return: the integer behind an id made by `Message.build`, `None` for ids of any other form.
+    """
+    if len(_id) != ID_LENGTH:
+        return None
+    try:
+        return int(_id, 16)
+    except ValueError:
+        return None
+
+
+def clock() -> float:
+    """
+    Wall clock time in seconds since the epoch, held back rather than going backwards within the process,
+    so that message timestamps mean the same across restarts, snapshots and replicas, and ascend along a log.
+    """
+    global __LATEST
+    now = time.time()
+    if now < __LATEST:
+        return __LATEST
+    __LATEST = now
+    return now
+
+
+def wall_clock(timestamp: float) -> float:
+    """
+    :return: `timestamp` as time since the epoch, converting a timestamp taken from `time.perf_counter()`
+    by an earlier version, which only held for the uptime of the host that took it.
+    """
+    return timestamp if timestamp >= _WALL_CLOCK_FROM else timestamp - time.perf_counter() + time.time()
+
+
+def next_id() -> int:
+    return next(__IDS)
+
+
+def skip_ids(past: int):
+    """
+    Make every id from now on greater than `past`, the id of a message made by another process,
+    such as the leader a follower replicates.
+    """
+    global __IDS
+    if next(__IDS) <= past:
+        __IDS = itertools.count(past + 1)
+
+
+@dataclass(slots=True)
 class Message:
     id: str
-    payload: bytes
+    payload: bytes | memoryview
     timestamp: float
     ttl: float
     timeout: bool = False
+    key: str | None = None
+    headers: dict[str, str] | None = None
 
     @staticmethod
-    def build(payload: bytes, ttl: float):
+    def build(payload: bytes, ttl: float, key: str | None = None, headers: dict[str, str] | None = None):
         return Message(payload=payload,
-                       timestamp=time.perf_counter(),
-                       id=uuid.uuid4().hex, ttl=ttl)
+                       timestamp=clock(),
+                       id=format_id(next_id()), ttl=ttl, key=key, headers=headers)
+
+    @property
+    def has_attributes(self) -> bool:
+        return self.key is not None or self.headers is not None
+
+    def as_dict(self) -> dict:
+        _dict = {
+            'id': self.id,
+            'payload': self.payload,
+            'timestamp': self.timestamp,
+            'ttl': self.ttl,
+            'timeout': self.timeout
+        }
+        # only sent when set, most messages have neither
+        if self.key is not None:
+            _dict['key'] = self.key
+        if self.headers is not None:
+            _dict['headers'] = self.headers.copy()
+        return _dict
 
     @staticmethod
     def serialize(obj):
         if isinstance(obj, Message):
-            if isinstance(obj.__dict__['payload'], bytes):
-                obj.__dict__['payload'] = obj.__dict__['payload'].decode('utf-8')
+            # serialize a copy, the message may still be live in a queue
+            _dict = obj.as_dict()
+            if isinstance(_dict['payload'], (bytes, memoryview)):
+                _dict['payload'] = bytes(_dict['payload']).decode('utf-8')
             return {
                 '__class__': 'Message',
-                '__dict__': obj.__dict__
+                '__dict__': _dict
             }
 
     @staticmethod
@@ -32,6 +121,49 @@ class Message:
         if dct.get('__class__') == 'Message':
             message = Message.build(b'', -1)
             dct['__dict__']['payload'] = dct['__dict__']['payload'].encode('utf-8')
-            message.__dict__.update(dct['__dict__'])
+            for k, v in dct['__dict__'].items():
+                setattr(message, k, v)
             return message
         return dct
+
+
+def pack_attributes(key: str | None, headers: dict[str, str] | None) -> bytes:
+    """
+    Encode the key and headers of a message, as stored after its id in segments, snapshots
+    and the write-ahead log when its id length carries `ATTRIBUTES_FLAG`.
+    """
+    _key = key.encode('utf-8') if key is not None else b''
+    parts = [_ATTRIBUTES.pack(len(_key) if key is not None else -1, len(headers or ())), _key]
+    for name, value in (headers or dict()).items():
+        _name, _value = name.encode('utf-8'), value.encode('utf-8')
+        parts.append(_HEADER.pack(len(_name), len(_value)))
+        parts.append(_name)
+        parts.append(_value)
+    return b''.join(parts)
+
+
+def unpack_attributes(b: bytes | memoryview, at: int = 0) -> tuple[str | None, dict[str, str] | None, int]:
+    """
+    :return: the key and headers encoded by `pack_attributes` at `at` in `b`, and where they end.
+    """
+    key_length, n = _ATTRIBUTES.unpack_from(b, at)
+    at += _ATTRIBUTES.size
+    key = None
+    if key_length >= 0:
+        key = bytes(b[at:at + key_length]).decode('utf-8')
+        at += key_length
+    headers = dict() if n > 0 else None
+    for _ in range(n):
+        name_length, value_length = _HEADER.unpack_from(b, at)
+        at += _HEADER.size
+        name = bytes(b[at:at + name_length]).decode('utf-8')
+        at += name_length
+        headers[name] = bytes(b[at:at + value_length]).decode('utf-8')
+        at += value_length
+    return key, headers, at
+
+
+__EXPIRED = 'EXPIRED'
+EXPIRED_MESSAGE = Message(id=__EXPIRED, payload=__EXPIRED.encode('utf-8'),
+                          timestamp=clock(), ttl=-1.,
+                          timeout=False)
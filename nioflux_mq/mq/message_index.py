@@ -0,0 +1,79 @@
+from array import array
+from bisect import bisect_left
+
+from typing_extensions import Iterator
+
+from nioflux_mq.mq.message import Message
+
+# the term of a message's key, header terms are `(name, value)`
+_KEY = None
+
+
+def terms_of(key: str | None, headers: dict[str, str] | None) -> list[tuple[str | None, str]]:
+    terms = [(_KEY, key)] if key is not None else []
+    if headers is not None:
+        terms.extend(headers.items())
+    return terms
+
+
+def matches(message: Message, key: str | None, headers: dict[str, str] | None) -> bool:
+    """
+    :return: whether `message` has the key `key`, if given, and every header of `headers`.
+    """
+    if key is not None and message.key != key:
+        return False
+    if headers:
+        _headers = message.headers
+        if _headers is None:
+            return False
+        for name, value in headers.items():
+            if _headers.get(name) != value:
+                return False
+    return True
+
+
+class MessageIndex:
+    def __init__(self):
+        """
+        Secondary index of a `TopicLog`: the offsets of the messages of each key and of each header value,
+        ascending since they are added as messages are appended.
+        Messages with neither a key nor headers are not indexed, and cost nothing.
+        """
+        self._offsets: dict[tuple[str | None, str], array] = dict()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def add(self, offset: int, message: Message):
+        for term in terms_of(message.key, message.headers):
+            offsets = self._offsets.get(term)
+            if offsets is None:
+                offsets = self._offsets[term] = array('Q')
+            offsets.append(offset)
+
+    def candidates(self, key: str | None, headers: dict[str, str] | None, start: int) -> Iterator[int]:
+        """
+        The offsets from `start` on of messages which may match the filter, in order: those of its rarest term.
+        Each message must still be checked with `matches`, for the other terms and since expired
+        messages stay indexed until their segment is dropped.
+        """
+        postings = []
+        for term in terms_of(key, headers):
+            offsets = self._offsets.get(term)
+            if offsets is None:
+                return
+            postings.append(offsets)
+        if len(postings) < 1:
+            return
+        offsets = min(postings, key=len)
+        for i in range(bisect_left(offsets, start), len(offsets)):
+            yield offsets[i]
+
+    def trim(self, base_offset: int):
+        # drop the offsets of dropped segments, and the terms left without any
+        for term, offsets in list(self._offsets.items()):
+            i = bisect_left(offsets, base_offset)
+            if i >= len(offsets):
+                del self._offsets[term]
+            elif i > 0:
+                del offsets[:i]
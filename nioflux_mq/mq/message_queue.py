@@ -1,37 +1,113 @@
+import io
+import itertools
 import logging
 import os
 import json
 import time
-from threading import RLock
+import zlib
+from concurrent.futures import ThreadPoolExecutor, Future
+from threading import RLock, Event
 
-from vortezwohl.concurrent import ThreadPool
+from typing_extensions import Callable
 
-from nioflux_mq.mq.message import Message
+from vortezwohl.concurrent import ThreadPool
 
-__EXPIRED = 'EXPIRED'
-EXPIRED_MESSAGE = Message(id=__EXPIRED, payload=__EXPIRED.encode('utf-8'),
-                          timestamp=time.perf_counter(), ttl=-1.,
-                          timeout=False)
+from nioflux_mq.mq.message import Message, EXPIRED_MESSAGE, parse_id, skip_ids, clock, wall_clock
+from nioflux_mq.mq.topic_log import TopicLog, FrozenTopicLog, DEFAULT_SEGMENT_SIZE
+from nioflux_mq.mq.message_index import matches
+from nioflux_mq.mq.mmap_segment import MapCache, DEFAULT_MAX_MAPS
+from nioflux_mq.mq.storage import MemoryStorage, MmapStorage, STORAGE_MEMORY, STORAGE_MMAP, STORAGES
+from nioflux_mq.mq.metrics import Counter, Gauge, Histogram
+from nioflux_mq.mq.compression import compression_of, compress_messages, decompress_message, decompress_messages, \
+    stored_size
+from nioflux_mq.mq.quota import Quota, QuotaExceeded, POLICY_DROP_OLDEST
+from nioflux_mq.mq.consumer_group import ConsumerGroup, PARTITION_SEPARATOR, BROADCAST_LOG, partition_name, \
+    parse_partition_name, group_key, broadcast_key, parse_broadcast_key, broadcast_start_key
+from nioflux_mq.snapshot import binary_snapshot, write_ahead_log, segment_dir
+from nioflux_mq.snapshot.write_ahead_log import WriteAheadLog
+from nioflux_mq.snapshot.replication_log import ReplicationLog
 
 logger = logging.getLogger('nioflux.mq')
 gc_logger = logging.getLogger('nioflux.mq.gc')
 
+DEFAULT_GC_BATCH_SIZE = 1024
+DEFAULT_SNAPSHOT_BUFFER_SIZE = 1 << 20
+
 
 class MessageQueue:
-    def __init__(self, gc_interval: int = 15):
+    def __init__(self, gc_interval: int = 15, segment_size: int = DEFAULT_SEGMENT_SIZE,
+                 gc_batch_size: int = DEFAULT_GC_BATCH_SIZE, wal: WriteAheadLog | None = None,
+                 storage: str = STORAGE_MEMORY, storage_dir: str | None = None, max_maps: int = DEFAULT_MAX_MAPS,
+                 replication: ReplicationLog | None = None, quota: Quota | None = None,
+                 topic_quotas: dict[str, Quota] | None = None):
         """
         Lock hierarchy:
-        queue_pool_lock -> consumer_topic_offset_lock -> consumer_pool_lock -> topic_pool_lock
+        snapshot_lock -> topic_pool_lock -> consumer_pool_lock -> TopicLog.lock (in topic order) -> broadcast lock
+
+        topic_pool_lock and consumer_pool_lock guard the registries and are only taken to register or
+        unregister, produce and consume only take the lock of the topic they touch.
+        Consumer groups are guarded by consumer_pool_lock.
+
+        A topic is split into partitions, each of which is a `TopicLog` of its own, see `partition_name`.
+        Broadcasts are appended once to a log shared by every topic, which readers of a topic's first partition
+        merge with it by message id, keeping their broadcast offsets in it, see `broadcast_key`.
+
+        Operations are recorded to `wal`, if given, under the lock they mutate state under,
+        so that a frozen snapshot and the write-ahead log generation it starts agree.
+        They are recorded to `replication` alike, for followers to fetch, see `apply`.
+
+        :param storage: default storage of topics, `memory` keeps messages on the heap, `mmap` keeps them
+        in segment files under `storage_dir` (`MQ_SNAPSHOT_DIR/segments` by default) read back through
+        memory maps, of which at most `max_maps` are open at once, so topics can outgrow the memory.
+        :param quota: limits on what the queue retains as a whole, broadcasts included, see `set_quota`.
+        :param topic_quotas: limits on what each topic retains, by topic.
         """
+        if storage not in STORAGES:
+            raise ValueError(f'Unsupported storage: {storage}')
+        self._wal = wal
+        self._replication = replication
+        self._recording = wal is not None or replication is not None
+        self._storage = storage
+        self._storage_dir = storage_dir if storage_dir is not None else segment_dir()
+        self._maps = MapCache(max_maps=max_maps)
+        self._segment_size = segment_size
         self._topic_pool = set()
         self.__topic_pool_lock = RLock()
         self._consumer_pool = set()
         self.__consumer_pool_lock = RLock()
-        self._consumer_topic_offset = dict()
-        self.__consumer_topic_offset_lock = RLock()
-        self._queue_pool = dict()
-        self.__queue_pool_lock = RLock()
+        # logs by partition name
+        self._queue_pool: dict[str, TopicLog] = dict()
+        self._partitions: dict[str, int] = dict()
+        self._round_robin: dict[str, itertools.count] = dict()
+        self._groups: dict[str, ConsumerGroup] = dict()
+        # partition each (consumer, topic) reads first, and the partition it last consumed from
+        self._cursors: dict[tuple[str, str], int] = dict()
+        self._pending: dict[tuple[str, str], int] = dict()
         self.__snapshot_lock = RLock()
+        self._listeners: list[Callable[[list[str] | None], None]] = []
+        self._gc_batch_size = gc_batch_size
+        self._gc_stats = dict()
+        self._gc_stop = Event()
+        self._snapshot_stats = dict()
+        # message counts by partition name, each updated under the lock of its partition
+        self._produced_counts: dict[str, int] = dict()
+        self._consumed_counts: dict[str, int] = dict()
+        # messages dropped to make room under a `drop_oldest` quota, by partition name
+        self._dropped_counts: dict[str, int] = dict()
+        self._quota = quota
+        self._topic_quotas: dict[str, Quota] = dict(topic_quotas or dict())
+        self._lock_wait = Histogram('lock_wait_seconds', 'Time waited for a contended partition lock.',
+                                    label=('topic', 'partition'))
+        self._gc_duration = Histogram('gc_duration_seconds', 'Duration of a gc cycle.')
+        self._gc_pause = Histogram('gc_pause_seconds', 'Longest lock hold of a gc cycle.')
+        self._snapshot_duration = Histogram('snapshot_duration_seconds', 'Time to write a snapshot.')
+        self._snapshot_stall = Histogram('snapshot_stall_seconds', 'Time every lock is held to freeze a snapshot.')
+        self._broadcast = self._new_queue(BROADCAST_LOG)
+        # offset of the first broadcast to each topic, as kept under its `broadcast_start_key`
+        self._broadcast_starts: dict[str, int] = dict()
+        self._started_at = time.time()
+        self._rated_at, self._rated = time.perf_counter(), (dict(), dict())
+        self._snapshot_workers = ThreadPoolExecutor(max_workers=1, thread_name_prefix='nioflux.mq.snapshot')
         self._gc_workers = ThreadPool(max_workers=1)
         self._gc_workers.submit(self.gc, interval=gc_interval)
 
@@ -47,178 +123,1363 @@ class MessageQueue:
 
     @property
     def consumer_topic_offset(self):
-        with self.__consumer_topic_offset_lock:
-            return self._consumer_topic_offset.copy()
+        consumer_topic_offset = dict()
+        for topic, queue in self.queues.items():
+            with queue.lock:
+                for consumer, offset in queue.offsets.items():
+                    consumer_topic_offset.setdefault(consumer, dict())[topic] = offset
+        return consumer_topic_offset
 
     @property
     def queues(self):
-        with self.__queue_pool_lock:
+        """
+        :return: the log of every partition of every topic, by partition name.
+        """
+        with self.__topic_pool_lock:
             return self._queue_pool.copy()
 
+    @property
+    def partitions(self) -> dict[str, int]:
+        with self.__topic_pool_lock:
+            return {topic: self._partitions.get(topic, 1) for topic in self._topic_pool}
+
+    @property
+    def groups(self) -> dict[str, dict]:
+        with self.__consumer_pool_lock:
+            return {name: {'topic': group.topic, 'members': group.members, 'assignment': group.assignment}
+                    for name, group in self._groups.items()}
+
+    @property
+    def gc_stats(self) -> dict:
+        return self._gc_stats.copy()
+
+    @property
+    def snapshot_stats(self) -> dict:
+        return self._snapshot_stats.copy()
+
+    def lag(self) -> dict[str, dict[str, int]]:
+        """
+        :return: the messages each consumer is behind the end of each topic, over the partitions it reads
+        and the broadcasts it has yet to read.
+        """
+        topics, lag = self.topics, dict()
+        with self.__consumer_pool_lock:
+            for consumer in self._consumer_pool:
+                for topic in topics:
+                    try:
+                        key, subscription = self._subscription(consumer, topic)
+                    except ValueError:
+                        # unregistered in the meantime
+                        continue
+                    n = 0
+                    for partition, _, queue in subscription:
+                        with queue.lock:
+                            n += queue.end_offset - queue.offset_of(key)
+                            if partition == 0:
+                                with self._broadcast.lock:
+                                    n += self._broadcast.end_offset - self._broadcast_offset(key, topic)
+                    lag.setdefault(consumer, dict())[topic] = n
+        return lag
+
+    def stats(self) -> dict:
+        """
+        Everything is computed here from plain counts, so that nothing but counting is paid until stats are asked for.
+        Rates are taken over the time since the previous call.
+
+        :return: counts, rates, backlog and indexed keys and header values by topic, counts and backlog
+        of broadcasts, lag by consumer and topic, and summaries of lock waits by topic and partition,
+        gc cycles and snapshots, usage against quotas, see `usage`, and the replication log with the lag
+        of each follower, if replicated.
+        """
+        now = time.perf_counter()
+        produced, consumed = self._produced_counts.copy(), self._consumed_counts.copy()
+        (rated_produced, rated_consumed), elapsed = self._rated, max(now - self._rated_at, 1e-9)
+        self._rated_at, self._rated = now, (produced, consumed)
+        topics = dict()
+        for name, queue in self.queues.items():
+            topic, _ = parse_partition_name(name)
+            with queue.lock:
+                backlog, indexed = len(queue), queue.indexed
+            stats = topics.setdefault(topic, {'produced': 0, 'consumed': 0, 'produce_rate': .0,
+                                              'consume_rate': .0, 'backlog': 0, 'indexed': 0,
+                                              'compression': queue.compression})
+            stats['produced'] += produced.get(name, 0)
+            stats['consumed'] += consumed.get(name, 0)
+            # counts restart when a topic is registered again
+            stats['produce_rate'] += max(produced.get(name, 0) - rated_produced.get(name, 0), 0) / elapsed
+            stats['consume_rate'] += max(consumed.get(name, 0) - rated_consumed.get(name, 0), 0) / elapsed
+            stats['backlog'] += backlog
+            stats['indexed'] += indexed
+        with self._broadcast.lock:
+            broadcast_backlog = len(self._broadcast)
+        lock_wait = dict()
+        for topic, partition in self._lock_wait.values().keys():
+            lock_wait.setdefault(topic, dict())[partition] = self._lock_wait.summary((topic, partition))
+        stats = {
+            'uptime': time.time() - self._started_at,
+            'topics': topics,
+            'broadcast': {'produced': produced.get(BROADCAST_LOG, 0), 'consumed': consumed.get(BROADCAST_LOG, 0),
+                          'backlog': broadcast_backlog},
+            'lag': self.lag(),
+            'lock_wait': lock_wait,
+            'gc': {**self._gc_duration.summary(), 'max_pause': self._gc_pause.summary()['max'],
+                   'last': self.gc_stats},
+            'snapshot': {**self._snapshot_duration.summary(), 'max_stall': self._snapshot_stall.summary()['max'],
+                         'last': self.snapshot_stats},
+            'usage': self.usage()
+        }
+        if self._replication is not None:
+            stats['replication'] = self._replication.stats()
+        return stats
+
+    def metrics(self) -> list[Counter | Gauge | Histogram]:
+        """
+        :return: every metric of the queue, as of now, see `nioflux_mq.mq.metrics.prometheus`.
+        """
+        produced = Counter('messages_produced', 'Messages produced.', label=('topic', 'partition'))
+        consumed = Counter('messages_consumed', 'Messages delivered to consumers.', label=('topic', 'partition'))
+        backlog = Gauge('backlog', 'Messages retained.', label=('topic', 'partition'))
+        retained = Gauge('retained_bytes', 'Payload bytes retained.', label=('topic', 'partition'))
+        dropped = Counter('messages_dropped', 'Messages dropped to make room under a quota.',
+                          label=('topic', 'partition'))
+        lag = Gauge('consumer_lag', 'Messages a consumer is behind the end of a topic.', label=('consumer', 'topic'))
+        for name, n in self._produced_counts.copy().items():
+            produced.inc(n, parse_partition_name(name))
+        for name, n in self._consumed_counts.copy().items():
+            consumed.inc(n, parse_partition_name(name))
+        for name, queue in [*self.queues.items(), (BROADCAST_LOG, self._broadcast)]:
+            with queue.lock:
+                backlog.set(len(queue), parse_partition_name(name))
+                retained.set(queue.size, parse_partition_name(name))
+        for name, n in self._dropped_counts.copy().items():
+            dropped.inc(n, parse_partition_name(name))
+        for consumer, topics in self.lag().items():
+            for topic, n in topics.items():
+                lag.set(n, (consumer, topic))
+        metrics = [produced, consumed, backlog, retained, dropped, lag, self._lock_wait, self._gc_duration,
+                   self._gc_pause, self._snapshot_duration, self._snapshot_stall]
+        if self._replication is not None:
+            records = Gauge('replication_lag_records', 'Replication log records a follower has yet to apply.',
+                            label='follower')
+            seconds = Gauge('replication_lag_seconds', 'Age of the oldest record a follower has yet to apply.',
+                            label='follower')
+            for follower, _lag in self._replication.lag().items():
+                records.set(_lag['records'], follower)
+                seconds.set(_lag['seconds'], follower)
+            metrics.extend([records, seconds])
+        return metrics
+
+    def add_listener(self, listener: Callable[[list[str] | None], None]):
+        """
+        Register a callback invoked with the topics appended to after every produce, outside any lock,
+        or with `None` after a broadcast, which every topic may read.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[list[str] | None], None]):
+        self._listeners.remove(listener)
+
+    def _notify(self, topics: list[str] | None):
+        for listener in self._listeners:
+            listener(topics)
+
+    @property
+    def wal(self) -> WriteAheadLog | None:
+        return self._wal
+
+    @property
+    def replication(self) -> ReplicationLog | None:
+        return self._replication
+
+    def _record(self, record: bytes):
+        # the caller holds the lock the recorded operation mutates state under
+        if self._wal is not None:
+            self._wal.append(record)
+        if self._replication is not None:
+            self._replication.append(record)
+
+    def sync(self) -> Future:
+        """
+        :return: a future resolving once every operation applied so far is durable in the write-ahead log.
+        """
+        if self._wal is None:
+            future = Future()
+            future.set_result(0)
+            return future
+        return self._wal.sync()
+
+    @property
+    def storage(self) -> str:
+        return self._storage
+
+    def _storage_of(self, topic: str, storage: str | None = None) -> MemoryStorage | MmapStorage:
+        storage = storage if storage is not None else self._storage
+        if storage == STORAGE_MEMORY:
+            return MemoryStorage()
+        if storage == STORAGE_MMAP:
+            # topic names are hex encoded, any name makes a valid directory name
+            return MmapStorage(directory=os.path.join(self._storage_dir, topic.encode('utf-8').hex()),
+                               maps=self._maps)
+        raise ValueError(f'Unsupported storage: {storage}')
+
+    def _new_queue(self, topic: str, storage: str | None = None, base_offset: int = 0,
+                   compression: str | None = None) -> TopicLog:
+        queue = TopicLog(segment_size=self._segment_size, base_offset=base_offset,
+                         storage=self._storage_of(topic, storage), compression=compression)
+        queue.lock.instrument(self._lock_wait, parse_partition_name(topic))
+        return queue
+
+    def _queue(self, topic: str) -> TopicLog:
+        # lock free lookup, the registry lock is only needed to mutate the pool
+        queue = self._queue_pool.get(topic)
+        if queue is None:
+            raise ValueError(f'topic "{topic}" does\'t exist.')
+        return queue
+
     def gc(self, interval: int):
-        while True:
-            time.sleep(interval)
-            with self.__queue_pool_lock:
-                with self.__topic_pool_lock:
-                    for topic in self._topic_pool:
-                        for i, message in enumerate(self._queue_pool.get(topic, [])):
-                            if self.is_message_timeout(message):
-                                # delete expired message (release the memory)
-                                gc_logger.debug(f'Message {message.id} expired.')
-                                self._queue_pool[topic][i] = EXPIRED_MESSAGE
+        while not self._gc_stop.wait(interval):
+            self.collect()
 
-    def save(self, path: str):
+    def close(self):
+        self._gc_stop.set()
+        self._gc_workers.shutdown(cancel_futures=True)
+        self._snapshot_workers.shutdown(wait=True)
+        if self._wal is not None:
+            self._wal.close()
+
+    def collect(self) -> dict:
+        """
+        Expire the messages which are due according to each topic's expiry index, then compact the topics.
+        Each batch of at most `gc_batch_size` messages is expired under its own short lock hold,
+        so produce and consume are never stalled for the length of a whole cycle.
+
+        :return: statistics of this gc cycle.
+        """
+        started_at = time.perf_counter()
+        examined, expired, max_pause = 0, 0, .0
+        for queue in [*self.queues.values(), self._broadcast]:
+            while True:
+                locked_at = time.perf_counter()
+                with queue.lock:
+                    _examined, _expired = queue.expire_due(now=clock(), limit=self._gc_batch_size)
+                max_pause = max(max_pause, time.perf_counter() - locked_at)
+                examined += _examined
+                expired += _expired
+                if _examined < self._gc_batch_size:
+                    break
+        locked_at = time.perf_counter()
+        dropped = self.compact()
+        max_pause = max(max_pause, time.perf_counter() - locked_at)
+        self._gc_duration.observe(time.perf_counter() - started_at)
+        self._gc_pause.observe(max_pause)
+        self._gc_stats = {
+            'duration': time.perf_counter() - started_at,
+            'max_pause': max_pause,
+            'examined': examined,
+            'expired': expired,
+            'dropped_segments': dropped
+        }
+        gc_logger.debug(f'GC cycle examined {examined} messages, expired {expired}, '
+                        f'dropped {dropped} segments, max pause {max_pause * 1000:.3f}ms.')
+        return self._gc_stats
+
+    def compact(self) -> int:
+        """
+        Drop whole segments which every reader has moved past, or which hold only expired messages.
+        Every registered consumer reads every topic, from its base offset until it has read it,
+        but for the topics it reads through a group, at the offsets of the group.
+        Broadcasts are dropped once every reader of every topic has moved past them.
+
+        :return: number of segments dropped.
+        """
+        dropped = 0
+        consumers = self.consumers
+        groups = self.groups
+        topics = self.topics
+        broadcast = self._broadcast
+        with broadcast.lock:
+            if len(topics) > 0:
+                offsets = [broadcast.min_offset([broadcast_key(key, topic) for key in
+                                                 self._readers(topic, consumers, groups)],
+                                                default=self._broadcast_starts.get(topic, 0))
+                           for topic in topics]
+                offsets = [offset for offset in offsets if offset is not None]
+                min_offset = min(offsets) if len(offsets) > 0 else None
+            else:
+                # no topic reads them
+                min_offset = broadcast.end_offset
+            n = broadcast.compact(min_offset=min_offset)
+        if n > 0:
+            gc_logger.debug(f'{n} segments of broadcasts dropped, base offset {broadcast.base_offset}.')
+        dropped += n
+        for name, queue in self.queues.items():
+            dropped += self._compact_partition(name, queue, consumers, groups)
+        return dropped
+
+    @staticmethod
+    def _readers(topic: str, consumers: set[str], groups: dict[str, dict]) -> list[str]:
+        # the keys offsets in a partition of `topic` are kept under: those of every registered consumer,
+        # which reads from the base offset until it has read the topic, and those of the topic's groups,
+        # their members read it at the offsets of the group, not at their own
+        subscribed = [name for name, group in groups.items() if group['topic'] == topic]
+        members = {member for name in subscribed for member in groups[name]['members']}
+        return [*[consumer for consumer in consumers if consumer not in members],
+                *[group_key(name) for name in subscribed]]
+
+    def _compact_partition(self, name: str, queue: TopicLog, consumers: set[str], groups: dict[str, dict],
+                           release: bool = False) -> int:
+        # with `release`, the messages every reader has moved past are released from the last segment too
+        with queue.lock:
+            if queue.closed:
+                return 0
+            min_offset = queue.min_offset(self._readers(parse_partition_name(name)[0], consumers, groups),
+                                          default=queue.base_offset)
+            if release and min_offset is not None:
+                queue.expire_before(min_offset)
+            n = queue.compact(min_offset=min_offset)
+        if n > 0:
+            gc_logger.debug(f'{n} segments of topic {name} dropped, base offset {queue.base_offset}.')
+        return n
+
+    def set_quota(self, quota: Quota | None, topic: str | None = None):
+        """
+        Limit what the queue retains as a whole, broadcasts included, or what `topic` retains,
+        the topic need not be registered yet. `None` lifts the limit.
+        Quotas are configuration, neither snapshotted nor replicated, a produce is checked against both.
+        """
+        if topic is None:
+            self._quota = quota
+        elif quota is None:
+            self._topic_quotas.pop(topic, None)
+        else:
+            self._topic_quotas[topic] = quota
+
+    def _logs_of(self, topic: str | None) -> list[tuple[str, TopicLog]]:
+        # the partitions of `topic`, or every log, broadcasts included, looked up without locks
+        if topic is None:
+            return list(self._queue_pool.items()) + [(BROADCAST_LOG, self._broadcast)]
+        logs = []
+        for partition in range(self._partitions.get(topic, 1)):
+            name = partition_name(topic, partition)
+            queue = self._queue_pool.get(name)
+            if queue is not None:
+                logs.append((name, queue))
+        return logs
+
+    def _usage(self, topic: str | None) -> tuple[int, int]:
+        # payload bytes and messages retained, read without locks, as of a moment ago
+        logs = self._logs_of(topic)
+        return sum(queue.size for _, queue in logs), sum(queue.live for _, queue in logs)
+
+    def usage(self) -> dict:
+        """
+        :return: the payload bytes and messages retained and the quota of the queue as a whole,
+        and of each topic, along with the messages dropped to make room, for producers to throttle themselves.
+        Messages count until they expire or are dropped.
+        """
+        topics = dict()
+        for topic in self.topics:
+            (_bytes, messages), quota = self._usage(topic), self._topic_quotas.get(topic)
+            topics[topic] = {'bytes': _bytes, 'messages': messages,
+                             'dropped': sum(self._dropped_counts.get(name, 0) for name, _ in self._logs_of(topic)),
+                             'quota': quota.as_dict() if quota is not None else None}
+        _bytes, messages = self._usage(None)
+        return {'bytes': _bytes, 'messages': messages,
+                'quota': self._quota.as_dict() if self._quota is not None else None, 'topics': topics}
+
+    def _reclaim(self, topic: str | None):
+        # compact what every reader has moved past in the partitions of `topic`, or everywhere
+        if topic is None:
+            # broadcasts included
+            self.compact()
+        consumers, groups = self.consumers, self.groups
+        for name, queue in self._logs_of(topic):
+            if name != BROADCAST_LOG:
+                self._compact_partition(name, queue, consumers, groups, release=True)
+
+    def _drop_oldest(self, topic: str, name: str, queue: TopicLog, size: int, messages: int) -> int:
+        """
+        Move every reader of a partition past its oldest messages, as many as take `size` payload bytes
+        and number `messages`, then drop them. The seeks are recorded, so they stay dropped across a restart.
+
+        :return: number of messages dropped.
+        """
+        consumers, groups = self.consumers, self.groups
+        with queue.lock:
+            if queue.closed:
+                return 0
+            end, live = queue.offset_freeing(messages, size), queue.live
+            for key in self._readers(topic, consumers, groups):
+                if queue.offset_of(key) < end:
+                    self._seek(name, queue, key, end)
+            queue.expire_before(end)
+            queue.compact(min_offset=end)
+            dropped = live - queue.live
+            self._dropped_counts[name] = self._dropped_counts.get(name, 0) + dropped
+        logger.debug(f'{dropped} messages of topic {name} dropped to make room, base offset {queue.base_offset}.')
+        return dropped
+
+    def _admit(self, topic: str | None, batches: list[tuple[str, TopicLog, list[Message]]]):
+        """
+        Check a produce against the quota of its topic and that of the queue, before any of it is appended.
+        The messages every reader has moved past are released at once to make room, then, unless a quota refuses
+        the produce, the oldest messages of the partitions produced to are dropped under `drop_oldest` ones,
+        broadcasts are never dropped.
+        Produces are checked independently of each other, concurrent ones may each overshoot a quota by their batch.
+
+        :raise QuotaExceeded: if there is no room for the produce.
+        """
+        size = sum(stored_size(message.payload) for _, _, batch in batches for message in batch)
+        n = sum(len(batch) for _, _, batch in batches)
+
+        def exceeds(_scope: str | None, _quota: Quota) -> bool:
+            _bytes, _messages = self._usage(_scope)
+            return _quota.exceeded(_bytes + size, _messages + n)
+
+        scopes = [(None, self._quota)]
+        if topic is not None:
+            scopes.insert(0, (topic, self._topic_quotas.get(topic)))
+        exceeded = []
+        for scope, quota in scopes:
+            if quota is None or not exceeds(scope, quota):
+                continue
+            self._reclaim(scope)
+            if not exceeds(scope, quota):
+                continue
+            if quota.policy != POLICY_DROP_OLDEST or topic is None:
+                _bytes, messages = self._usage(scope)
+                owner = f'topic "{scope}"' if scope is not None else 'the queue'
+                raise QuotaExceeded(f'Quota of {owner} exceeded: {_bytes} bytes and {messages} messages retained, '
+                                    f'{size} bytes and {n} messages produced, retry once consumers catch up.', quota)
+            exceeded.append((scope, quota))
+        for scope, quota in exceeded:
+            # room is made in the partitions produced to only, a batch over a quota on its own is appended alone
+            for name, queue, _ in batches:
+                _bytes, messages = self._usage(scope)
+                excess = quota.excess(_bytes + size, messages + n)
+                if excess == (0, 0):
+                    break
+                self._drop_oldest(topic, name, queue, *excess)
+
+    def _acquire_all(self) -> list[TopicLog]:
+        self.__snapshot_lock.acquire(blocking=True, timeout=-1)
+        self.__topic_pool_lock.acquire(blocking=True, timeout=-1)
+        self.__consumer_pool_lock.acquire(blocking=True, timeout=-1)
+        queues = [self._queue_pool[topic] for topic in sorted(self._queue_pool.keys())]
+        queues.append(self._broadcast)
+        for queue in queues:
+            queue.lock.acquire(blocking=True, timeout=-1)
+        return queues
+
+    def _release_all(self, queues: list[TopicLog]):
+        for queue in reversed(queues):
+            queue.lock.release()
+        self.__consumer_pool_lock.release()
+        self.__topic_pool_lock.release()
+        self.__snapshot_lock.release()
+
+    def freeze(self) -> tuple[list[str], list[str], dict[str, tuple[str, list[str]]],
+                              dict[str, FrozenTopicLog], int | None]:
+        """
+        Capture a consistent point of the whole queue, holding every lock only for O(topics + segments).
+        The write-ahead log starts a new generation at that point.
+
+        :return: topics, consumers, the topic and members of every group, a frozen view of every partition
+        and of the broadcasts (under `BROADCAST_LOG`), and the first write-ahead log generation not covered by them.
+        """
+        queues = self._acquire_all()
         try:
-            self.__snapshot_lock.acquire(blocking=True, timeout=-1)
-            self.__queue_pool_lock.acquire(blocking=True, timeout=-1)
-            self.__consumer_topic_offset_lock.acquire(blocking=True, timeout=-1)
-            self.__consumer_pool_lock.acquire(blocking=True, timeout=-1)
-            self.__topic_pool_lock.acquire(blocking=True, timeout=-1)
-            snapshot = {
-                'topics': self._topic_pool,
-                'consumers': self._consumer_pool,
-                'consumer_topic_offset': self._consumer_topic_offset,
-                'queues': self._queue_pool
-            }
-            _dir = os.path.dirname(path)
+            return *self._frozen(), self._wal.rotate() if self._wal is not None else None
+        finally:
+            self._release_all(queues)
+
+    def _frozen(self) -> tuple[list[str], list[str], dict[str, tuple[str, list[str]]], dict[str, FrozenTopicLog]]:
+        # the caller holds every lock
+        return (list(self._topic_pool), list(self._consumer_pool),
+                {name: (group.topic, group.members) for name, group in self._groups.items()},
+                {topic: queue.freeze() for topic, queue in [*self._queue_pool.items(),
+                                                            (BROADCAST_LOG, self._broadcast)]})
+
+    def replication_snapshot(self) -> Future:
+        """
+        Freeze the queue, then write a binary snapshot of it to memory on the snapshot thread,
+        for a follower to catch up from before it applies the replication log records after it.
+
+        :return: a future resolving to the sequence of the last replication log record the snapshot covers,
+        and the snapshot.
+        """
+        if self._replication is None:
+            raise ValueError('Replication is not enabled.')
+        queues = self._acquire_all()
+        try:
+            _, consumers, groups, frozen = self._frozen()
+            sequence = self._replication.sequence
+        finally:
+            self._release_all(queues)
+
+        def dump() -> tuple[int, bytes]:
+            f = io.BytesIO()
+            binary_snapshot.dump(f, consumers=consumers, queues=frozen, wal_generation=None, groups=groups)
+            return sequence, f.getvalue()
+
+        return self._snapshot_workers.submit(dump)
+
+    def snapshot(self, path: str) -> Future:
+        """
+        Freeze the queue, then write the snapshot to `path` on a background thread.
+        The file is written to a temporary path first and renamed over `path` once complete.
+
+        :return: a future resolving to `path`.
+        """
+        frozen_at = time.perf_counter()
+        _, consumers, groups, queues, wal_generation = self.freeze()
+        stall = time.perf_counter() - frozen_at
+        return self._snapshot_workers.submit(self._write_snapshot, path, consumers, groups, queues,
+                                             wal_generation, stall)
+
+    def _write_snapshot(self, path: str, consumers: list[str], groups: dict[str, tuple[str, list[str]]],
+                        queues: dict[str, FrozenTopicLog], wal_generation: int | None, stall: float):
+        started_at = time.perf_counter()
+        _dir = os.path.dirname(path)
+        if len(_dir) > 0:
             os.makedirs(_dir, exist_ok=True)
-            with open(path, mode='w', encoding='utf-8') as f:
-                json.dump(snapshot, f, default=Message.serialize, indent=0)
-            logger.debug(f'Snapshot saved to {path}.')
-            return path
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, mode='wb', buffering=DEFAULT_SNAPSHOT_BUFFER_SIZE) as f:
+            n = binary_snapshot.dump(f, consumers=consumers, queues=queues, wal_generation=wal_generation,
+                                     groups=groups)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        if wal_generation is not None:
+            self._wal.truncate(before=wal_generation)
+        self._snapshot_duration.observe(time.perf_counter() - started_at)
+        self._snapshot_stall.observe(stall)
+        self._snapshot_stats = {
+            'path': path,
+            'stall': stall,
+            'duration': time.perf_counter() - started_at,
+            'messages': n,
+            'bytes': os.path.getsize(path)
+        }
+        logger.debug(f'Snapshot saved to {path}, {n} messages written in '
+                     f'{self._snapshot_stats["duration"] * 1000:.3f}ms, stalled {stall * 1000:.3f}ms.')
+        return path
+
+    def save(self, path: str):
+        return self.snapshot(path).result()
+
+    def _load_binary(self, f) -> tuple[set, dict[str, tuple[str, list[str]]], dict[str, TopicLog], int]:
+        consumers, groups, queue_pool, queue, wal_generation = set(), dict(), dict(), None, 0
+        for kind, value in binary_snapshot.load(f):
+            if kind == binary_snapshot.MESSAGE:
+                queue.append(value)
+            elif kind == binary_snapshot.EXPIRED:
+                for _ in range(value):
+                    queue.append(EXPIRED_MESSAGE)
+            elif kind == binary_snapshot.OFFSET:
+                consumer, offset = value
+                queue.seek(consumer, offset)
+            elif kind == binary_snapshot.TOPIC:
+                topic, base_offset, storage, compression = value
+                queue = self._new_queue(topic, storage=storage, base_offset=base_offset, compression=compression)
+                queue_pool[topic] = queue
+            elif kind == binary_snapshot.CONSUMER:
+                consumers.add(value)
+            elif kind == binary_snapshot.GROUP:
+                group, topic, members = value
+                groups[group] = (topic, members)
+            elif kind == binary_snapshot.WAL_GENERATION:
+                wal_generation = value
+        return consumers, groups, queue_pool, wal_generation
+
+    def _load_json(self, f) -> tuple[set, dict[str, tuple[str, list[str]]], dict[str, TopicLog], int]:
+        # snapshots written before the binary snapshot format
+        snapshot = json.load(f, object_hook=Message.deserialize)
+        queue_pool = dict()
+        for topic, queue in snapshot['queues'].items():
+            if isinstance(queue, list):
+                # snapshots taken before topics were segmented
+                queue = {'base_offset': 0, 'messages': queue}
+            for message in queue['messages']:
+                message.timestamp = wall_clock(message.timestamp)
+            queue_pool[topic] = TopicLog.restore(messages=queue['messages'],
+                                                 base_offset=queue['base_offset'],
+                                                 segment_size=self._segment_size,
+                                                 storage=self._storage_of(topic))
+        for consumer, topic_offset in snapshot['consumer_topic_offset'].items():
+            for topic, offset in topic_offset.items():
+                if topic in queue_pool.keys():
+                    queue_pool[topic].seek(consumer, offset)
+        return set(snapshot['consumers']), dict(), queue_pool, 0
+
+    def _redo(self, kind: bytes, value, consumer_pool: set, groups: dict[str, tuple[str, list[str]]],
+              queue_pool: dict[str, TopicLog]):
+        # apply a decoded write-ahead log record to the given pools, the broadcasts are under `BROADCAST_LOG`
+        if kind == write_ahead_log.PRODUCE:
+            topic, messages = value
+            if topic in queue_pool.keys():
+                for message in messages:
+                    queue_pool[topic].append(message)
+        elif kind == write_ahead_log.SEEK:
+            topic, consumer, offset = value
+            if topic in queue_pool.keys():
+                queue_pool[topic].seek(consumer, offset)
+        elif kind == write_ahead_log.REGISTER_TOPIC:
+            topic, storage, compression = value
+            if topic not in queue_pool.keys():
+                queue_pool[topic] = self._new_queue(topic, storage=storage, compression=compression)
+        elif kind == write_ahead_log.UNREGISTER_TOPIC:
+            if value in queue_pool.keys():
+                queue_pool.pop(value).destroy()
+            self._forget_broadcasts(queue_pool[BROADCAST_LOG], topic=parse_partition_name(value)[0])
+            for group, (topic, _) in list(groups.items()):
+                if topic == value:
+                    del groups[group]
+        elif kind == write_ahead_log.REGISTER_CONSUMER:
+            consumer_pool.add(value)
+        elif kind == write_ahead_log.UNREGISTER_CONSUMER:
+            consumer_pool.discard(value)
+            for queue in queue_pool.values():
+                queue.forget(value)
+            self._forget_broadcasts(queue_pool[BROADCAST_LOG], key=value)
+            for group, (topic, members) in list(groups.items()):
+                groups[group] = (topic, [member for member in members if member != value])
+        elif kind == write_ahead_log.JOIN_GROUP:
+            consumer, group, topic = value
+            groups.setdefault(group, (topic, []))[1].append(consumer)
+        elif kind == write_ahead_log.LEAVE_GROUP:
+            consumer, group = value
+            if group in groups.keys():
+                topic, members = groups[group]
+                groups[group] = (topic, [member for member in members if member != consumer])
+
+    def _replay(self, consumer_pool: set, groups: dict[str, tuple[str, list[str]]],
+                queue_pool: dict[str, TopicLog], since: int) -> int:
+        n = 0
+        for kind, value in self._wal.replay(since=since):
+            n += 1
+            self._redo(kind, value, consumer_pool, groups, queue_pool)
+        return n
+
+    def _install(self, consumer_pool: set, groups: dict[str, tuple[str, list[str]]],
+                 queue_pool: dict[str, TopicLog]):
+        # the caller holds every lock, `queue_pool` holds the broadcasts under `BROADCAST_LOG`
+        queue_pool = queue_pool.copy()
+        broadcast = queue_pool.pop(BROADCAST_LOG)
+        # topics and their partition counts follow from the partition logs
+        topic_pool, partitions = set(), dict()
+        for name in queue_pool.keys():
+            topic, partition = parse_partition_name(name)
+            topic_pool.add(topic)
+            partitions[topic] = max(partitions.get(topic, 1), partition + 1)
+        broadcast_offsets = broadcast.offsets
+        group_pool = dict()
+        for group, (topic, members) in groups.items():
+            if topic in topic_pool:
+                group_pool[group] = ConsumerGroup(name=group, topic=topic, partitions=partitions[topic])
+                for member in members:
+                    if member in consumer_pool:
+                        group_pool[group].join(member)
+        self._topic_pool = topic_pool
+        self._consumer_pool = consumer_pool
+        self._queue_pool = queue_pool
+        self._broadcast = broadcast
+        self._broadcast_starts = {topic: broadcast_offsets[broadcast_start_key(topic)] for topic in topic_pool
+                                  if broadcast_start_key(topic) in broadcast_offsets.keys()}
+        self._partitions = partitions
+        self._groups = group_pool
+
+    def _swap(self, consumer_pool: set, groups: dict[str, tuple[str, list[str]]], queue_pool: dict[str, TopicLog]):
+        # replace the whole state with the given pools, then drop the logs replaced
+        for name, queue in queue_pool.items():
+            queue.lock.instrument(self._lock_wait, parse_partition_name(name))
+        queues = self._acquire_all()
+        try:
+            self._install(consumer_pool, groups, queue_pool)
+            self._cursors, self._pending = dict(), dict()
         finally:
-            self.__snapshot_lock.release()
-            self.__queue_pool_lock.release()
-            self.__consumer_topic_offset_lock.release()
-            self.__consumer_pool_lock.release()
-            self.__topic_pool_lock.release()
+            self._release_all(queues)
+        for queue in queues:
+            with queue.lock:
+                queue.destroy()
 
     def load(self, path: str):
+        """
+        Load the snapshot at `path`, then replay the write-ahead log generations it doesn't cover.
+        With a write-ahead log, a missing snapshot is recovered from the log alone.
+        """
+        consumer_pool, groups, queue_pool, wal_generation = set(), dict(), dict(), 0
+        if self._wal is None or os.path.exists(path):
+            with open(path, mode='rb', buffering=DEFAULT_SNAPSHOT_BUFFER_SIZE) as f:
+                if binary_snapshot.is_binary_snapshot(f):
+                    consumer_pool, groups, queue_pool, wal_generation = self._load_binary(f)
+                else:
+                    consumer_pool, groups, queue_pool, wal_generation = self._load_json(f)
+        if BROADCAST_LOG not in queue_pool.keys():
+            # snapshots taken before broadcasts were shared
+            queue_pool[BROADCAST_LOG] = self._new_queue(BROADCAST_LOG)
+        if self._wal is not None:
+            n = self._replay(consumer_pool, groups, queue_pool, since=wal_generation)
+            logger.debug(f'Replayed {n} write-ahead log records since generation {wal_generation}.')
+        self._swap(consumer_pool, groups, queue_pool)
+        logger.debug(f'Loaded snapshot from {path}.')
+        return self
+
+    def restore(self, snapshot: bytes):
+        """
+        Replace the whole queue with a binary snapshot taken by `replication_snapshot`, as a follower catching up.
+        Neither the write-ahead log nor the replication log record it, take a snapshot to make it durable.
+        """
+        consumer_pool, groups, queue_pool, _ = self._load_binary(io.BytesIO(snapshot))
+        # ids increase along each log, the last message of each holds the highest of it
+        for queue in queue_pool.values():
+            message = queue.get(queue.end_offset - 1) if len(queue) > 0 else None
+            if message is not None and parse_id(message.id) is not None:
+                skip_ids(parse_id(message.id))
+        self._swap(consumer_pool, groups, queue_pool)
+        logger.debug(f'Restored a snapshot of {len(snapshot)} bytes, {len(queue_pool) - 1} partitions.')
+        return self
+
+    def apply(self, records: list[bytes]) -> int:
+        """
+        Apply the records of the replication log of another queue, in order, as a follower of it.
+        They are applied under every lock, as a single step, and recorded as applied.
+        Ids of messages produced here afterwards are kept greater than those applied.
+
+        :return: number of records applied.
+        """
+        decoded = [write_ahead_log.decode(record) for record in records]
+        topics, broadcast = set(), False
+        queues = self._acquire_all()
         try:
-            self.__snapshot_lock.acquire(blocking=True, timeout=-1)
-            self.__queue_pool_lock.acquire(blocking=True, timeout=-1)
-            self.__consumer_topic_offset_lock.acquire(blocking=True, timeout=-1)
-            self.__consumer_pool_lock.acquire(blocking=True, timeout=-1)
-            self.__topic_pool_lock.acquire(blocking=True, timeout=-1)
-            snapshot = None
-            with open(path, mode='r', encoding='utf-8') as f:
-                snapshot = json.load(f, object_hook=Message.deserialize)
-                self._topic_pool = set(snapshot['topics'])
-                self._consumer_pool = set(snapshot['consumers'])
-                self._consumer_topic_offset = snapshot['consumer_topic_offset']
-                self._queue_pool = snapshot['queues']
-            logger.debug(f'Loaded snapshot from {path}.')
-            return self
+            consumer_pool = self._consumer_pool.copy()
+            groups = {name: (group.topic, group.members) for name, group in self._groups.items()}
+            queue_pool = {**self._queue_pool, BROADCAST_LOG: self._broadcast}
+            for record, (kind, value) in zip(records, decoded):
+                self._redo(kind, value, consumer_pool, groups, queue_pool)
+                if kind == write_ahead_log.PRODUCE:
+                    name, messages = value
+                    self._produced_counts[name] = self._produced_counts.get(name, 0) + len(messages)
+                    # messages made here once promoted follow those of the leader
+                    if len(messages) > 0 and parse_id(messages[-1].id) is not None:
+                        skip_ids(parse_id(messages[-1].id))
+                    if name == BROADCAST_LOG:
+                        broadcast = True
+                    else:
+                        topics.add(parse_partition_name(name)[0])
+                self._record(record)
+            self._install(consumer_pool, groups, queue_pool)
         finally:
-            self.__snapshot_lock.release()
-            self.__queue_pool_lock.release()
-            self.__consumer_topic_offset_lock.release()
-            self.__consumer_pool_lock.release()
-            self.__topic_pool_lock.release()
+            self._release_all(queues)
+        if broadcast or len(topics) > 0:
+            self._notify(None if broadcast else list(topics))
+        return len(records)
 
     @staticmethod
     def is_message_timeout(message: Message) -> bool:
         if message.ttl < .0:
             return False
-        now = time.perf_counter()
+        now = clock()
         interval = now - message.timestamp
         return interval > message.ttl
 
-    def register_topic(self, topic: str) -> bool:
-        with self.__queue_pool_lock:
-            with self.__topic_pool_lock:
-                if topic in self._topic_pool:
-                    logger.warning(f'Topic {topic} already registered.')
-                    return False
-                self._topic_pool.add(topic)
-                self._queue_pool[topic] = []
-                logger.debug(f'Topic {topic} registered.')
-                return True
+    def register_topic(self, topic: str, storage: str | None = None, partitions: int = 1,
+                       compression: str | None = None) -> bool:
+        """
+        :param storage: `memory` or `mmap`, the queue's default storage if not given.
+        :param partitions: number of partitions the topic is split into, each of them a log of its own.
+        :param compression: `zlib`, `lzma` or any registered with `nioflux_mq.mq.compression.register_compression`,
+        the payloads of each batch produced to a partition are then stored, logged, snapshotted and sent
+        compressed together. Uncompressed if not given.
+        """
+        if PARTITION_SEPARATOR in topic:
+            raise ValueError(f'topic "{topic}" contains a reserved character.')
+        if partitions < 1:
+            raise ValueError(f'A topic has at least 1 partition, got {partitions}.')
+        if compression is not None:
+            compression_of(compression)
+        with self.__topic_pool_lock:
+            if topic in self._topic_pool:
+                logger.warning(f'Topic {topic} already registered.')
+                return False
+            for partition in range(partitions):
+                name = partition_name(topic, partition)
+                queue = self._new_queue(name, storage=storage, compression=compression)
+                # recorded before the partition can be produced to, so that its produces are recorded after it
+                if self._recording:
+                    self._record(write_ahead_log.encode_register_topic(name, queue.storage, compression))
+                self._queue_pool[name] = queue
+            # broadcasts produced before are not for the topic
+            with self._broadcast.lock:
+                self._seek(BROADCAST_LOG, self._broadcast, broadcast_start_key(topic), self._broadcast.end_offset)
+                self._broadcast_starts[topic] = self._broadcast.end_offset
+            self._partitions[topic] = partitions
+            self._round_robin[topic] = itertools.count()
+            self._topic_pool.add(topic)
+            logger.debug(f'Topic {topic} registered with {partitions} partitions, '
+                         f'stored in {storage if storage is not None else self._storage}'
+                         f'{f", compressed with {compression}" if compression is not None else ""}.')
+            return True
 
     def unregister_topic(self, topic: str) -> bool | list:
-        with self.__queue_pool_lock:
-            with self.__consumer_topic_offset_lock:
-                with self.__topic_pool_lock:
-                    if topic not in self._queue_pool.keys():
-                        return False
-                    self._topic_pool.remove(topic)
-                    for k in self._consumer_topic_offset.keys():
-                        if topic in list(self._consumer_topic_offset[k].keys()):
-                            del self._consumer_topic_offset[k][topic]
-                    queue = self._queue_pool[topic]
-                    del self._queue_pool[topic]
-                    logger.debug(f'Topic {topic} unregistered.')
-                    return queue
-
-    def register_consumer(self, consumer: str) -> bool:
-        with self.__consumer_topic_offset_lock:
+        with self.__topic_pool_lock:
+            if topic not in self._topic_pool:
+                return False
+            self._topic_pool.remove(topic)
+            self._round_robin.pop(topic, None)
+            names = [partition_name(topic, partition) for partition in range(self._partitions.pop(topic, 1))]
+            queues = [self._queue_pool.pop(name) for name in names]
+            for name in names:
+                self._produced_counts.pop(name, None)
+                self._consumed_counts.pop(name, None)
+                self._dropped_counts.pop(name, None)
+                self._lock_wait.discard(parse_partition_name(name))
+            if self._recording:
+                for name in names:
+                    self._record(write_ahead_log.encode_name(write_ahead_log.UNREGISTER_TOPIC, name))
             with self.__consumer_pool_lock:
-                if consumer in self._consumer_pool:
-                    logger.warning(f'Consumer {consumer} already registered.')
-                    return False
-                self._consumer_pool.add(consumer)
-                self._consumer_topic_offset[consumer] = dict()
-                logger.debug(f'Consumer {consumer} registered.')
-                return True
+                for group in [group for group in self._groups.values() if group.topic == topic]:
+                    del self._groups[group.name]
+            with self._broadcast.lock:
+                self._forget_broadcasts(self._broadcast, topic=topic)
+                self._broadcast_starts.pop(topic, None)
+            logger.debug(f'Topic {topic} unregistered.')
+        messages = []
+        for queue in queues:
+            with queue.lock:
+                messages.extend(queue)
+                queue.destroy()
+        return decompress_messages(messages)
+
+    def register_consumer(self, consumer: str, group: str | None = None, topic: str | None = None) -> bool:
+        """
+        :param group: a consumer group for the consumer to join at once, on `topic`, see `join_group`.
+        """
+        if group is not None:
+            self._queue(topic)
+        with self.__consumer_pool_lock:
+            if consumer in self._consumer_pool:
+                logger.warning(f'Consumer {consumer} already registered.')
+                return False
+            self._consumer_pool.add(consumer)
+            if self._recording:
+                self._record(write_ahead_log.encode_name(write_ahead_log.REGISTER_CONSUMER, consumer))
+            logger.debug(f'Consumer {consumer} registered.')
+            if group is not None:
+                self.join_group(consumer, group, topic)
+            return True
 
     def unregister_consumer(self, consumer: str) -> bool | str:
-        with self.__consumer_topic_offset_lock:
-            with self.__consumer_pool_lock:
-                if consumer not in self._consumer_pool:
-                    return False
-                self._consumer_pool.remove(consumer)
-                if consumer in self._consumer_topic_offset.keys():
-                    del self._consumer_topic_offset[consumer]
-                logger.debug(f'Consumer {consumer} unregistered.')
-                return consumer
-
-    def produce(self, message: bytes, topic: str | None = None, ttl: float = -1.) -> Message:
-        message_instance = Message.build(payload=message, ttl=ttl)
-        with self.__queue_pool_lock:
-            with self.__topic_pool_lock:
-                if topic is not None:
-                    if topic not in self._queue_pool.keys():
-                        raise ValueError(f'topic "{topic}" does\'t exist.')
-                    logger.debug(f'Message {message_instance.id} sent to topic {topic}.')
-                    self._queue_pool[topic].append(message_instance)
+        queues = self.queues
+        with self.__consumer_pool_lock:
+            if consumer not in self._consumer_pool:
+                return False
+            self._consumer_pool.remove(consumer)
+            for queue in queues.values():
+                with queue.lock:
+                    queue.forget(consumer)
+            with self._broadcast.lock:
+                self._forget_broadcasts(self._broadcast, key=consumer)
+            for group in self._groups.values():
+                group.leave(consumer)
+            for cursors in (self._cursors, self._pending):
+                # consumes add to them under the lock of their topic alone, a copy is taken in a single step
+                for key in [key for key in cursors.copy() if key[0] == consumer]:
+                    cursors.pop(key, None)
+            if self._recording:
+                self._record(write_ahead_log.encode_name(write_ahead_log.UNREGISTER_CONSUMER, consumer))
+            logger.debug(f'Consumer {consumer} unregistered.')
+            return consumer
+
+    def join_group(self, consumer: str, group: str, topic: str) -> bool:
+        """
+        Add a consumer to the consumer group `group` of `topic`, created on first join.
+        The members of a group share its offsets, and the partitions of the topic are reassigned among them
+        on every join and leave, so that each partition is read by a single member.
+        A consumer reads a topic either on its own or through one of the topic's groups.
+        """
+        self._queue(topic)
+        with self.__consumer_pool_lock:
+            if consumer not in self._consumer_pool:
+                raise ValueError(f'consumer "{consumer}" does\'t exist.')
+            _group = self._groups.get(group)
+            if _group is not None and _group.topic != topic:
+                raise ValueError(f'group "{group}" consumes topic "{_group.topic}".')
+            joined = self._group_of(consumer, topic)
+            if joined is not None:
+                if joined.name != group:
+                    raise ValueError(f'consumer "{consumer}" already consumes topic "{topic}" in group "{joined.name}".')
+                return False
+            if _group is None:
+                _group = ConsumerGroup(name=group, topic=topic, partitions=self._partitions.get(topic, 1))
+                self._groups[group] = _group
+            _group.join(consumer)
+            if self._recording:
+                self._record(write_ahead_log.encode_join_group(consumer, group, topic))
+            logger.debug(f'Consumer {consumer} joined group {group}, assignment {_group.assignment}.')
+            return True
+
+    def leave_group(self, consumer: str, group: str) -> bool:
+        with self.__consumer_pool_lock:
+            _group = self._groups.get(group)
+            if _group is None or not _group.leave(consumer):
+                return False
+            if self._recording:
+                self._record(write_ahead_log.encode_leave_group(consumer, group))
+            logger.debug(f'Consumer {consumer} left group {group}, assignment {_group.assignment}.')
+            return True
+
+    def _group_of(self, consumer: str, topic: str) -> ConsumerGroup | None:
+        for group in list(self._groups.values()):
+            if group.topic == topic and consumer in group:
+                return group
+        return None
+
+    def _partition_of(self, topic: str, key: str | bytes | None = None) -> str:
+        partitions = self._partitions.get(topic, 1)
+        if partitions == 1:
+            return topic
+        if key is not None:
+            partition = zlib.crc32(key.encode('utf-8') if isinstance(key, str) else key) % partitions
+        else:
+            partition = next(self._round_robin.setdefault(topic, itertools.count())) % partitions
+        return partition_name(topic, partition)
+
+    def _partition_batches(self, topic: str, messages: list[Message],
+                           key: str | bytes | None = None) -> dict[str, list[Message]]:
+        # messages keep their order within each partition
+        if key is not None or self._partitions.get(topic, 1) == 1:
+            return {self._partition_of(topic, key): messages}
+        batches = dict()
+        for message in messages:
+            batches.setdefault(self._partition_of(topic), []).append(message)
+        return batches
+
+    def _append(self, topic: str, queue: TopicLog, messages: list[Message]):
+        # the caller holds queue.lock, the log may have been unregistered since it was looked up without it
+        if queue.closed:
+            raise ValueError(f'topic "{parse_partition_name(topic)[0]}" does\'t exist.')
+        for message in messages:
+            queue.append(message)
+        self._produced_counts[topic] = self._produced_counts.get(topic, 0) + len(messages)
+        if self._recording:
+            self._record(write_ahead_log.encode_produce(topic, messages))
+
+    def _seek(self, topic: str, queue: TopicLog, consumer: str, offset: int):
+        # the caller holds queue.lock
+        offset = queue.seek(consumer, offset)
+        if self._recording:
+            self._record(write_ahead_log.encode_seek(topic, consumer, offset))
+
+    @staticmethod
+    def _forget_broadcasts(broadcast: TopicLog, topic: str | None = None, key: str | None = None):
+        # the caller holds broadcast.lock, forgets the broadcast offsets kept for `topic` or by `key`
+        for _key in broadcast.offsets.keys():
+            reader, _topic = parse_broadcast_key(_key)
+            if _topic == topic or reader == key:
+                broadcast.forget(_key)
+
+    def _broadcast_offset(self, key: str, topic: str) -> int:
+        # readers start at the first broadcast to the topic
+        return self._broadcast.offset_of(broadcast_key(key, topic), self._broadcast_starts.get(topic, 0))
+
+    def _caught_up(self, key: str, topic: str) -> bool:
+        # whether `key` has read every broadcast to `topic`, checked without the broadcast lock,
+        # the reader's own offset is only looked up if anything was broadcast since the topic was registered
+        end = self._broadcast.end_offset
+        return end <= self._broadcast_starts.get(topic, 0) or end <= self._broadcast_offset(key, topic)
+
+    def produce(self, message: bytes, topic: str | None = None, ttl: float = -1.,
+                key: str | bytes | None = None, headers: dict[str, str] | None = None) -> Message:
+        """
+        :param key: carried by the message, consumers can filter on it. Messages of a key always go
+        to the same partition of a topic, messages without one are spread round-robin over its partitions.
+        Bytes keys are decoded as UTF-8.
+        :param headers: text attributes carried by the message, consumers can filter on them.
+        """
+        return self.produce_batch([message], topic=topic, ttl=ttl, key=key, headers=headers)[0]
+
+    def produce_batch(self, messages: list[bytes], topic: str | None = None,
+                      ttl: float | list[float] = -1., key: str | bytes | None = None,
+                      headers: dict[str, str] | list[dict[str, str] | None] | None = None) -> list[Message]:
+        """
+        Append a batch of messages, taking each target partition's lock once for the whole batch.
+        Without a topic, the batch is broadcast: appended once to the broadcast log, whatever the number of topics.
+
+        :param ttl: one ttl for every message, or one ttl per message.
+        :param key: see `produce`, carried by every message of the batch, but ignored by broadcasts for partitioning.
+        :param headers: one set of headers for every message, or one per message.
+        """
+        ttls = ttl if isinstance(ttl, list) else [ttl] * len(messages)
+        if len(ttls) != len(messages):
+            raise ValueError(f'{len(ttls)} ttls given for {len(messages)} messages.')
+        _key = key.decode('utf-8') if isinstance(key, bytes) else key
+        if not headers:
+            message_instances = [Message.build(payload=message, ttl=_ttl, key=_key)
+                                 for message, _ttl in zip(messages, ttls)]
+        else:
+            headers = headers if isinstance(headers, list) else [headers] * len(messages)
+            if len(headers) != len(messages):
+                raise ValueError(f'{len(headers)} headers given for {len(messages)} messages.')
+            # checked and copied once per distinct set of headers, the messages given the same set share its copy
+            copies = dict()
+            for _headers in headers:
+                if _headers and id(_headers) not in copies:
+                    if not all(isinstance(name, str) and isinstance(value, str) for name, value in _headers.items()):
+                        raise ValueError(f'Header names and values must be strings: {_headers}')
+                    copies[id(_headers)] = dict(_headers)
+            message_instances = [Message.build(payload=message, ttl=_ttl, key=_key,
+                                               headers=copies[id(_headers)] if _headers else None)
+                                 for message, _ttl, _headers in zip(messages, ttls, headers)]
+        if topic is None:
+            if len(self._topic_pool) > 0:
+                if self._quota is not None:
+                    self._admit(None, [(BROADCAST_LOG, self._broadcast, message_instances)])
+                with self._broadcast.lock:
+                    self._append(BROADCAST_LOG, self._broadcast, message_instances)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f'{len(message_instances)} messages broadcast.')
+                self._notify(None)
+            return message_instances
+        self._queue(topic)
+        batches = []
+        for name, batch in self._partition_batches(topic, message_instances, key).items():
+            queue = self._queue_pool.get(name)
+            if queue is None:
+                # unregistered in the meantime
+                raise ValueError(f'topic "{topic}" does\'t exist.')
+            if queue.compression is not None:
+                # outside the lock, the producer pays for it
+                batch = compress_messages(queue.compression, batch)
+            batches.append((name, queue, batch))
+        if self._quota is not None or topic in self._topic_quotas:
+            self._admit(topic, batches)
+        for name, queue, batch in batches:
+            with queue.lock:
+                self._append(name, queue, batch)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'{len(message_instances)} messages sent to topic {topic}.')
+        self._notify([topic])
+        return message_instances
+
+    def _subscription(self, consumer: str, topic: str,
+                      check: bool = False) -> tuple[str, list[tuple[int, str, TopicLog]]]:
+        """
+        :param check: whether the consumer must be registered.
+        :return: the key the offsets of the consumer are kept under in each partition, its own name or
+        that of its group, and the partitions it reads as `(partition, name, log)`, in the order it reads them:
+        starting after the partition it last read from, so that no partition is starved.
+        """
+        self._queue(topic)
+        if check and consumer not in self._consumer_pool:
+            raise ValueError(f'consumer "{consumer}" does\'t exist.')
+        partitions = self._partitions.get(topic, 1)
+        group = self._group_of(consumer, topic) if len(self._groups) > 0 else None
+        if group is None:
+            key, assigned = consumer, range(partitions)
+        else:
+            key, assigned = group_key(group.name), group.partitions_of(consumer)
+        if len(assigned) > 1:
+            cursor = self._cursors.get((consumer, topic), 0)
+            assigned = sorted(assigned, key=lambda partition: (partition - cursor) % partitions)
+        subscription = []
+        for partition in assigned:
+            name = partition_name(topic, partition)
+            queue = self._queue_pool.get(name)
+            if queue is not None:
+                subscription.append((partition, name, queue))
+        return key, subscription
+
+    def _consumed(self, consumer: str, topic: str, partition: int, rotate: bool = True):
+        self._pending[(consumer, topic)] = partition
+        if self._partitions.get(topic, 1) > 1:
+            self._cursors[(consumer, topic)] = partition + 1 if rotate else partition
+
+    def _read(self, queue: TopicLog, offset: int) -> Message | None:
+        message = queue.get(offset)
+        if message is None:
+            return None
+        message.timeout = self.is_message_timeout(message)
+        if message.timeout:
+            # delete expired message (release the memory)
+            if gc_logger.isEnabledFor(logging.DEBUG):
+                gc_logger.debug(f'Message {message.id} expired.')
+            queue.expire(offset)
+        return message
+
+    @staticmethod
+    def _precedes(message: Message, other: Message | None) -> bool:
+        # expired messages and ids of any other form go first, they have no place in the order
+        _id = parse_id(message.id)
+        if other is None or _id is None:
+            return True
+        other_id = parse_id(other.id)
+        return other_id is not None and _id < other_id
+
+    def _merge(self, topic: str, key: str, name: str, queue: TopicLog, n: int, advance: bool) -> list[Message]:
+        """
+        Read up to `n` messages at the offset of `key` in the first partition of `topic`, merged with
+        the broadcasts it has yet to read by message id. The caller holds queue.lock.
+        """
+        offset, broadcast = queue.offset_of(key), self._broadcast
+        with broadcast.lock:
+            broadcast_offset = self._broadcast_offset(key, topic)
+            read, own, shared, n_own, n_shared = [], None, None, 0, 0
+            while len(read) < n:
+                if own is None and offset + n_own < queue.end_offset:
+                    own = self._read(queue, offset + n_own)
+                if shared is None and broadcast_offset + n_shared < broadcast.end_offset:
+                    shared = self._read(broadcast, broadcast_offset + n_shared)
+                if shared is not None and self._precedes(shared, own):
+                    read.append(shared)
+                    shared, n_shared = None, n_shared + 1
+                elif own is not None:
+                    read.append(own)
+                    own, n_own = None, n_own + 1
+                else:
+                    break
+            if n_own > 0:
+                self._consumed_counts[name] = self._consumed_counts.get(name, 0) + n_own
+                if advance:
+                    self._seek(name, queue, key, offset + n_own)
+            if n_shared > 0:
+                self._consumed_counts[BROADCAST_LOG] = self._consumed_counts.get(BROADCAST_LOG, 0) + n_shared
+                if advance:
+                    self._seek(BROADCAST_LOG, broadcast, broadcast_key(key, topic), broadcast_offset + n_shared)
+        return read
+
+    def _filter(self, consumer: str, topic: str, n: int, advance: bool, peek: bool, key: str | None,
+                headers: dict[str, str] | None) -> list[Message]:
+        """
+        Read up to `n` messages with the key `key` and the headers `headers` from the consumer's offset on,
+        found through the index of each partition rather than by scanning.
+        The consumer's offset moves to the first message returned, or past the last one with `advance`.
+
+        :param peek: whether only the first partition with a match is read, without rotating over them.
+        """
+        reader, subscription = self._subscription(consumer, topic, check=True)
+        messages = []
+        for partition, name, queue in subscription:
+            if len(messages) >= n:
+                break
+            read, first, last = [], None, None
+            with queue.lock:
+                offset = queue.offset_of(reader)
+                for _offset in queue.candidates(key, headers, offset):
+                    message = self._read(queue, _offset)
+                    if message is None or not matches(message, key, headers):
+                        continue
+                    read.append(message)
+                    first, last = first if first is not None else _offset, _offset
+                    if len(messages) + len(read) >= n:
+                        break
+                if len(read) > 0:
+                    self._consumed_counts[name] = self._consumed_counts.get(name, 0) + len(read)
+                    if advance or first > offset:
+                        self._seek(name, queue, reader, last + 1 if advance else first)
+            if len(read) > 0:
+                messages.extend(read)
+                if peek:
+                    self._pending[(consumer, topic)] = partition
+                    break
+                self._consumed(consumer, topic, partition)
+        return messages
+
+    def consume(self, consumer: str, topic: str, decompress: bool = True, key: str | None = None,
+                headers: dict[str, str] | None = None) -> Message | None:
+        """
+        Read the message at the consumer's offset, in the first of its partitions which has one.
+
+        :param decompress: whether to decompress the payload of a compressed topic, outside any lock,
+        otherwise it is returned as the `CompressedPayload` it is stored as.
+        :param key: only read a message of this key, found through the index of the topic.
+        The messages before it are passed for good, as if the consumer had read and dropped them:
+        its offset moves to the message read. Broadcasts are left to unfiltered reads.
+        :param headers: only read a message with every one of these headers, as `key`, both may be given.
+        """
+        if key is not None or headers:
+            message = next(iter(self._filter(consumer, topic, 1, advance=False, peek=True, key=key,
+                                             headers=headers)), None)
+            return decompress_message(message) if decompress and message is not None else message
+        key, subscription = self._subscription(consumer, topic, check=True)
+        for partition, name, queue in subscription:
+            with queue.lock:
+                if partition == 0 and not self._caught_up(key, topic):
+                    message = next(iter(self._merge(topic, key, name, queue, 1, advance=False)), None)
+                else:
+                    message = self._read(queue, queue.offset_of(key))
+                    if message is not None:
+                        self._consumed_counts[name] = self._consumed_counts.get(name, 0) + 1
+            if message is not None:
+                self._pending[(consumer, topic)] = partition
+                return decompress_message(message) if decompress else message
+        return None
+
+    def consume_batch(self, consumer: str, topic: str, n: int, advance: bool = False,
+                      decompress: bool = True, key: str | None = None,
+                      headers: dict[str, str] | None = None) -> list[Message]:
+        """
+        Read up to `n` messages starting at the consumer's offset, under a single hold of each partition's lock.
+
+        :param advance: also move the consumer's offset past the returned messages, atomically.
+        :param decompress: see `consume`, each compressed batch is decompressed once.
+        :param key: see `consume`, filtered batches are best read with `advance`, since `advance` moves
+        over messages whether they match or not.
+        :param headers: see `consume`.
+        """
+        if key is not None or headers:
+            messages = self._filter(consumer, topic, n, advance=advance, peek=False, key=key, headers=headers)
+            return decompress_messages(messages) if decompress else messages
+        key, subscription = self._subscription(consumer, topic, check=True)
+        messages = []
+        for partition, name, queue in subscription:
+            if len(messages) >= n:
+                break
+            with queue.lock:
+                if partition == 0 and not self._caught_up(key, topic):
+                    read = self._merge(topic, key, name, queue, n - len(messages), advance)
+                else:
+                    offset = queue.offset_of(key)
+                    read = [self._read(queue, _offset)
+                            for _offset in range(offset, min(offset + n - len(messages), queue.end_offset))]
+                    if len(read) > 0:
+                        self._consumed_counts[name] = self._consumed_counts.get(name, 0) + len(read)
+                    if advance and len(read) > 0:
+                        self._seek(name, queue, key, offset + len(read))
+            if len(read) > 0:
+                messages.extend(read)
+                self._consumed(consumer, topic, partition)
+        return decompress_messages(messages) if decompress else messages
+
+    def poll(self, consumer: str, topic: str, decompress: bool = True, key: str | None = None,
+             headers: dict[str, str] | None = None) -> Message | None:
+        """
+        Consume the message at the consumer's offset and advance past it, atomically.
+
+        :param decompress: see `consume`.
+        :param key: see `consume`.
+        :param headers: see `consume`.
+        """
+        if key is not None or headers:
+            message = next(iter(self._filter(consumer, topic, 1, advance=True, peek=False, key=key,
+                                             headers=headers)), None)
+            return decompress_message(message) if decompress and message is not None else message
+        key, subscription = self._subscription(consumer, topic, check=True)
+        for partition, name, queue in subscription:
+            with queue.lock:
+                if partition == 0 and not self._caught_up(key, topic):
+                    message = next(iter(self._merge(topic, key, name, queue, 1, advance=True)), None)
                 else:
-                    for t in self._topic_pool:
-                        logger.debug(f'Message {message_instance.id} broadcast to topic {t}.')
-                        self._queue_pool[t].append(message_instance)
-        return message_instance
-
-    def consume(self, consumer: str, topic: str) -> Message | None:
-        with self.__queue_pool_lock:
-            with self.__consumer_topic_offset_lock:
-                with self.__consumer_pool_lock:
-                    if topic not in self._queue_pool.keys():
-                        raise ValueError(f'topic "{topic}" does\'t exist.')
-                    if consumer not in self._consumer_pool:
-                        raise ValueError(f'consumer "{consumer}" does\'t exist.')
-                    offset = self._consumer_topic_offset[consumer].get(topic, 0)
-                    message_length = len(self._queue_pool[topic])
-                    if offset >= message_length:
-                        return None
-                    message = self._queue_pool[topic][offset]
-                    message.timeout = self.is_message_timeout(message)
-                    if message.timeout:
-                        # delete expired message (release the memory)
-                        gc_logger.debug(f'Message {message.id} expired.')
-                        self._queue_pool[topic][offset] = EXPIRED_MESSAGE
-                    return message
+                    offset = queue.offset_of(key)
+                    message = self._read(queue, offset)
+                    if message is not None:
+                        self._consumed_counts[name] = self._consumed_counts.get(name, 0) + 1
+                        self._seek(name, queue, key, offset + 1)
+            if message is not None:
+                self._consumed(consumer, topic, partition)
+                return decompress_message(message) if decompress else message
+        return None
+
+    def _step(self, topic: str, key: str, queue: TopicLog, offset: int, n: int) -> int:
+        """
+        Move `n` messages over the first partition of `topic` merged with the broadcasts, forwards or backwards,
+        the caller holds queue.lock and the broadcast lock.
+
+        :return: the new offset in the partition, that in the broadcasts is sought here.
+        """
+        broadcast = self._broadcast
+        broadcast_offset = self._broadcast_offset(key, topic)
+        start = max(self._broadcast_starts.get(topic, 0), broadcast.base_offset)
+        for _ in range(abs(n)):
+            if n > 0:
+                # stops once both are exhausted, which of them the rest would skip is yet unknown
+                if broadcast_offset < broadcast.end_offset and (
+                        offset >= queue.end_offset
+                        or self._precedes(broadcast.get(broadcast_offset), queue.get(offset))):
+                    broadcast_offset += 1
+                elif offset < queue.end_offset:
+                    offset += 1
+                else:
+                    break
+                continue
+            own = queue.get(offset - 1) if queue.base_offset < offset <= queue.end_offset else None
+            shared = broadcast.get(broadcast_offset - 1) if broadcast_offset > start else None
+            if offset > queue.end_offset or (own is not None and (shared is None or self._precedes(shared, own))):
+                offset -= 1
+            elif shared is not None:
+                broadcast_offset -= 1
+            else:
+                break
+        self._seek(BROADCAST_LOG, broadcast, broadcast_key(key, topic), broadcast_offset)
+        return offset
+
+    def _move(self, consumer: str, topic: str, n: int):
+        # moves the offset in the partition last consumed from, or in the first one to read
+        key, subscription = self._subscription(consumer, topic)
+        if len(subscription) < 1:
+            return
+        pending = self._pending.get((consumer, topic))
+        partition, name, queue = next((_partition for _partition in subscription if _partition[0] == pending),
+                                      subscription[0])
+        with queue.lock:
+            offset, broadcast = queue.offset_of(key), self._broadcast
+            if partition != 0 or (n > 0 and self._caught_up(key, topic)) or (
+                    n < 0 and self._broadcast_offset(key, topic) <= max(self._broadcast_starts.get(topic, 0),
+                                                                         broadcast.base_offset)):
+                # on a topic receiving broadcasts, an advance stops at the end of the merged order like `_step`
+                if n > 0 and partition == 0 and broadcast.end_offset > self._broadcast_starts.get(topic, 0):
+                    self._seek(name, queue, key, min(offset + n, max(offset, queue.end_offset)))
+                else:
+                    self._seek(name, queue, key, offset + n)
+            else:
+                with broadcast.lock:
+                    self._seek(name, queue, key, self._step(topic, key, queue, offset, n))
+        # after a retreat, the same partition is read again first
+        self._consumed(consumer, topic, partition, rotate=n > 0)
 
     def advance(self, consumer: str, topic: str, n: int = 1):
-        with self.__consumer_topic_offset_lock:
-            if consumer not in self._consumer_topic_offset.keys():
-                self._consumer_topic_offset[consumer] = dict()
-            if topic not in self._consumer_topic_offset[consumer].keys():
-                self._consumer_topic_offset[consumer][topic] = 0
-            self._consumer_topic_offset[consumer][topic] += n
+        self._move(consumer, topic, n)
 
     def retreat(self, consumer: str, topic: str, n: int = 1):
-        with self.__consumer_topic_offset_lock:
-            if consumer not in self._consumer_topic_offset.keys():
-                self._consumer_topic_offset[consumer] = dict()
-            if topic not in self._consumer_topic_offset[consumer].keys():
-                self._consumer_topic_offset[consumer][topic] = 0
-            self._consumer_topic_offset[consumer][topic] = max(self._consumer_topic_offset[consumer][topic] - n, 0)
+        self._move(consumer, topic, -n)
+
+    def _seek_all(self, consumer: str, topic: str, offset_in: Callable[[TopicLog], int]):
+        # seeks the offsets of every partition the consumer reads, and in the broadcasts merged into the first one
+        key, subscription = self._subscription(consumer, topic)
+        for partition, name, queue in subscription:
+            with queue.lock:
+                self._seek(name, queue, key, offset_in(queue))
+                if partition == 0:
+                    with self._broadcast.lock:
+                        self._seek(BROADCAST_LOG, self._broadcast, broadcast_key(key, topic),
+                                   max(offset_in(self._broadcast), self._broadcast_starts.get(topic, 0)))
+
+    def seek_to_time(self, consumer: str, topic: str, timestamp: float):
+        """
+        Move the consumer to the first message produced at `timestamp` or later, in every partition it reads,
+        found through the time index of each partition rather than by reading them through.
+
+        :param timestamp: seconds since the epoch, as `Message.timestamp`.
+        """
+        self._seek_all(consumer, topic, lambda queue: queue.offset_at(timestamp))
+
+    def seek_to_end(self, consumer: str, topic: str):
+        """
+        Move the consumer past the last message of every partition it reads, to consume only what comes next.
+        """
+        self._seek_all(consumer, topic, lambda queue: queue.end_offset)
+
+    def seek_to_offset(self, consumer: str, topic: str, offset: int, partition: int = 0):
+        """
+        Move the consumer to `offset` in a partition, held within the messages it keeps.
+        The broadcasts merged into the first partition are not moved.
+        """
+        self._queue(topic)
+        if not 0 <= partition < self._partitions.get(topic, 1):
+            raise ValueError(f'topic "{topic}" has no partition {partition}.')
+        group = self._group_of(consumer, topic) if len(self._groups) > 0 else None
+        key = consumer if group is None else group_key(group.name)
+        name = partition_name(topic, partition)
+        queue = self._queue(name)
+        with queue.lock:
+            self._seek(name, queue, key, min(max(offset, queue.base_offset), queue.end_offset))
@@ -0,0 +1,165 @@
+import bisect
+import math
+import time
+from threading import RLock
+
+# seconds, from 10us to 10s
+DEFAULT_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2,
+                   .1, .25, .5, 1., 2.5, 5., 10.)
+METRIC_PREFIX = 'nioflux_mq_'
+
+
+class Counter:
+    def __init__(self, name: str, description: str, label: str | tuple[str, ...] | None = None):
+        """
+        A monotonic count, one per value of `label`.
+        """
+        self.name = name
+        self.description = description
+        self.label = label
+        self._values: dict = dict()
+
+    def inc(self, n: int | float = 1, key=None):
+        self._values[key] = self._values.get(key, 0) + n
+
+    def values(self) -> dict:
+        return self._values.copy()
+
+
+class Gauge(Counter):
+    """
+    A value set at collection time, such as a backlog, which costs nothing until it is scraped.
+    """
+    def set(self, value: int | float, key=None):
+        self._values[key] = value
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, label: str | tuple[str, ...] | None = None,
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Observations counted into fixed buckets, one histogram per value of `label`.
+        An observation is a bisection and a few increments, made without a lock of its own,
+        under the lock of what is measured or on the event loop.
+        """
+        self.name = name
+        self.description = description
+        self.label = label
+        self.buckets = buckets
+        # per key: bucket counts (the last one above every bound), count, sum, max
+        self._values: dict[object, list] = dict()
+
+    def observe(self, value: float, key=None):
+        values = self._values.get(key)
+        if values is None:
+            values = self._values.setdefault(key, [[0] * (len(self.buckets) + 1), 0, .0, .0])
+        values[0][bisect.bisect_left(self.buckets, value)] += 1
+        values[1] += 1
+        values[2] += value
+        if value > values[3]:
+            values[3] = value
+
+    def discard(self, key=None):
+        self._values.pop(key, None)
+
+    def quantile(self, q: float, key=None) -> float:
+        """
+        :return: upper bound of the bucket holding the `q` quantile, the maximum if above every bound.
+        """
+        counts, count, _, _max = self._values.get(key, [(), 0, .0, .0])
+        rank, seen = math.ceil(q * count), 0
+        for bound, n in zip((*self.buckets, _max), counts):
+            seen += n
+            if seen >= rank > 0:
+                return min(bound, _max)
+        return .0
+
+    def summary(self, key=None) -> dict:
+        counts, count, _sum, _max = self._values.get(key, [(), 0, .0, .0])
+        return {
+            'count': count,
+            'mean': _sum / count if count > 0 else .0,
+            'p50': self.quantile(.5, key),
+            'p99': self.quantile(.99, key),
+            'max': _max
+        }
+
+    def values(self) -> dict:
+        return {key: [counts.copy(), count, _sum, _max]
+                for key, (counts, count, _sum, _max) in self._values.copy().items()}
+
+
+class TimedLock:
+    def __init__(self):
+        """
+        A reentrant lock recording how long contended acquisitions wait into `histogram`, once instrumented.
+        An uncontended acquisition costs a single non-blocking attempt more and is not recorded.
+        """
+        self._lock = RLock()
+        self._histogram: Histogram | None = None
+        self._key = None
+
+    def instrument(self, histogram: Histogram | None, key=None):
+        self._histogram = histogram
+        self._key = key
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if self._lock.acquire(blocking=False):
+            return True
+        if not blocking:
+            return False
+        waited_at = time.perf_counter()
+        acquired = self._lock.acquire(blocking=True, timeout=timeout)
+        if self._histogram is not None:
+            self._histogram.observe(time.perf_counter() - waited_at, self._key)
+        return acquired
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        # the uncontended path inlined, it is taken on every produce and consume
+        return self._lock.acquire(blocking=False) or self.acquire()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._lock.release()
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(label: str | tuple[str, ...] | None, key) -> str:
+    if label is None:
+        return ''
+    names, values = (label, key) if isinstance(label, tuple) else ((label,), (key,))
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def prometheus(metrics: list[Counter | Gauge | Histogram]) -> str:
+    """
+    Render `metrics` in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in metrics:
+        name = f'{METRIC_PREFIX}{metric.name}'
+        if isinstance(metric, Histogram):
+            lines.extend([f'# HELP {name} {metric.description}', f'# TYPE {name} histogram'])
+            for key, (counts, count, _sum, _) in metric.values().items():
+                labels = _labels(metric.label, key)
+                cumulative = 0
+                for bound, n in zip((*metric.buckets, '+Inf'), counts):
+                    cumulative += n
+                    le = f'le="{bound}"'
+                    lines.append(f'{name}_bucket{{{labels + "," + le if labels else le}}} {cumulative}')
+                lines.append(f'{name}_sum{{{labels}}} {_sum}' if labels else f'{name}_sum {_sum}')
+                lines.append(f'{name}_count{{{labels}}} {count}' if labels else f'{name}_count {count}')
+            continue
+        kind = 'gauge' if isinstance(metric, Gauge) else 'counter'
+        if kind == 'counter':
+            name = f'{name}_total'
+        lines.extend([f'# HELP {name} {metric.description}', f'# TYPE {name} {kind}'])
+        for key, value in metric.values().items():
+            labels = _labels(metric.label, key)
+            lines.append(f'{name}{{{labels}}} {value}' if labels else f'{name} {value}')
+    return '\n'.join(lines) + '\n'
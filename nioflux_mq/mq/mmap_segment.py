@@ -0,0 +1,256 @@
+import mmap
+import os
+import struct
+from array import array
+from collections import OrderedDict
+from threading import Lock
+
+from nioflux_mq.mq.message import Message, EXPIRED_MESSAGE, ATTRIBUTES_FLAG, pack_attributes, unpack_attributes
+from nioflux_mq.mq.compression import CompressedBatch, CompressedPayload
+
+DEFAULT_MAX_MAPS = 256
+# segment files grow geometrically, starting from this many bytes
+MIN_FILE_SIZE = 1 << 16
+
+# timestamp, ttl, id length, payload length, the id is followed by the key and headers
+# if its length carries `ATTRIBUTES_FLAG`
+_RECORD = struct.Struct('!ddHI')
+# payload length of a message of a compressed batch, whose record ends with a `_BATCH_REF`
+_COMPRESSED = 0xFFFFFFFF
+# file position of the batch, index in the batch
+_BATCH_REF = struct.Struct('!QI')
+# compression name length, number of payloads, compressed length, followed by the name, the ends and the data
+_BATCH = struct.Struct('!HII')
+
+
+class MapCache:
+    def __init__(self, max_maps: int = DEFAULT_MAX_MAPS):
+        """
+        Bounds the number of segments mapped at once, across topics.
+        The least recently mapped segment is unmapped first, and maps itself again on its next read.
+        """
+        self._max_maps = max_maps
+        self._lock = Lock()
+        self._segments: OrderedDict[MmapSegment, None] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+    def touch(self, segment: 'MmapSegment'):
+        with self._lock:
+            self._segments[segment] = None
+            self._segments.move_to_end(segment)
+            while len(self._segments) > self._max_maps:
+                evicted, _ = self._segments.popitem(last=False)
+                evicted.unmap()
+
+    def discard(self, segment: 'MmapSegment'):
+        with self._lock:
+            self._segments.pop(segment, None)
+
+
+class MmapSegment:
+    def __init__(self, path: str, base_offset: int, capacity: int, maps: MapCache):
+        """
+        A segment whose messages live in a file, read back through a read-only memory map.
+        Only the file position of each message and its expired flag are kept in memory,
+        payloads are returned as `memoryview` slices of the map and are never copied.
+        A compressed batch is written once, before the first of its messages in the segment,
+        which refer to it by file position.
+
+        A sealed segment's file is truncated to its size and closed, it is mapped again lazily.
+        """
+        self._path = path
+        self._base_offset = base_offset
+        self._capacity = capacity
+        self._maps = maps
+        if os.path.exists(path):
+            # a fresh inode, maps of a previous file by that name stay valid
+            os.remove(path)
+        self._file = open(path, mode='w+b', buffering=0)
+        self._file_size = 0
+        self._size = 0
+        self._positions: array | None = array('Q')
+        self._expired = bytearray()
+        self._live = 0
+        self._view: memoryview | None = None
+        # the batch last written, and the batch last read back with its position
+        self._written: tuple[CompressedBatch, int] | None = None
+        self._read: tuple[int, CompressedBatch] | None = None
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def base_offset(self) -> int:
+        return self._base_offset
+
+    @property
+    def end_offset(self) -> int:
+        return self._base_offset + len(self._expired)
+
+    @property
+    def full(self) -> bool:
+        return len(self._expired) >= self._capacity
+
+    @property
+    def live(self) -> int:
+        return self._live
+
+    @property
+    def released(self) -> bool:
+        return self._positions is None
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._expired)
+
+    def __iter__(self):
+        for i in range(len(self._expired)):
+            yield self.get(self._base_offset + i)
+
+    def _write(self, parts: list[bytes]):
+        size = sum(len(part) for part in parts)
+        if self._size + size > self._file_size:
+            self._file_size = max(self._file_size * 2, self._size + size, MIN_FILE_SIZE)
+            self._file.truncate(self._file_size)
+        self._file.seek(self._size)
+        for part in parts:
+            self._file.write(part)
+        self._size += size
+
+    def append(self, message: Message) -> int:
+        offset = self.end_offset
+        _id = message.id.encode('utf-8')
+        id_length = len(_id)
+        if message.has_attributes:
+            id_length |= ATTRIBUTES_FLAG
+            _id += pack_attributes(message.key, message.headers)
+        payload = message.payload
+        if isinstance(payload, CompressedPayload):
+            if self._written is None or self._written[0] is not payload.batch:
+                batch, name = payload.batch, payload.batch.compression.encode('utf-8')
+                self._written = (batch, self._size)
+                self._write([_BATCH.pack(len(name), len(batch.ends), len(batch.data)), name, batch.ends.tobytes(),
+                             batch.data])
+            record = [_RECORD.pack(message.timestamp, message.ttl, id_length, _COMPRESSED), _id,
+                      _BATCH_REF.pack(self._written[1], payload.index)]
+        else:
+            record = [_RECORD.pack(message.timestamp, message.ttl, id_length, len(payload)), _id, payload]
+        self._positions.append(self._size)
+        self._write(record)
+        if message.id == EXPIRED_MESSAGE.id:
+            self._expired.append(1)
+        else:
+            self._expired.append(0)
+            self._live += 1
+        if self.full:
+            self._seal()
+        return offset
+
+    def _seal(self):
+        self._file.truncate(self._size)
+        self._file_size = self._size
+        self._file.close()
+        self._file = None
+        self._view = None
+        self._written = None
+
+    def _map(self) -> memoryview:
+        _map = None
+        f = self._file
+        if f is not None:
+            try:
+                _map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                # sealed by another thread in the meantime
+                pass
+        if _map is None:
+            with open(self._path, mode='rb') as f:
+                _map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # views handed out keep the map alive, it is unmapped once the last of them is gone
+        view = memoryview(_map)
+        self._view = view
+        self._maps.touch(self)
+        return view
+
+    def unmap(self):
+        self._view = None
+        # batches read back hold slices of the map
+        self._read = None
+
+    def _batch_at(self, view: memoryview, at: int) -> CompressedBatch:
+        read, position = self._read, at
+        if read is not None and read[0] == position:
+            return read[1]
+        name_length, n, data_length = _BATCH.unpack_from(view, at)
+        at += _BATCH.size
+        compression = bytes(view[at:at + name_length]).decode('utf-8')
+        at += name_length
+        ends = array('I')
+        ends.frombytes(view[at:at + n * ends.itemsize])
+        at += n * ends.itemsize
+        batch = CompressedBatch(compression=compression, data=view[at:at + data_length], ends=ends)
+        self._read = (position, batch)
+        return batch
+
+    def get(self, offset: int) -> Message:
+        positions = self._positions
+        if positions is None:
+            return EXPIRED_MESSAGE
+        i = offset - self._base_offset
+        if self._expired[i]:
+            return EXPIRED_MESSAGE
+        at = positions[i]
+        end = positions[i + 1] if i + 1 < len(positions) else self._size
+        view = self._view
+        if view is None or len(view) < end:
+            try:
+                view = self._map()
+            except FileNotFoundError:
+                # released by another thread in the meantime
+                return EXPIRED_MESSAGE
+        timestamp, ttl, id_length, payload_length = _RECORD.unpack_from(view, at)
+        at += _RECORD.size
+        _id = bytes(view[at:at + (id_length & ~ATTRIBUTES_FLAG)]).decode('utf-8')
+        at += id_length & ~ATTRIBUTES_FLAG
+        key, headers = None, None
+        if id_length & ATTRIBUTES_FLAG:
+            key, headers, at = unpack_attributes(view, at)
+        if payload_length == _COMPRESSED:
+            position, index = _BATCH_REF.unpack_from(view, at)
+            payload = CompressedPayload(self._batch_at(view, position), index)
+        else:
+            payload = view[at:at + payload_length]
+        return Message(id=_id, payload=payload, timestamp=timestamp, ttl=ttl, key=key, headers=headers)
+
+    def expire(self, offset: int) -> bool:
+        if self._positions is None:
+            return False
+        i = offset - self._base_offset
+        if self._expired[i]:
+            return False
+        self._expired[i] = 1
+        self._live -= 1
+        return True
+
+    def release(self):
+        # keep the offset range, so logical offsets stay contiguous, but give the file back
+        if self._positions is None:
+            return
+        self._positions = None
+        self._live = 0
+        self._view = None
+        self._written, self._read = None, None
+        self._maps.discard(self)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            os.remove(self._path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,100 @@
+import time
+from dataclasses import dataclass
+
+POLICY_REJECT = 'reject'
+POLICY_BLOCK = 'block'
+POLICY_DROP_OLDEST = 'drop_oldest'
+POLICIES = (POLICY_REJECT, POLICY_BLOCK, POLICY_DROP_OLDEST)
+DEFAULT_BLOCK_TIMEOUT = 5.
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, message: str, quota: 'Quota | None' = None):
+        """
+        A produce refused for want of room or over a rate limit, worth retrying once consumers catch up.
+
+        :param quota: the quota the produce would have exceeded, `None` for a rate limit.
+        """
+        super().__init__(message)
+        self.quota = quota
+
+
+@dataclass(slots=True)
+class Quota:
+    """
+    Limits on the payload bytes and the messages retained, by a topic or by the whole queue.
+    `None` leaves either unlimited.
+
+    `reject` refuses a produce which would exceed them, `block` has the server hold it back until
+    there is room, `drop_oldest` makes room by moving consumers past the oldest messages and dropping them.
+    """
+    max_bytes: int | None = None
+    max_messages: int | None = None
+    policy: str = POLICY_REJECT
+
+    def __post_init__(self):
+        if self.policy not in POLICIES:
+            raise ValueError(f'Unsupported quota policy: {self.policy}')
+
+    def excess(self, _bytes: int, messages: int) -> tuple[int, int]:
+        """
+        :return: the bytes and the messages over the limits, 0 within them.
+        """
+        return (max(_bytes - self.max_bytes, 0) if self.max_bytes is not None else 0,
+                max(messages - self.max_messages, 0) if self.max_messages is not None else 0)
+
+    def exceeded(self, _bytes: int, messages: int) -> bool:
+        return self.excess(_bytes, messages) != (0, 0)
+
+    def as_dict(self) -> dict:
+        return {'max_bytes': self.max_bytes, 'max_messages': self.max_messages, 'policy': self.policy}
+
+    @staticmethod
+    def parse(spec: str) -> tuple[str, 'Quota']:
+        """
+        :param spec: `topic:max_bytes:max_messages[:policy]`, an empty limit leaves it unlimited.
+        :return: the topic and its quota.
+        """
+        policy = POLICY_REJECT
+        topic, _, rest = spec.rpartition(':')
+        if rest in POLICIES:
+            policy = rest
+        else:
+            topic = spec
+        topic, *limits = topic.rsplit(':', 2)
+        if len(limits) < 2 or len(topic) < 1:
+            raise ValueError(f'Bad quota: {spec}')
+        max_bytes, max_messages = (int(limit) if limit else None for limit in limits)
+        return topic, Quota(max_bytes=max_bytes, max_messages=max_messages, policy=policy)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        """
+        Refilled at `rate` tokens per second, holding up to `burst` of them.
+        Tokens are taken ahead of time, the bucket then runs into debt, which the next takers wait out.
+        """
+        self._rate = rate
+        self._burst = burst
+        self._tokens = burst
+        self._refilled_at = time.perf_counter()
+
+    @property
+    def burst(self) -> float:
+        return self._burst
+
+    def _refill(self):
+        now = time.perf_counter()
+        self._tokens = min(self._tokens + (now - self._refilled_at) * self._rate, self._burst)
+        self._refilled_at = now
+
+    def delay(self, n: float) -> float:
+        """
+        :return: seconds until `n` tokens are available.
+        """
+        self._refill()
+        return max(n - self._tokens, .0) / self._rate
+
+    def take(self, n: float):
+        self._refill()
+        self._tokens -= n
@@ -0,0 +1,104 @@
+from array import array
+
+from nioflux_mq.mq.message import Message, EXPIRED_MESSAGE, format_id, parse_id
+
+
+class Segment:
+    def __init__(self, base_offset: int, capacity: int):
+        """
+        Messages are kept as columns rather than as `Message` objects: integer ids, timestamps and ttls
+        in arrays, payloads in a list in which `None` marks an expired message.
+        `Message` objects, and their hex ids, are only made on `get`.
+        """
+        self._base_offset = base_offset
+        self._capacity = capacity
+        self._ids = array('Q')
+        self._timestamps = array('d')
+        self._ttls = array('d')
+        self._payloads: list[bytes | None] | None = []
+        # ids not made by `Message.build`, e.g. from snapshots of older versions, by index, under id 0
+        self._odd_ids: dict[int, str] = dict()
+        # keys and headers of the messages which have them, by index
+        self._keys: dict[int, str] = dict()
+        self._headers: dict[int, dict[str, str]] = dict()
+        self._live = 0
+
+    @property
+    def base_offset(self) -> int:
+        return self._base_offset
+
+    @property
+    def end_offset(self) -> int:
+        return self._base_offset + len(self._ids)
+
+    @property
+    def full(self) -> bool:
+        return len(self._ids) >= self._capacity
+
+    @property
+    def live(self) -> int:
+        return self._live
+
+    @property
+    def released(self) -> bool:
+        return self._payloads is None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self):
+        for i in range(len(self._ids)):
+            yield self.get(self._base_offset + i)
+
+    def append(self, message: Message) -> int:
+        offset = self.end_offset
+        if message.id == EXPIRED_MESSAGE.id:
+            self._payloads.append(None)
+            _id = 0
+        else:
+            self._payloads.append(message.payload)
+            self._live += 1
+            _id = parse_id(message.id)
+            if not _id:
+                self._odd_ids[offset - self._base_offset] = message.id
+                _id = 0
+            if message.key is not None:
+                self._keys[offset - self._base_offset] = message.key
+            if message.headers is not None:
+                self._headers[offset - self._base_offset] = message.headers
+        self._timestamps.append(message.timestamp)
+        self._ttls.append(message.ttl)
+        # ids last, the length of the segment is the length of this column
+        self._ids.append(_id)
+        return offset
+
+    def get(self, offset: int) -> Message:
+        payloads = self._payloads
+        if payloads is None:
+            return EXPIRED_MESSAGE
+        i = offset - self._base_offset
+        payload = payloads[i]
+        if payload is None:
+            return EXPIRED_MESSAGE
+        _id = self._ids[i]
+        return Message(id=format_id(_id) if _id else self._odd_ids[i], payload=payload,
+                       timestamp=self._timestamps[i], ttl=self._ttls[i], key=self._keys.get(i),
+                       headers=self._headers.get(i))
+
+    def expire(self, offset: int) -> bool:
+        if self._payloads is None:
+            return False
+        i = offset - self._base_offset
+        if self._payloads[i] is None:
+            return False
+        self._payloads[i] = None
+        self._keys.pop(i, None)
+        self._headers.pop(i, None)
+        self._live -= 1
+        return True
+
+    def release(self):
+        # drop the payloads but keep the offset range, so logical offsets stay contiguous
+        self._payloads = None
+        self._keys, self._headers = dict(), dict()
+        self._live = 0
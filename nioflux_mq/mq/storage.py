@@ -0,0 +1,110 @@
+import os
+import shutil
+import uuid
+from typing_extensions import BinaryIO
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from nioflux_mq.mq.segment import Segment
+from nioflux_mq.mq.mmap_segment import MmapSegment, MapCache
+
+STORAGE_MEMORY = 'memory'
+STORAGE_MMAP = 'mmap'
+STORAGES = (STORAGE_MEMORY, STORAGE_MMAP)
+SEGMENT_FILE_SUFFIX = '.seg'
+LOCK_FILE_SUFFIX = '.lock'
+
+
+class MemoryStorage:
+    """
+    Keeps the segments of a topic on the heap.
+    """
+    kind = STORAGE_MEMORY
+
+    def segment(self, base_offset: int, capacity: int) -> Segment:
+        return Segment(base_offset=base_offset, capacity=capacity)
+
+    def destroy(self):
+        pass
+
+
+class MmapStorage:
+    kind = STORAGE_MMAP
+
+    def __init__(self, directory: str, maps: MapCache):
+        """
+        Keeps the segments of a topic in files, one per segment, named by base offset.
+        Each log gets a directory of its own under `directory`, locked for as long as the log lives:
+        segment files left by a previous log of the topic are never reused, the directories of the logs
+        no one holds any more are removed instead, those of live logs, as when a snapshot is loaded
+        alongside the logs it replaces, are left alone.
+        The snapshot and the write-ahead log remain the source of truth on recovery.
+        """
+        self._root = directory
+        self._maps = maps
+        os.makedirs(directory, exist_ok=True)
+        name = uuid.uuid4().hex
+        # locked before the directory exists, so that no one takes it for a stale one
+        self._lock = _lock(os.path.join(directory, f'{name}{LOCK_FILE_SUFFIX}'))
+        self._directory = os.path.join(directory, name)
+        os.makedirs(self._directory, exist_ok=True)
+        _remove_stale(directory)
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    def segment(self, base_offset: int, capacity: int) -> MmapSegment:
+        return MmapSegment(path=os.path.join(self._directory, f'{base_offset:020d}{SEGMENT_FILE_SUFFIX}'),
+                           base_offset=base_offset, capacity=capacity, maps=self._maps)
+
+    def destroy(self):
+        shutil.rmtree(self._directory, ignore_errors=True)
+        if self._lock is not None:
+            _unlock(self._lock, remove=True)
+            self._lock = None
+        try:
+            os.rmdir(self._root)
+        except OSError:
+            pass
+
+
+def _lock(path: str, blocking: bool = True) -> BinaryIO | None:
+    # an exclusive lock on `path`, released by the OS along with the process holding it,
+    # `None` if someone else holds it or locks are not supported
+    if fcntl is None:
+        return None
+    f = open(path, mode='ab')
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+def _unlock(f: BinaryIO, remove: bool = False):
+    if remove:
+        try:
+            os.remove(f.name)
+        except OSError:
+            pass
+    f.close()
+
+
+def _remove_stale(directory: str):
+    # the log directories whose lock no one holds, left by logs of processes gone since, without locks
+    # there is no telling them from live ones
+    if fcntl is None:
+        return
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if not os.path.isdir(path):
+            continue
+        lock = _lock(f'{path}{LOCK_FILE_SUFFIX}', blocking=False)
+        if lock is not None:
+            shutil.rmtree(path, ignore_errors=True)
+            _unlock(lock, remove=True)
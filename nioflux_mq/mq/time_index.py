@@ -0,0 +1,44 @@
+from array import array
+from bisect import bisect_left
+
+DEFAULT_TIME_INDEX_INTERVAL = 128
+
+
+class TimeIndex:
+    def __init__(self, interval: int = DEFAULT_TIME_INDEX_INTERVAL):
+        """
+        Sparse index of the timestamps of a `TopicLog`: an entry every `interval` messages,
+        holding the offset of a message and the latest timestamp of the log up to it.
+        Messages produced concurrently may be appended slightly out of timestamp order,
+        the latest timestamp so far ascends regardless, so entries can be bisected.
+        """
+        self._interval = interval
+        self._offsets = array('Q')
+        self._timestamps = array('d')
+        self._latest = float('-inf')
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def add(self, offset: int, timestamp: float):
+        if timestamp > self._latest:
+            self._latest = timestamp
+        if len(self._offsets) < 1 or offset - self._offsets[-1] >= self._interval:
+            self._offsets.append(offset)
+            self._timestamps.append(self._latest)
+
+    def before(self, timestamp: float) -> int | None:
+        """
+        :return: the offset of the last entry up to which every message is stamped before `timestamp`,
+        the first message stamped `timestamp` or later follows it, no later than the next entry,
+        `None` if it may precede the first entry.
+        """
+        i = bisect_left(self._timestamps, timestamp)
+        return self._offsets[i - 1] if i > 0 else None
+
+    def trim(self, base_offset: int):
+        # drop the entries of dropped segments
+        i = bisect_left(self._offsets, base_offset)
+        if i > 0:
+            del self._offsets[:i]
+            del self._timestamps[:i]
@@ -0,0 +1,42 @@
+import asyncio
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from typing_extensions import Callable, Any
+
+EXECUTION_INLINE = 'inline'
+EXECUTION_THREAD = 'thread'
+EXECUTIONS = (EXECUTION_INLINE, EXECUTION_THREAD)
+DEFAULT_WORKERS = 4
+
+
+class TopicExecutor:
+    def __init__(self, workers: int = DEFAULT_WORKERS):
+        """
+        Runs blocking `MessageQueue` calls off the event loop, on `workers` lanes of one thread each.
+        Every call on a topic runs on the lane of that topic, so calls on a topic run one at a time,
+        in the order they were submitted. Calls on no topic in particular, such as registrations,
+        broadcasts and snapshots, run on a lane of their own.
+        """
+        if workers < 1:
+            raise ValueError(f'At least 1 worker is required, got {workers}.')
+        self._lanes = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'nioflux.mq.worker.{i}')
+                       for i in range(workers)]
+        self._control_lane = ThreadPoolExecutor(max_workers=1, thread_name_prefix='nioflux.mq.worker.control')
+
+    @property
+    def workers(self) -> int:
+        return len(self._lanes)
+
+    def lane_of(self, topic: str | None) -> ThreadPoolExecutor:
+        if topic is None:
+            return self._control_lane
+        # a stable hash, so a topic keeps its lane
+        return self._lanes[zlib.crc32(topic.encode('utf-8')) % len(self._lanes)]
+
+    async def run(self, topic: str | None, fn: Callable[..., Any], /, *args, **kwargs) -> Any:
+        return await asyncio.wrap_future(self.lane_of(topic).submit(fn, *args, **kwargs))
+
+    def shutdown(self):
+        for lane in (*self._lanes, self._control_lane):
+            lane.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,333 @@
+import heapq
+from array import array
+from collections import deque
+from typing_extensions import Iterator
+
+from nioflux_mq.mq.message import Message, EXPIRED_MESSAGE
+from nioflux_mq.mq.compression import stored_size
+from nioflux_mq.mq.message_index import MessageIndex
+from nioflux_mq.mq.time_index import TimeIndex
+from nioflux_mq.mq.segment import Segment
+from nioflux_mq.mq.mmap_segment import MmapSegment
+from nioflux_mq.mq.storage import MemoryStorage, MmapStorage
+from nioflux_mq.mq.metrics import TimedLock
+
+DEFAULT_SEGMENT_SIZE = 1024
+
+
+class TopicLog:
+    def __init__(self, segment_size: int = DEFAULT_SEGMENT_SIZE, base_offset: int = 0,
+                 storage: MemoryStorage | MmapStorage | None = None, compression: str | None = None):
+        """
+        Append-only message log addressed by logical offsets.
+        Messages are stored in fixed-size segments, the oldest of which can be dropped as a whole.
+        The log also owns the offsets of its consumers, an index of the keys and headers of its messages
+        and a sparse index of their timestamps, all guarded by `lock`.
+
+        :param storage: where segments are kept, on the heap by default.
+        :param compression: name of the compression the payloads of each produced batch are stored with,
+        see `nioflux_mq.mq.compression`, uncompressed if not given.
+        """
+        self._lock = TimedLock()
+        self._compression = compression
+        self._offsets: dict[str, int] = dict()
+        self._segment_size = segment_size
+        self._storage = storage if storage is not None else MemoryStorage()
+        self._segments: deque[Segment | MmapSegment] = deque([self._storage.segment(base_offset, segment_size)])
+        # payload bytes of each message plus 1 by segment, 0 once expired
+        self._sizes: deque[array] = deque([array('I')])
+        self._bytes = 0
+        self._live = 0
+        # every message before it has expired
+        self._expired_to = base_offset
+        # min-heap of (expires_at, offset), holding only messages with a ttl
+        self._expiry: list[tuple[float, int]] = []
+        self._index = MessageIndex()
+        self._time_index = TimeIndex()
+        self._closed = False
+
+    @staticmethod
+    def restore(messages: list[Message], base_offset: int = 0, segment_size: int = DEFAULT_SEGMENT_SIZE,
+                storage: MemoryStorage | MmapStorage | None = None):
+        log = TopicLog(segment_size=segment_size, base_offset=base_offset, storage=storage)
+        for message in messages:
+            if message.id == EXPIRED_MESSAGE.id:
+                message = EXPIRED_MESSAGE
+            log.append(message)
+        return log
+
+    @property
+    def lock(self) -> TimedLock:
+        return self._lock
+
+    @property
+    def offsets(self) -> dict[str, int]:
+        return self._offsets.copy()
+
+    @property
+    def closed(self) -> bool:
+        # destroyed, nothing may be appended to it any more
+        return self._closed
+
+    @property
+    def storage(self) -> str:
+        return self._storage.kind
+
+    @property
+    def compression(self) -> str | None:
+        return self._compression
+
+    @property
+    def expiring(self) -> int:
+        # number of entries of the expiry index
+        return len(self._expiry)
+
+    @property
+    def indexed(self) -> int:
+        # number of distinct keys and header values indexed
+        return len(self._index)
+
+    @property
+    def size(self) -> int:
+        # payload bytes of the messages kept which have not expired
+        return self._bytes
+
+    @property
+    def live(self) -> int:
+        # messages kept which have not expired
+        return self._live
+
+    @property
+    def segment_size(self) -> int:
+        return self._segment_size
+
+    @property
+    def segments(self) -> int:
+        return len(self._segments)
+
+    @property
+    def base_offset(self) -> int:
+        return self._segments[0].base_offset
+
+    @property
+    def end_offset(self) -> int:
+        return self._segments[-1].end_offset
+
+    def __len__(self) -> int:
+        return self.end_offset - self.base_offset
+
+    def __iter__(self):
+        for segment in self._segments:
+            yield from segment
+
+    def __repr__(self) -> str:
+        return (f'TopicLog(base_offset={self.base_offset}, end_offset={self.end_offset}, '
+                f'segments={self.segments})')
+
+    def freeze(self):
+        return FrozenTopicLog(self)
+
+    def destroy(self):
+        """
+        Release every segment and give the storage of the log back, messages read before stay readable.
+        The log is closed, whoever looked it up before it was destroyed finds it so once they hold its lock.
+        """
+        self._closed = True
+        for segment in self._segments:
+            segment.release()
+        self._index = MessageIndex()
+        self._time_index = TimeIndex()
+        self._storage.destroy()
+
+    def _segment_of(self, offset: int) -> Segment | MmapSegment | None:
+        if offset < self.base_offset or offset >= self.end_offset:
+            return None
+        return self._segments[(offset - self.base_offset) // self._segment_size]
+
+    def offset_of(self, consumer: str, default: int | None = None) -> int:
+        # offsets behind the base offset point into dropped segments, a consumer which has yet to read the log
+        # starts past the messages released ahead of their segment
+        return max(self._offsets.get(consumer, default if default is not None else self._expired_to),
+                   self.base_offset)
+
+    def seek(self, consumer: str, offset: int) -> int:
+        self._offsets[consumer] = max(offset, self.base_offset)
+        return self._offsets[consumer]
+
+    def forget(self, consumer: str):
+        self._offsets.pop(consumer, None)
+
+    def min_offset(self, consumers, default: int = 0) -> int | None:
+        offsets = [self._offsets.get(consumer, default) for consumer in consumers]
+        return min(offsets) if len(offsets) > 0 else None
+
+    def append(self, message: Message) -> int:
+        if self._segments[-1].full:
+            self._segments.append(self._storage.segment(self.end_offset, self._segment_size))
+            self._sizes.append(array('I'))
+        offset = self._segments[-1].append(message)
+        if message is EXPIRED_MESSAGE:
+            self._sizes[-1].append(0)
+        else:
+            size = stored_size(message.payload)
+            self._sizes[-1].append(size + 1)
+            self._bytes += size
+            self._live += 1
+            self._time_index.add(offset, message.timestamp)
+            if message.ttl >= .0:
+                heapq.heappush(self._expiry, (message.timestamp + message.ttl, offset))
+        if message.key is not None or message.headers is not None:
+            self._index.add(offset, message)
+        return offset
+
+    def candidates(self, key: str | None, headers: dict[str, str] | None, start: int) -> Iterator[int]:
+        """
+        Offsets from `start` on of the messages which may have the key `key` and the headers `headers`,
+        looked up in the index, see `MessageIndex.candidates`.
+        """
+        return self._index.candidates(key, headers, max(start, self.base_offset))
+
+    def offset_at(self, timestamp: float) -> int:
+        """
+        :return: the offset of the first message stamped `timestamp` or later, `end_offset` if none is,
+        found by bisecting the time index, then reading at most an index interval of messages.
+        """
+        before = self._time_index.before(timestamp)
+        offset = max(before + 1 if before is not None else self.base_offset, self.base_offset)
+        while offset < self.end_offset:
+            message = self.get(offset)
+            if message is not EXPIRED_MESSAGE and message.timestamp >= timestamp:
+                break
+            offset += 1
+        return offset
+
+    def get(self, offset: int) -> Message | None:
+        segment = self._segment_of(offset)
+        if segment is None:
+            return None
+        return segment.get(offset)
+
+    def expire(self, offset: int) -> bool:
+        segment = self._segment_of(offset)
+        if segment is None or not segment.expire(offset):
+            return False
+        sizes, i = self._sizes[(offset - self.base_offset) // self._segment_size], offset - segment.base_offset
+        self._bytes -= sizes[i] - 1
+        sizes[i] = 0
+        self._live -= 1
+        return True
+
+    def expire_before(self, offset: int) -> int:
+        """
+        Expire every message before `offset`, releasing their payloads ahead of the segment they are in.
+
+        :return: number of messages expired.
+        """
+        expired = 0
+        for _offset in range(max(self._expired_to, self.base_offset), min(offset, self.end_offset)):
+            if self.expire(_offset):
+                expired += 1
+        self._expired_to = max(self._expired_to, offset)
+        return expired
+
+    def offset_freeing(self, messages: int, size: int) -> int:
+        """
+        :return: the offset up to which the messages kept number at least `messages` and take
+        at least `size` payload bytes, `end_offset` if they don't.
+        """
+        offset = max(self._expired_to, self.base_offset)
+        while offset < self.end_offset and (messages > 0 or size > 0):
+            i = offset - self.base_offset
+            _size = self._sizes[i // self._segment_size][i % self._segment_size]
+            if _size > 0:
+                messages -= 1
+                size -= _size - 1
+            offset += 1
+        return offset
+
+    def expire_due(self, now: float, limit: int) -> tuple[int, int]:
+        """
+        Expire at most `limit` messages whose deadline has passed, in deadline order.
+
+        :return: number of index entries examined and number of messages actually expired.
+        """
+        examined, expired = 0, 0
+        while self._expiry and examined < limit and self._expiry[0][0] < now:
+            _, offset = heapq.heappop(self._expiry)
+            examined += 1
+            if self.expire(offset):
+                expired += 1
+        return examined, expired
+
+    def compact(self, min_offset: int | None = None) -> int:
+        """
+        Release sealed segments holding only expired messages, then drop leading segments
+        which are released or which every consumer has moved past (`min_offset`).
+        The tail segment is always kept, so `end_offset` never moves backwards.
+
+        :return: number of segments dropped from the head of the log.
+        """
+        for segment in self._segments:
+            if segment.full and not segment.released and segment.live == 0:
+                segment.release()
+        dropped = 0
+        while len(self._segments) > 1:
+            head = self._segments[0]
+            if head.released or (min_offset is not None and head.end_offset <= min_offset):
+                self._live -= head.live
+                self._bytes -= sum(self._sizes.popleft()) - head.live
+                self._segments.popleft().release()
+                dropped += 1
+            else:
+                break
+        if dropped > 0:
+            self._index.trim(self.base_offset)
+            self._time_index.trim(self.base_offset)
+            # entries of dropped segments would only be popped once due, a long lived topic piles them up
+            self._expiry = [entry for entry in self._expiry if entry[1] >= self.base_offset]
+            heapq.heapify(self._expiry)
+        return dropped
+
+
+class FrozenTopicLog:
+    def __init__(self, log: TopicLog):
+        """
+        A point-in-time view of a `TopicLog`, taken under its lock in O(segments) and readable without it.
+        Segments are append-only, so each one is captured along with its current length.
+        Messages expired or released after the freeze read back as `EXPIRED_MESSAGE`.
+        """
+        self._storage = log.storage
+        self._compression = log.compression
+        self._base_offset = log.base_offset
+        self._end_offset = log.end_offset
+        self._offsets = log.offsets
+        # noinspection PyProtectedMember
+        self._segments = [(segment, len(segment)) for segment in log._segments]
+
+    @property
+    def base_offset(self) -> int:
+        return self._base_offset
+
+    @property
+    def end_offset(self) -> int:
+        return self._end_offset
+
+    @property
+    def storage(self) -> str:
+        return self._storage
+
+    @property
+    def compression(self) -> str | None:
+        return self._compression
+
+    @property
+    def offsets(self) -> dict[str, int]:
+        return self._offsets
+
+    def __len__(self) -> int:
+        return self._end_offset - self._base_offset
+
+    def __iter__(self):
+        for segment, length in self._segments:
+            for offset in range(segment.base_offset, segment.base_offset + length):
+                yield segment.get(offset)
@@ -0,0 +1,78 @@
+import asyncio
+from typing_extensions import Iterable
+
+
+class TopicWaiters:
+    def __init__(self):
+        """
+        Per-topic asyncio waiters, used to park consume requests until a message is produced to their topic.
+        `notify` is thread-safe, so it can be registered as a `MessageQueue` listener
+        whichever thread produces.
+        """
+        self._waiters: dict[str, set[asyncio.Future]] = dict()
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def __len__(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def waiting(self, topic: str) -> bool:
+        # read from the event loop, whether anyone waits on `topic`
+        return topic in self._waiters
+
+    def register(self, topic: str) -> asyncio.Future:
+        """
+        Register a waiter before checking the topic, so that a message produced in between is never missed.
+        """
+        self._loop = asyncio.get_running_loop()
+        waiter = self._loop.create_future()
+        self._waiters.setdefault(topic, set()).add(waiter)
+        return waiter
+
+    def discard(self, topic: str, waiter: asyncio.Future):
+        waiters = self._waiters.get(topic)
+        if waiters is not None:
+            waiters.discard(waiter)
+            if len(waiters) < 1:
+                del self._waiters[topic]
+
+    def _wake(self, topics: Iterable[str] | None):
+        if topics is None:
+            topics = list(self._waiters.keys())
+        for topic in topics:
+            for waiter in self._waiters.pop(topic, ()):
+                if not waiter.done():
+                    waiter.set_result(topic)
+
+    def notify(self, topics: Iterable[str] | None):
+        """
+        :param topics: topics appended to, `None` after a broadcast, which wakes every waiter.
+        """
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._wake, list(topics) if topics is not None else None)
+
+    async def wait_for(self, topic: str, check, timeout: float | None):
+        """
+        Await `check` until it returns something other than `None` or an empty list,
+        waiting for a message to be produced to `topic` between calls, at most `timeout` seconds overall.
+
+        :param check: a coroutine function.
+        :return: the last result of `check`.
+        """
+        if timeout is None or timeout <= .0:
+            return await check()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            waiter = self.register(topic)
+            try:
+                result = await check()
+                remaining = deadline - loop.time()
+                if (result is not None and result != []) or remaining <= .0:
+                    return result
+                try:
+                    await asyncio.wait_for(waiter, remaining)
+                except asyncio.TimeoutError:
+                    pass
+            finally:
+                self.discard(topic, waiter)
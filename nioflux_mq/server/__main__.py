@@ -1,5 +1,71 @@
+import argparse
+import logging
+
 from nioflux_mq.server import NioFluxMQServer
+from nioflux_mq.server.shards import start_shards, stop_shards
+from nioflux_mq.mq.storage import STORAGES, STORAGE_MEMORY
+from nioflux_mq.mq.topic_executor import EXECUTIONS, EXECUTION_INLINE, DEFAULT_WORKERS
+from nioflux_mq.snapshot.write_ahead_log import FSYNC_POLICIES
+from nioflux_mq.snapshot.replication_log import ACKS, ACK_LEADER
+from nioflux_mq.mq.quota import Quota, POLICIES, POLICY_REJECT, DEFAULT_BLOCK_TIMEOUT
+
+logger = logging.getLogger('nioflux.mq')
 
 
 if __name__ == '__main__':
-    NioFluxMQServer(host='0.0.0.0', port=None).run()
+    parser = argparse.ArgumentParser(prog='python -m nioflux_mq.server')
+    parser.add_argument('--host', type=str, default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=None, help='a free port by default, '
+                                                               'the port of the first shard with --shards, '
+                                                               'required then')
+    parser.add_argument('--shards', type=int, default=1, help='server processes to split topics across, '
+                                                              'listening on consecutive ports')
+    parser.add_argument('--wal-fsync', type=str, choices=FSYNC_POLICIES, default=None)
+    parser.add_argument('--storage', type=str, choices=STORAGES, default=STORAGE_MEMORY)
+    parser.add_argument('--execution', type=str, choices=EXECUTIONS, default=EXECUTION_INLINE)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--metrics-port', type=int, default=None, help='port to serve Prometheus metrics on, '
+                                                                       'consecutive ports with --shards')
+    parser.add_argument('--replication', action='store_true', help='keep a replication log for followers to fetch')
+    parser.add_argument('--replication-ack', type=str, choices=ACKS, default=ACK_LEADER,
+                        help='acknowledge operations once applied by the leader, or by a follower too')
+    parser.add_argument('--follow', type=str, default=None, help='host:port of a leader to follow, read only '
+                                                                 'until promoted')
+    parser.add_argument('--max-bytes', type=int, default=None, help='payload bytes the server retains at most')
+    parser.add_argument('--max-messages', type=int, default=None, help='messages the server retains at most')
+    parser.add_argument('--quota-policy', type=str, choices=POLICIES, default=POLICY_REJECT,
+                        help='what a produce over --max-bytes or --max-messages gets')
+    parser.add_argument('--topic-quota', type=str, action='append', default=[],
+                        help='topic:max_bytes:max_messages[:policy], an empty limit leaves it unlimited, repeatable')
+    parser.add_argument('--block-timeout', type=float, default=DEFAULT_BLOCK_TIMEOUT,
+                        help='seconds a produce over a block quota waits for room')
+    parser.add_argument('--rate-limit', type=float, default=None, help='messages per second per connection')
+    parser.add_argument('--byte-rate-limit', type=float, default=None, help='payload bytes per second '
+                                                                            'per connection')
+    args = parser.parse_args()
+    if args.follow is not None and args.shards > 1:
+        parser.error('--follow follows a single server, start a follower per shard instead')
+    if args.port is None and args.shards > 1:
+        parser.error('--shards needs --port, shards listen on consecutive ports from it, where clients find them')
+    try:
+        topic_quotas = dict(Quota.parse(spec) for spec in args.topic_quota)
+    except ValueError as e:
+        parser.error(str(e))
+    quota = None
+    if args.max_bytes is not None or args.max_messages is not None:
+        quota = Quota(max_bytes=args.max_bytes, max_messages=args.max_messages, policy=args.quota_policy)
+    kwargs = dict(wal_fsync=args.wal_fsync, storage=args.storage, execution=args.execution, workers=args.workers,
+                  metrics_port=args.metrics_port, replication=args.replication, replication_ack=args.replication_ack,
+                  follow=args.follow, quota=quota, topic_quotas=topic_quotas, block_timeout=args.block_timeout,
+                  rate_limit=args.rate_limit, byte_rate_limit=args.byte_rate_limit)
+    if args.shards > 1:
+        processes = start_shards(host=args.host, port=args.port, shards=args.shards, **kwargs)
+        try:
+            for process, _ in processes:
+                process.join()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop_shards(processes)
+    else:
+        NioFluxMQServer(host=args.host, port=args.port, **kwargs).run()
@@ -0,0 +1,99 @@
+import logging
+import time
+from threading import Thread, Event
+
+from nioflux_mq.codec import BinaryCodec
+from nioflux_mq.client.client import NioFluxMQClient
+from nioflux_mq.mq.message_queue import MessageQueue
+from nioflux_mq.snapshot import snapshot_path
+from nioflux_mq.snapshot.replication_log import DEFAULT_FETCH_BYTES
+
+DEFAULT_FETCH_TIMEOUT = 1.
+DEFAULT_RETRY_INTERVAL = 1.
+
+logger = logging.getLogger('nioflux.mq.replication')
+
+
+class Follower:
+    def __init__(self, mq: MessageQueue, host: str, port: int, name: str, fetch_bytes: int = DEFAULT_FETCH_BYTES,
+                 fetch_timeout: float = DEFAULT_FETCH_TIMEOUT, retry_interval: float = DEFAULT_RETRY_INTERVAL):
+        """
+        Keeps `mq` a replica of the queue served at `host:port`, on a thread of its own:
+        it catches up from a snapshot of the leader, then fetches the records of the leader's replication log
+        in batches of about `fetch_bytes`, each fetch waiting up to `fetch_timeout` seconds for new records
+        and acknowledging the records applied so far. A lost connection is retried every `retry_interval` seconds,
+        resuming from the last record applied, or from a new snapshot if the leader no longer keeps it.
+
+        :param name: how the leader tells this follower apart, in its acknowledgements and lag.
+        """
+        self._mq = mq
+        self._host = host
+        self._port = port
+        self._name = name
+        self._fetch_bytes = fetch_bytes
+        self._fetch_timeout = fetch_timeout
+        self._retry_interval = retry_interval
+        # sequence of the last leader record applied, `None` until caught up from a snapshot
+        self._sequence: int | None = None
+        self._head = 0
+        self._fetched_at = None
+        self._stop = Event()
+        self._thread = Thread(target=self._run, name='nioflux.mq.follower', daemon=True)
+
+    @property
+    def leader(self) -> str:
+        return f'{self._host}:{self._port}'
+
+    @property
+    def following(self) -> bool:
+        return not self._stop.is_set()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop following, the queue keeps every record applied so far.
+        """
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        logger.info(f'Stopped following {self.leader} at record {self._sequence}.')
+
+    def stats(self) -> dict:
+        return {'leader': self.leader, 'following': self.following, 'sequence': self._sequence,
+                'records': max(self._head - (self._sequence or 0), 0),
+                'last_fetch': time.time() - self._fetched_at if self._fetched_at is not None else None}
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with NioFluxMQClient(host=self._host, port=self._port, pool_size=1, codec=BinaryCodec()) as client:
+                    while not self._stop.is_set():
+                        self._fetch(client)
+            except Exception as e:
+                logger.warning(f'Replication from {self.leader} failed, retrying in {self._retry_interval}s: {e}')
+                self._stop.wait(self._retry_interval)
+
+    def _fetch(self, client: NioFluxMQClient):
+        response = client.replicate(follower=self._name,
+                                    since=self._sequence + 1 if self._sequence is not None else None,
+                                    max_bytes=self._fetch_bytes, timeout=self._fetch_timeout)
+        if not response.success:
+            raise ConnectionError(f'replicate failed: {response.err}')
+        if self._stop.is_set():
+            # promoted while fetching
+            return
+        info = response.data
+        if 'snapshot' in info:
+            self._mq.restore(info['snapshot'])
+            if self._mq.wal is not None:
+                self._mq.save(snapshot_path())
+            logger.info(f'Caught up with {self.leader} from a snapshot at record {info["sequence"]}.')
+        elif len(info['records']) > 0:
+            self._mq.apply(info['records'])
+        self._sequence = info['sequence']
+        self._head = info['head']
+        self._fetched_at = time.time()
@@ -0,0 +1,57 @@
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from typing_extensions import Callable
+
+logger = logging.getLogger('nioflux.mq')
+
+METRICS_PATH = '/metrics'
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class MetricsEndpoint:
+    def __init__(self, host: str, port: int, render: Callable[[], str]):
+        """
+        Serves `render()` at `/metrics` over HTTP, for Prometheus to scrape, on a thread of its own,
+        so that scrapes never wait for the event loop. Metrics are only rendered when scraped.
+        """
+        def handler(*args, **kwargs):
+            return _MetricsRequestHandler(render, *args, **kwargs)
+
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='nioflux.mq.metrics', daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread.start()
+        logger.info(f'Metrics served on port {self.port} at {METRICS_PATH}.')
+
+    def close(self):
+        if self._thread.is_alive():
+            self._server.shutdown()
+        self._server.server_close()
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def __init__(self, render: Callable[[], str], *args, **kwargs):
+        self._render = render
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != METRICS_PATH:
+            self.send_error(404)
+            return
+        body = self._render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f'Metrics scraped by {self.address_string()}: {format % args}')
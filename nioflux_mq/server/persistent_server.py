@@ -0,0 +1,83 @@
+import asyncio
+import logging
+
+from typing_extensions import AsyncIterator
+
+from nioflux import Server, PipelineStage
+from nioflux.pipeline.pipeline import Pipeline
+
+from nioflux_mq.codec import Codec, JsonCodec, BinaryCodec, BINARY_MAGIC
+
+DEFAULT_KEEP_ALIVE = 60.
+
+logger = logging.getLogger('nioflux.server')
+
+
+class PersistentServer(Server):
+    def __init__(self, *args, keep_alive: float | None = DEFAULT_KEEP_ALIVE,
+                 binary_pipeline: list[PipelineStage] | None = None, **kwargs):
+        """
+        A `nioflux.Server` which keeps channels open and serves every request sent over them,
+        one pipeline launch per request, in order.
+
+        The framing of a channel is negotiated by its first bytes: channels opening with `BINARY_MAGIC`
+        carry length-prefixed binary frames served by `binary_pipeline`, any other channel carries
+        EOT-delimited frames served by `pipeline`.
+
+        :param keep_alive: seconds an idle channel is kept open, `None` keeps it open until the peer closes it.
+        """
+        super().__init__(*args, **kwargs)
+        self._keep_alive = keep_alive
+        self._binary_pipeline = binary_pipeline
+
+    async def _read(self, reader: asyncio.StreamReader, buffer: bytearray) -> bool:
+        # a partially received request must complete within timeout, an idle channel within keep_alive
+        block = await asyncio.wait_for(reader.read(n=self._buffer_size),
+                                       self._timeout if len(buffer) > 0 else self._keep_alive)
+        buffer += block
+        return len(block) > 0
+
+    async def _negotiate(self, reader: asyncio.StreamReader,
+                         buffer: bytearray) -> tuple[Codec, list[PipelineStage]] | None:
+        while len(buffer) < len(BINARY_MAGIC) and self._eot not in buffer:
+            if not await self._read(reader, buffer):
+                return None
+        if self._binary_pipeline is not None and buffer.startswith(BINARY_MAGIC):
+            return BinaryCodec(), self._binary_pipeline
+        return JsonCodec(eot=self._eot), self._pipeline
+
+    async def _requests(self, reader: asyncio.StreamReader, codec: Codec,
+                        buffer: bytearray) -> AsyncIterator[bytes]:
+        while True:
+            frame = codec.split(buffer)
+            while frame is not None:
+                yield frame
+                frame = codec.split(buffer)
+            if not await self._read(reader, buffer):
+                return
+
+    async def _channel_handler(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        _peer_host, _peer_port = writer.get_extra_info('peername')
+        logger.debug(f'Channel {_peer_host}:{_peer_port} established.')
+        buffer = bytearray()
+        try:
+            negotiated = await self._negotiate(reader=reader, buffer=buffer)
+            if negotiated is None:
+                return
+            codec, pipeline = negotiated
+            async for data in self._requests(reader=reader, codec=codec, buffer=buffer):
+                _, self._extra, _ = await Pipeline(queue=pipeline, data=data, extra=self._extra,
+                                                   io_ctx=(reader, writer)).launch()
+                await writer.drain()
+        except asyncio.TimeoutError:
+            logger.debug(f'Channel {_peer_host}:{_peer_port} timed out.')
+        except ConnectionError:
+            logger.debug(f'Channel {_peer_host}:{_peer_port} reset by peer.')
+        except ValueError as e:
+            logger.warning(f'Channel {_peer_host}:{_peer_port} closed on malformed frame: {e}')
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
@@ -1,34 +1,128 @@
 import asyncio
 import logging
+import socket
 
 from nioflux.server.server import DEFAULT_EOT, DEFAULT_TIMEOUT, DEFAULT_BUFFER_SIZE
-from nioflux import Server, StrDecode, StrEncode, ErrorNotify
+from nioflux import StrDecode, StrEncode, ErrorNotify
+from nioflux.util.transport_layer import random_port
 
 from nioflux_mq.mq import MessageQueue
+from nioflux_mq.mq.storage import STORAGE_MEMORY
+from nioflux_mq.mq.topic_waiters import TopicWaiters
+from nioflux_mq.mq.topic_executor import TopicExecutor, EXECUTIONS, EXECUTION_INLINE, EXECUTION_THREAD
+from nioflux_mq.mq.topic_executor import DEFAULT_WORKERS
+from nioflux_mq.mq.metrics import Histogram, prometheus
+from nioflux_mq.mq.quota import Quota, DEFAULT_BLOCK_TIMEOUT
+from nioflux_mq.snapshot import snapshot_path, wal_dir
+from nioflux_mq.snapshot.write_ahead_log import WriteAheadLog, DEFAULT_GROUP_COMMIT_INTERVAL
+from nioflux_mq.snapshot.replication_log import ReplicationLog, ACK_LEADER, DEFAULT_RETAINED_BYTES
 from nioflux_mq.handler.json_load_handler import JsonLoadHandler
 from nioflux_mq.handler.json_dump_handler import JsonDumpHandler
-from nioflux_mq.handler.mq_protocol_handler import NioFluxMQProtocolHandler
+from nioflux_mq.handler.binary_load_handler import BinaryLoadHandler
+from nioflux_mq.handler.binary_dump_handler import BinaryDumpHandler
+from nioflux_mq.handler.mq_protocol_handler import NioFluxMQProtocolHandler, REPLICATION_TOPIC, DEFAULT_ACK_TIMEOUT
 from nioflux_mq.handler.response_handler import ResponseHandler
+from nioflux_mq.handler.rate_limit_handler import RateLimitHandler
+from nioflux_mq.server.persistent_server import PersistentServer, DEFAULT_KEEP_ALIVE
+from nioflux_mq.server.metrics_endpoint import MetricsEndpoint
+from nioflux_mq.server.follower import Follower
 
 logger = logging.getLogger('nioflux.mq')
 
 
 class NioFluxMQServer:
     def __init__(self, host: str, port: int | None, timeout: float = DEFAULT_TIMEOUT,
-                 buffer_size: int = DEFAULT_BUFFER_SIZE, eot: bytes = DEFAULT_EOT):
+                 buffer_size: int = DEFAULT_BUFFER_SIZE, eot: bytes = DEFAULT_EOT,
+                 keep_alive: float | None = DEFAULT_KEEP_ALIVE, wal_fsync: str | None = None,
+                 group_commit_interval: float = DEFAULT_GROUP_COMMIT_INTERVAL, storage: str = STORAGE_MEMORY,
+                 execution: str = EXECUTION_INLINE, workers: int = DEFAULT_WORKERS, metrics_port: int | None = None,
+                 replication: bool = False, replication_ack: str = ACK_LEADER, ack_timeout: float = DEFAULT_ACK_TIMEOUT,
+                 retained_bytes: int = DEFAULT_RETAINED_BYTES, follow: str | None = None,
+                 quota: Quota | None = None, topic_quotas: dict[str, Quota] | None = None,
+                 block_timeout: float = DEFAULT_BLOCK_TIMEOUT, rate_limit: float | None = None,
+                 byte_rate_limit: float | None = None):
+        """
+        :param wal_fsync: fsync policy of the write-ahead log kept under `MQ_SNAPSHOT_DIR`,
+        one of `always`, `group` and `none`, `None` disables the log.
+        With a write-ahead log, the server recovers from the latest snapshot and the log on start.
+        :param storage: default storage of topics, `memory` or `mmap`, which keeps them in memory mapped
+        segment files under `MQ_SNAPSHOT_DIR`. Topics can override it on `register_topic`.
+        :param execution: `inline` calls the message queue on the event loop, `thread` dispatches
+        the calls to `workers` threads, keeping those on a topic in order, so that a call blocked on a lock
+        or a snapshot never stalls the other channels.
+        :param metrics_port: port to serve metrics on at `/metrics`, in the Prometheus text format,
+        `None` serves none. Metrics are also returned by the `stats` instruction.
+        :param replication: keep the last `retained_bytes` of operations applied in a replication log,
+        for followers to fetch through the binary codec. With `replication_ack` `follower`, operations are
+        acknowledged once a follower has applied them too, or failed after `ack_timeout` seconds.
+        :param follow: `host:port` of a leader to follow, the server then serves reads only
+        until it is promoted, keeping its own replication log, if any, for followers of its own.
+        :param quota: limits on what the server retains as a whole, `topic_quotas` on what each topic retains,
+        see `MessageQueue.set_quota`. Produces over a `block` quota are held back up to `block_timeout` seconds.
+        Current usage is returned by the `usage` instruction.
+        :param rate_limit: messages per second each connection may produce, `byte_rate_limit` payload bytes,
+        see `RateLimitHandler`. Unlimited if not given.
+        """
         self._host = host
-        self._port = port
+        # a free port by default, known up front so that a follower is named after it
+        self._port = port if port is not None else random_port()
         self._timeout = timeout
         self._buffer_size = buffer_size
         self._eot = eot
-        self._mq = MessageQueue()
-        self._server = Server(pipeline=[StrDecode(), JsonLoadHandler(),
-                                        NioFluxMQProtocolHandler(),
-                                        JsonDumpHandler(), StrEncode(),
-                                        ErrorNotify(), ResponseHandler()],
-                              host=self._host, port=self._port,
-                              timeout=self._timeout, buffer_size=self._buffer_size,
-                              eot=self._eot, extra=self._mq)
+        self._keep_alive = keep_alive
+        self._wal = None
+        if wal_fsync is not None:
+            self._wal = WriteAheadLog(directory=wal_dir(), fsync=wal_fsync,
+                                      group_commit_interval=group_commit_interval)
+        self._waiters = TopicWaiters()
+        self._replication = None
+        if replication:
+            self._replication = ReplicationLog(retained_bytes=retained_bytes,
+                                               on_append=lambda: self._waiters.notify([REPLICATION_TOPIC]))
+        self._mq = MessageQueue(wal=self._wal, storage=storage, replication=self._replication, quota=quota,
+                                topic_quotas=topic_quotas)
+        if self._wal is not None:
+            self._mq.load(snapshot_path())
+        if execution not in EXECUTIONS:
+            raise ValueError(f'Unsupported execution: {execution}')
+        self._executor = TopicExecutor(workers=workers) if execution == EXECUTION_THREAD else None
+        self._follower = None
+        if follow is not None:
+            leader_host, leader_port = follow.rsplit(':', 1)
+            self._follower = Follower(mq=self._mq, host=leader_host, port=int(leader_port),
+                                      name=f'{socket.gethostname()}:{self._port}')
+        self._latency = Histogram('instruction_latency_seconds', 'Time to serve an instruction, long polls included.',
+                                  label='instruction')
+        self._metrics = MetricsEndpoint(host=self._host, port=metrics_port, render=self.prometheus) \
+            if metrics_port is not None else None
+        self._mq.add_listener(self._waiters.notify)
+        # shared by both pipelines, buckets are kept by connection
+        rate_limits = [RateLimitHandler(rate=rate_limit, byte_rate=byte_rate_limit)] \
+            if rate_limit is not None or byte_rate_limit is not None else []
+        self._server = PersistentServer(pipeline=[StrDecode(), JsonLoadHandler(), *rate_limits,
+                                                  NioFluxMQProtocolHandler(waiters=self._waiters,
+                                                                           executor=self._executor,
+                                                                           latency=self._latency,
+                                                                           replication_ack=replication_ack,
+                                                                           ack_timeout=ack_timeout,
+                                                                           follower=self._follower,
+                                                                           block_timeout=block_timeout),
+                                                  JsonDumpHandler(), StrEncode(),
+                                                  ErrorNotify(), ResponseHandler(eot=self._eot)],
+                                        binary_pipeline=[BinaryLoadHandler(), *rate_limits,
+                                                         NioFluxMQProtocolHandler(waiters=self._waiters,
+                                                                                  executor=self._executor,
+                                                                                  latency=self._latency,
+                                                                                  decompress=False,
+                                                                                  replication_ack=replication_ack,
+                                                                                  ack_timeout=ack_timeout,
+                                                                                  follower=self._follower,
+                                                                                  block_timeout=block_timeout),
+                                                         BinaryDumpHandler(),
+                                                         ErrorNotify(), ResponseHandler()],
+                                        host=self._host, port=self._port,
+                                        timeout=self._timeout, buffer_size=self._buffer_size,
+                                        eot=self._eot, extra=self._mq, keep_alive=self._keep_alive)
 
     @property
     def host(self):
@@ -36,8 +130,28 @@ class NioFluxMQServer:
 
     @property
     def port(self):
-        return self._port
+        return self._server.port
+
+    @property
+    def eot(self):
+        return self._eot
+
+    def prometheus(self) -> str:
+        return prometheus([*self._mq.metrics(), self._latency])
 
     def run(self):
         logger.info(f'\\\n{str(self._server)}\nNioFluxMQServer started.')
+        if self._metrics is not None:
+            self._metrics.start()
+        if self._follower is not None:
+            self._follower.start()
         asyncio.run(self._server.run())
+
+    def close(self):
+        if self._follower is not None:
+            self._follower.stop()
+        if self._metrics is not None:
+            self._metrics.close()
+        if self._executor is not None:
+            self._executor.shutdown()
+        self._mq.close()
@@ -0,0 +1,59 @@
+import logging
+import multiprocessing
+import os
+import signal
+
+from nioflux_mq.snapshot import snapshot_dir
+from nioflux_mq.server.server import NioFluxMQServer
+
+logger = logging.getLogger('nioflux.mq')
+
+
+def shard_snapshot_dir(base: str, shard: int) -> str:
+    return os.path.join(base, f'shard_{shard}')
+
+
+def _serve_shard(host: str, port: int, directory: str, kwargs: dict):
+    # each shard keeps its snapshots, write-ahead log and segment files apart
+    os.environ['MQ_SNAPSHOT_DIR'] = directory
+    # stopped by terminate, closing the queue on the way out
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    server = NioFluxMQServer(host=host, port=port, **kwargs)
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+def start_shards(host: str, port: int, shards: int, **kwargs) -> list[tuple[multiprocessing.Process, int]]:
+    """
+    Start `shards` server processes, shard `i` listening on `port + i`, where `ShardedNioFluxMQClient.connect`
+    finds it, with its state under `MQ_SNAPSHOT_DIR/shard_{i}`.
+    Shards share nothing, `ShardedNioFluxMQClient` routes each topic to the shard owning it.
+
+    :param kwargs: passed to every `NioFluxMQServer`, shard `i` serves its metrics on `metrics_port + i`.
+    :return: every shard process along with its port.
+    """
+    context = multiprocessing.get_context('spawn')
+    base = snapshot_dir()
+    processes = []
+    for shard in range(shards):
+        _port = port + shard
+        _kwargs = kwargs
+        if kwargs.get('metrics_port') is not None:
+            _kwargs = {**kwargs, 'metrics_port': kwargs['metrics_port'] + shard}
+        process = context.Process(target=_serve_shard, name=f'nioflux.mq.shard.{shard}',
+                                  args=(host, _port, shard_snapshot_dir(base, shard), _kwargs), daemon=True)
+        process.start()
+        processes.append((process, _port))
+        logger.info(f'Shard {shard} started on {host}:{_port}, pid {process.pid}.')
+    return processes
+
+
+def stop_shards(processes: list[tuple[multiprocessing.Process, int]], timeout: float = 5.):
+    for process, _ in processes:
+        process.terminate()
+    for process, _ in processes:
+        process.join(timeout)
@@ -1,3 +1,19 @@
 import os
 
 __PATH__ = os.path.dirname(__file__)
+
+
+def snapshot_dir() -> str:
+    return os.getenv('MQ_SNAPSHOT_DIR', __PATH__)
+
+
+def snapshot_path() -> str:
+    return os.path.join(snapshot_dir(), 'snapshot')
+
+
+def wal_dir() -> str:
+    return os.path.join(snapshot_dir(), 'wal')
+
+
+def segment_dir() -> str:
+    return os.path.join(snapshot_dir(), 'segments')
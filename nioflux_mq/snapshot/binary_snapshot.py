@@ -0,0 +1,198 @@
+import struct
+from array import array
+
+from typing_extensions import BinaryIO, Iterator, Any
+
+from nioflux_mq.mq.message import Message, EXPIRED_MESSAGE, ATTRIBUTES_FLAG, pack_attributes, unpack_attributes, \
+    wall_clock
+from nioflux_mq.mq.topic_log import FrozenTopicLog
+from nioflux_mq.mq.compression import CompressedBatch, CompressedPayload
+
+SNAPSHOT_MAGIC = b'NFMQSNAP'
+SNAPSHOT_VERSION = 6
+
+_HEADER = struct.Struct('!8sH')
+_KIND = struct.Struct('!c')
+_LENGTH = struct.Struct('!I')
+_OFFSET = struct.Struct('!q')
+# timestamp, ttl, id length, payload length, the id is followed by the length of the key and headers
+# and by them if its length carries `ATTRIBUTES_FLAG`
+_MESSAGE = struct.Struct('!ddHI')
+# timestamp, ttl, id length, index in the last batch
+_BATCHED_MESSAGE = struct.Struct('!ddHI')
+
+WAL_GENERATION = b'W'
+CONSUMER = b'C'
+GROUP = b'G'
+TOPIC = b'T'
+OFFSET = b'O'
+MESSAGE = b'M'
+BATCH = b'B'
+BATCHED_MESSAGE = b'R'
+EXPIRED = b'X'
+END = b'Z'
+
+
+def _write_str(f: BinaryIO, s: str):
+    b = s.encode('utf-8')
+    f.write(_LENGTH.pack(len(b)))
+    f.write(b)
+
+
+def _read_exact(f: BinaryIO, n: int) -> bytes:
+    b = f.read(n)
+    if len(b) < n:
+        raise EOFError('Snapshot truncated.')
+    return b
+
+
+def _read_str(f: BinaryIO) -> str:
+    return _read_exact(f, _LENGTH.unpack(_read_exact(f, _LENGTH.size))[0]).decode('utf-8')
+
+
+def _encode_id(message: Message) -> tuple[int, bytes]:
+    # the id length and the id, followed by the attributes of the message if it has any
+    _id = message.id.encode('utf-8')
+    if not message.has_attributes:
+        return len(_id), _id
+    attributes = pack_attributes(message.key, message.headers)
+    return len(_id) | ATTRIBUTES_FLAG, _id + _LENGTH.pack(len(attributes)) + attributes
+
+
+def _read_id(f: BinaryIO, id_length: int) -> tuple[str, str | None, dict[str, str] | None]:
+    _id = _read_exact(f, id_length & ~ATTRIBUTES_FLAG).decode('utf-8')
+    if not id_length & ATTRIBUTES_FLAG:
+        return _id, None, None
+    key, headers, _ = unpack_attributes(_read_exact(f, _LENGTH.unpack(_read_exact(f, _LENGTH.size))[0]))
+    return _id, key, headers
+
+
+def dump(f: BinaryIO, consumers: list[str], queues: dict[str, FrozenTopicLog],
+         wal_generation: int | None = None, groups: dict[str, tuple[str, list[str]]] | None = None) -> int:
+    """
+    Write a snapshot as a stream of records: a header, the first write-ahead log generation not covered
+    by the snapshot, the consumers, the consumer groups with their topic and members, then each topic,
+    its storage and its compression followed by its consumer offsets and its messages with their keys and headers,
+    where runs of expired messages collapse into one record. The messages of a compressed batch follow
+    the batch, written once, and refer to it by index.
+
+    :return: number of messages written.
+    """
+    f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION))
+    if wal_generation is not None:
+        f.write(WAL_GENERATION + _OFFSET.pack(wal_generation))
+    for consumer in consumers:
+        f.write(CONSUMER)
+        _write_str(f, consumer)
+    for group, (topic, members) in (groups or dict()).items():
+        f.write(GROUP)
+        _write_str(f, group)
+        _write_str(f, topic)
+        f.write(_LENGTH.pack(len(members)))
+        for member in members:
+            _write_str(f, member)
+    n = 0
+    for topic, queue in queues.items():
+        f.write(TOPIC)
+        _write_str(f, topic)
+        f.write(_OFFSET.pack(queue.base_offset))
+        _write_str(f, queue.storage)
+        _write_str(f, queue.compression or '')
+        for consumer, offset in queue.offsets.items():
+            f.write(OFFSET)
+            _write_str(f, consumer)
+            f.write(_OFFSET.pack(offset))
+        expired, batch = 0, None
+        for message in queue:
+            if message is EXPIRED_MESSAGE:
+                expired += 1
+                continue
+            if expired > 0:
+                f.write(EXPIRED + _OFFSET.pack(expired))
+                expired = 0
+            id_length, _id = _encode_id(message)
+            if isinstance(message.payload, CompressedPayload):
+                if message.payload.batch is not batch:
+                    batch = message.payload.batch
+                    f.write(BATCH)
+                    _write_str(f, batch.compression)
+                    f.write(_LENGTH.pack(len(batch.ends)))
+                    f.write(struct.pack(f'!{len(batch.ends)}I', *batch.ends))
+                    f.write(_LENGTH.pack(len(batch.data)))
+                    f.write(batch.data)
+                f.write(BATCHED_MESSAGE + _BATCHED_MESSAGE.pack(message.timestamp, message.ttl, id_length,
+                                                                message.payload.index))
+                f.write(_id)
+            else:
+                f.write(MESSAGE + _MESSAGE.pack(message.timestamp, message.ttl, id_length, len(message.payload)))
+                f.write(_id)
+                f.write(message.payload)
+            n += 1
+        if expired > 0:
+            f.write(EXPIRED + _OFFSET.pack(expired))
+    f.write(END)
+    return n
+
+
+def is_binary_snapshot(f: BinaryIO) -> bool:
+    return f.peek(len(SNAPSHOT_MAGIC))[:len(SNAPSHOT_MAGIC)] == SNAPSHOT_MAGIC
+
+
+def load(f: BinaryIO) -> Iterator[tuple[bytes, Any]]:
+    """
+    Stream the records of a snapshot back, one at a time.
+
+    :return: an iterator of `(kind, value)`, where value is a generation for `WAL_GENERATION`,
+    a consumer name for `CONSUMER`, `(group, topic, members)` for `GROUP`,
+    `(topic, base_offset, storage, compression)` for `TOPIC`, storage being `None` before version 3
+    and compression `None` if uncompressed, `(consumer, offset)` for `OFFSET`,
+    a `Message` for `MESSAGE`, whose payload refers to the batch before it if compressed,
+    and a count of expired messages for `EXPIRED`.
+    """
+    magic, version = _HEADER.unpack(_read_exact(f, _HEADER.size))
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError(f'Not a snapshot: {magic}')
+    if version > SNAPSHOT_VERSION:
+        raise ValueError(f'Unsupported snapshot version {version}.')
+    batch = None
+    while True:
+        kind = _read_exact(f, _KIND.size)
+        match kind:
+            case b'W':
+                yield WAL_GENERATION, _OFFSET.unpack(_read_exact(f, _OFFSET.size))[0]
+            case b'C':
+                yield CONSUMER, _read_str(f)
+            case b'G':
+                group, topic = _read_str(f), _read_str(f)
+                n = _LENGTH.unpack(_read_exact(f, _LENGTH.size))[0]
+                yield GROUP, (group, topic, [_read_str(f) for _ in range(n)])
+            case b'T':
+                topic = _read_str(f)
+                base_offset = _OFFSET.unpack(_read_exact(f, _OFFSET.size))[0]
+                storage = _read_str(f) if version >= 3 else None
+                yield TOPIC, (topic, base_offset, storage, (_read_str(f) or None) if version >= 5 else None)
+            case b'O':
+                consumer = _read_str(f)
+                yield OFFSET, (consumer, _OFFSET.unpack(_read_exact(f, _OFFSET.size))[0])
+            case b'M':
+                timestamp, ttl, id_length, payload_length = _MESSAGE.unpack(_read_exact(f, _MESSAGE.size))
+                _id, key, headers = _read_id(f, id_length)
+                yield MESSAGE, Message(id=_id, payload=_read_exact(f, payload_length), timestamp=wall_clock(timestamp),
+                                       ttl=ttl, key=key, headers=headers)
+            case b'B':
+                compression = _read_str(f)
+                n = _LENGTH.unpack(_read_exact(f, _LENGTH.size))[0]
+                ends = array('I', struct.unpack(f'!{n}I', _read_exact(f, n * _LENGTH.size)))
+                data = _read_exact(f, _LENGTH.unpack(_read_exact(f, _LENGTH.size))[0])
+                batch = CompressedBatch(compression=compression, data=data, ends=ends)
+            case b'R':
+                timestamp, ttl, id_length, index = _BATCHED_MESSAGE.unpack(_read_exact(f, _BATCHED_MESSAGE.size))
+                _id, key, headers = _read_id(f, id_length)
+                yield MESSAGE, Message(id=_id, payload=CompressedPayload(batch, index), timestamp=wall_clock(timestamp),
+                                       ttl=ttl, key=key, headers=headers)
+            case b'X':
+                yield EXPIRED, _OFFSET.unpack(_read_exact(f, _OFFSET.size))[0]
+            case b'Z':
+                return
+            case _:
+                raise ValueError(f'Bad snapshot record: {kind}')
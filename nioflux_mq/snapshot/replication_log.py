@@ -0,0 +1,112 @@
+import time
+from threading import Lock
+
+from typing_extensions import Callable
+
+DEFAULT_RETAINED_BYTES = 64 << 20
+DEFAULT_FETCH_BYTES = 1 << 20
+ACK_LEADER = 'leader'
+ACK_FOLLOWER = 'follower'
+ACKS = (ACK_LEADER, ACK_FOLLOWER)
+
+
+class ReplicationLog:
+    def __init__(self, retained_bytes: int = DEFAULT_RETAINED_BYTES, on_append: Callable[[], None] | None = None):
+        """
+        The operations applied to a `MessageQueue`, as write-ahead log records numbered from 1 in the order
+        they were applied, kept in memory for followers to fetch. The oldest records are dropped once
+        more than `retained_bytes` are kept, a follower which fell behind them catches up from a snapshot.
+
+        :param on_append: called after each record is appended, from the thread that applied it.
+        """
+        self._retained_bytes = retained_bytes
+        self._on_append = on_append
+        self._lock = Lock()
+        # (sequence, appended at, record), those before `_head` are dropped, deleted in bulk now and then
+        self._records: list[tuple[int, float, bytes]] = []
+        self._head = 0
+        self._bytes = 0
+        self._sequence = 0
+        # sequence acknowledged by each follower, as of its last fetch, and when
+        self._acks: dict[str, tuple[int, float]] = dict()
+
+    @property
+    def sequence(self) -> int:
+        # of the last record appended, 0 before any
+        return self._sequence
+
+    def append(self, record: bytes) -> int:
+        with self._lock:
+            self._sequence += 1
+            self._records.append((self._sequence, time.time(), record))
+            self._bytes += len(record)
+            while self._bytes > self._retained_bytes and self._head < len(self._records) - 1:
+                self._bytes -= len(self._records[self._head][2])
+                self._head += 1
+            if self._head > len(self._records) >> 1:
+                del self._records[:self._head]
+                self._head = 0
+            sequence = self._sequence
+        if self._on_append is not None:
+            self._on_append()
+        return sequence
+
+    def since(self, sequence: int, max_bytes: int) -> list[bytes] | None:
+        """
+        :return: the records from `sequence` on, at least one if any and at most `max_bytes` beyond the first,
+        `None` if some of them are no longer kept, or if `sequence` is beyond the next record,
+        as when the follower followed a previous run of the leader.
+        """
+        with self._lock:
+            if sequence == self._sequence + 1:
+                return []
+            first = self._records[self._head][0] if self._head < len(self._records) else self._sequence + 1
+            if sequence < first or sequence > self._sequence:
+                return None
+            records, size = [], 0
+            for i in range(self._head + sequence - first, len(self._records)):
+                record = self._records[i][2]
+                if len(records) > 0 and size + len(record) > max_bytes:
+                    break
+                records.append(record)
+                size += len(record)
+            return records
+
+    def acknowledge(self, follower: str, sequence: int):
+        """
+        Record that `follower` applied every record up to `sequence`.
+        """
+        with self._lock:
+            self._acks[follower] = (sequence, time.time())
+
+    def acknowledged(self) -> int:
+        """
+        :return: the highest sequence acknowledged by a follower, 0 without followers.
+        """
+        with self._lock:
+            return max((sequence for sequence, _ in self._acks.values()), default=0)
+
+    def lag(self) -> dict[str, dict]:
+        """
+        :return: by follower, the records it has yet to apply, how long ago the oldest of them was appended,
+        in seconds, and how long ago it last fetched.
+        """
+        now = time.time()
+        with self._lock:
+            lag = dict()
+            for follower, (sequence, acked_at) in self._acks.items():
+                behind = self._sequence - sequence
+                oldest = None
+                if behind > 0 and self._head < len(self._records):
+                    first = self._records[self._head][0]
+                    # the oldest record kept, for followers fallen behind it
+                    oldest = self._records[self._head + max(sequence + 1 - first, 0)][1]
+                lag[follower] = {'sequence': sequence, 'records': behind,
+                                 'seconds': now - oldest if oldest is not None else .0,
+                                 'last_fetch': now - acked_at}
+            return lag
+
+    def stats(self) -> dict:
+        with self._lock:
+            retained, size = len(self._records) - self._head, self._bytes
+        return {'sequence': self._sequence, 'retained': retained, 'retained_bytes': size, 'followers': self.lag()}
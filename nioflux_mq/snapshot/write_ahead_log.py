@@ -0,0 +1,346 @@
+import logging
+import os
+import re
+import struct
+import zlib
+from array import array
+from concurrent.futures import Future
+from threading import Lock, Event, Thread
+
+from typing_extensions import Iterator, Any
+
+from nioflux_mq.mq.message import Message, ATTRIBUTES_FLAG, pack_attributes, unpack_attributes, wall_clock
+from nioflux_mq.mq.compression import CompressedBatch, CompressedPayload
+
+FSYNC_ALWAYS = 'always'
+FSYNC_GROUP = 'group'
+FSYNC_NONE = 'none'
+FSYNC_POLICIES = (FSYNC_ALWAYS, FSYNC_GROUP, FSYNC_NONE)
+DEFAULT_GROUP_COMMIT_INTERVAL = .005
+
+REGISTER_TOPIC = b't'
+UNREGISTER_TOPIC = b'T'
+REGISTER_CONSUMER = b'c'
+UNREGISTER_CONSUMER = b'C'
+PRODUCE = b'p'
+# a produce of a compressed batch, decoded as `PRODUCE`
+PRODUCE_COMPRESSED = b'P'
+SEEK = b's'
+JOIN_GROUP = b'g'
+LEAVE_GROUP = b'G'
+
+# record length, crc32 of the record
+_FRAME = struct.Struct('!II')
+_LENGTH = struct.Struct('!I')
+_OFFSET = struct.Struct('!q')
+# timestamp, ttl, id length, payload length, the id is followed by the key and headers
+# if its length carries `ATTRIBUTES_FLAG`
+_MESSAGE = struct.Struct('!ddHI')
+_FILE_NAME = re.compile(r'^wal\.(\d+)\.log$')
+
+logger = logging.getLogger('nioflux.mq.wal')
+
+
+def _str(s: str) -> bytes:
+    b = s.encode('utf-8')
+    return _LENGTH.pack(len(b)) + b
+
+
+def _read_str(b: memoryview, at: int) -> tuple[str, int]:
+    length = _LENGTH.unpack_from(b, at)[0]
+    at += _LENGTH.size
+    return bytes(b[at:at + length]).decode('utf-8'), at + length
+
+
+def _encode_id(message: Message) -> tuple[int, bytes]:
+    # the id length and the id, followed by the attributes of the message if it has any
+    _id = message.id.encode('utf-8')
+    if not message.has_attributes:
+        return len(_id), _id
+    return len(_id) | ATTRIBUTES_FLAG, _id + pack_attributes(message.key, message.headers)
+
+
+def _decode_id(b: memoryview, at: int, id_length: int) -> tuple[str, str | None, dict[str, str] | None, int]:
+    end = at + (id_length & ~ATTRIBUTES_FLAG)
+    _id = bytes(b[at:end]).decode('utf-8')
+    if not id_length & ATTRIBUTES_FLAG:
+        return _id, None, None, end
+    return _id, *unpack_attributes(b, end)
+
+
+def _is_batch(messages: list[Message]) -> bool:
+    # whether `messages` are the whole of a single compressed batch, in order
+    if len(messages) < 1 or not isinstance(messages[0].payload, CompressedPayload):
+        return False
+    batch = messages[0].payload.batch
+    return len(batch) == len(messages) and all(
+        isinstance(message.payload, CompressedPayload) and message.payload.batch is batch
+        and message.payload.index == i for i, message in enumerate(messages))
+
+
+def encode_produce(topic: str, messages: list[Message]) -> bytes:
+    if _is_batch(messages):
+        batch = messages[0].payload.batch
+        parts = [PRODUCE_COMPRESSED, _str(topic), _str(batch.compression), _LENGTH.pack(len(messages)),
+                 struct.pack(f'!{len(batch.ends)}I', *batch.ends), _LENGTH.pack(len(batch.data)), batch.data]
+        for message in messages:
+            id_length, _id = _encode_id(message)
+            parts.append(_MESSAGE.pack(message.timestamp, message.ttl, id_length, 0))
+            parts.append(_id)
+        return b''.join(parts)
+    parts = [PRODUCE, _str(topic), _LENGTH.pack(len(messages))]
+    for message in messages:
+        id_length, _id = _encode_id(message)
+        parts.append(_MESSAGE.pack(message.timestamp, message.ttl, id_length, len(message.payload)))
+        parts.append(_id)
+        parts.append(message.payload)
+    return b''.join(parts)
+
+
+def encode_seek(topic: str, consumer: str, offset: int) -> bytes:
+    return SEEK + _str(topic) + _str(consumer) + _OFFSET.pack(offset)
+
+
+def encode_name(kind: bytes, name: str) -> bytes:
+    return kind + _str(name)
+
+
+def encode_register_topic(topic: str, storage: str, compression: str | None = None) -> bytes:
+    return REGISTER_TOPIC + _str(topic) + _str(storage) + _str(compression or '')
+
+
+def encode_join_group(consumer: str, group: str, topic: str) -> bytes:
+    return JOIN_GROUP + _str(consumer) + _str(group) + _str(topic)
+
+
+def encode_leave_group(consumer: str, group: str) -> bytes:
+    return LEAVE_GROUP + _str(consumer) + _str(group)
+
+
+def decode(record: bytes) -> tuple[bytes, Any]:
+    """
+    :return: `(kind, value)`, where value is `(topic, storage, compression)` for `REGISTER_TOPIC`,
+    a name for other topic and consumer records,
+    `(topic, messages)` for `PRODUCE`, `(topic, consumer, offset)` for `SEEK`,
+    `(consumer, group, topic)` for `JOIN_GROUP` and `(consumer, group)` for `LEAVE_GROUP`.
+    """
+    b = memoryview(record)
+    kind = bytes(b[:1])
+    if kind == PRODUCE:
+        topic, at = _read_str(b, 1)
+        n = _LENGTH.unpack_from(b, at)[0]
+        at += _LENGTH.size
+        messages = []
+        for _ in range(n):
+            timestamp, ttl, id_length, payload_length = _MESSAGE.unpack_from(b, at)
+            at += _MESSAGE.size
+            _id, key, headers, at = _decode_id(b, at, id_length)
+            messages.append(Message(id=_id, payload=bytes(b[at:at + payload_length]), timestamp=wall_clock(timestamp),
+                                    ttl=ttl, key=key, headers=headers))
+            at += payload_length
+        return kind, (topic, messages)
+    if kind == PRODUCE_COMPRESSED:
+        topic, at = _read_str(b, 1)
+        compression, at = _read_str(b, at)
+        n = _LENGTH.unpack_from(b, at)[0]
+        at += _LENGTH.size
+        ends = array('I', struct.unpack_from(f'!{n}I', b, at))
+        at += n * _LENGTH.size
+        data_length = _LENGTH.unpack_from(b, at)[0]
+        at += _LENGTH.size
+        batch = CompressedBatch(compression=compression, data=bytes(b[at:at + data_length]), ends=ends)
+        at += data_length
+        messages = []
+        for i in range(n):
+            timestamp, ttl, id_length, _ = _MESSAGE.unpack_from(b, at)
+            at += _MESSAGE.size
+            _id, key, headers, at = _decode_id(b, at, id_length)
+            messages.append(Message(id=_id, payload=CompressedPayload(batch, i), timestamp=wall_clock(timestamp),
+                                    ttl=ttl, key=key, headers=headers))
+        return PRODUCE, (topic, messages)
+    if kind == SEEK:
+        topic, at = _read_str(b, 1)
+        consumer, at = _read_str(b, at)
+        return kind, (topic, consumer, _OFFSET.unpack_from(b, at)[0])
+    if kind == JOIN_GROUP:
+        consumer, at = _read_str(b, 1)
+        group, at = _read_str(b, at)
+        return kind, (consumer, group, _read_str(b, at)[0])
+    if kind == LEAVE_GROUP:
+        consumer, at = _read_str(b, 1)
+        return kind, (consumer, _read_str(b, at)[0])
+    if kind == REGISTER_TOPIC:
+        topic, at = _read_str(b, 1)
+        storage, at = _read_str(b, at) if at < len(b) else (None, at)
+        return kind, (topic, storage, (_read_str(b, at)[0] or None) if at < len(b) else None)
+    return kind, _read_str(b, 1)[0]
+
+
+class WriteAheadLog:
+    def __init__(self, directory: str, fsync: str = FSYNC_GROUP,
+                 group_commit_interval: float = DEFAULT_GROUP_COMMIT_INTERVAL):
+        """
+        Append-only log of the operations applied to a `MessageQueue` since its last snapshot.
+
+        The log is split into generations, one file each, a snapshot starts a new generation,
+        and the generations it covers are deleted once it is written.
+
+        :param fsync: `always` fsyncs each record as it is appended. `group` fsyncs on a background thread,
+        every `group_commit_interval` seconds and as soon as someone waits on `sync`, one fsync covering
+        every record appended while the previous one was in progress. `none` writes records out
+        every `group_commit_interval` seconds but leaves syncing to the OS.
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f'Unsupported fsync policy: {fsync}')
+        self._directory = directory
+        self._fsync = fsync
+        self._group_commit_interval = group_commit_interval
+        os.makedirs(directory, exist_ok=True)
+        generations = self.generations
+        self._generation = generations[-1] + 1 if len(generations) > 0 else 0
+        # guards the file, taken before _lock
+        self._io_lock = Lock()
+        self._file = open(self._path_of(self._generation), mode='ab', buffering=0)
+        # guards the buffer, sequence numbers and pending sync futures
+        self._lock = Lock()
+        self._buffer = bytearray()
+        self._appended = 0
+        self._durable = 0
+        self._pending: list[tuple[int, Future]] = []
+        self._closed = Event()
+        self._wakeup = Event()
+        self._flusher = None
+        if fsync != FSYNC_ALWAYS:
+            self._flusher = Thread(target=self._flush_loop, name='nioflux.mq.wal', daemon=True)
+            self._flusher.start()
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    @property
+    def fsync(self) -> str:
+        return self._fsync
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    @property
+    def generations(self) -> list[int]:
+        generations = []
+        for name in os.listdir(self._directory):
+            matched = _FILE_NAME.match(name)
+            if matched is not None:
+                generations.append(int(matched.group(1)))
+        return sorted(generations)
+
+    def _path_of(self, generation: int) -> str:
+        return os.path.join(self._directory, f'wal.{generation:08d}.log')
+
+    def append(self, record: bytes) -> int:
+        frame = _FRAME.pack(len(record), zlib.crc32(record)) + record
+        if self._fsync == FSYNC_ALWAYS:
+            with self._io_lock:
+                self._file.write(frame)
+                os.fsync(self._file.fileno())
+                with self._lock:
+                    self._appended += 1
+                    self._durable = self._appended
+                    return self._appended
+        with self._lock:
+            self._buffer += frame
+            self._appended += 1
+            return self._appended
+
+    def sync(self) -> Future:
+        """
+        :return: a future resolving once every record appended so far is durable under the fsync policy.
+        """
+        future = Future()
+        with self._lock:
+            if self._fsync == FSYNC_NONE or self._durable >= self._appended:
+                future.set_result(self._durable)
+            else:
+                self._pending.append((self._appended, future))
+                self._wakeup.set()
+        return future
+
+    def flush(self):
+        with self._io_lock:
+            with self._lock:
+                data, seq = self._buffer, self._appended
+                self._buffer = bytearray()
+            if len(data) > 0:
+                self._file.write(data)
+                if self._fsync != FSYNC_NONE:
+                    os.fsync(self._file.fileno())
+            with self._lock:
+                self._durable = max(self._durable, seq)
+                pending, self._pending = self._pending, []
+                for _seq, future in pending:
+                    if _seq <= self._durable:
+                        future.set_result(self._durable)
+                    else:
+                        self._pending.append((_seq, future))
+
+    def _flush_loop(self):
+        while not self._closed.is_set():
+            self._wakeup.wait(self._group_commit_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                logger.error(f'Failed to flush write-ahead log: {e}')
+
+    def rotate(self) -> int:
+        """
+        Flush the current generation and start a new one.
+
+        :return: the new generation, every record appended from now on belongs to it or a later one.
+        """
+        self.flush()
+        with self._io_lock:
+            self._file.close()
+            self._generation += 1
+            self._file = open(self._path_of(self._generation), mode='ab', buffering=0)
+            return self._generation
+
+    def truncate(self, before: int):
+        """
+        Delete the generations older than `before`, once a snapshot covering them is written.
+        """
+        for generation in self.generations:
+            if generation < before:
+                os.remove(self._path_of(generation))
+        logger.debug(f'Write-ahead log truncated before generation {before}.')
+
+    def replay(self, since: int = 0) -> Iterator[tuple[bytes, Any]]:
+        """
+        Decode the records of every generation from `since` on, in order.
+        Replay stops at the first torn or corrupted record of a generation.
+        """
+        self.flush()
+        for generation in self.generations:
+            if generation < since:
+                continue
+            with open(self._path_of(generation), mode='rb') as f:
+                while True:
+                    head = f.read(_FRAME.size)
+                    if len(head) < _FRAME.size:
+                        break
+                    length, crc = _FRAME.unpack(head)
+                    record = f.read(length)
+                    if len(record) < length or zlib.crc32(record) != crc:
+                        logger.warning(f'Torn record in write-ahead log generation {generation}, skipped the rest.')
+                        break
+                    yield decode(record)
+
+    def close(self):
+        self._closed.set()
+        self._wakeup.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        with self._io_lock:
+            self._file.close()
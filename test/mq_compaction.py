@@ -0,0 +1,85 @@
+import logging
+import os
+import tempfile
+
+from nioflux_mq.mq import MessageQueue
+
+logging.getLogger('nioflux.mq').setLevel(logging.CRITICAL)
+logging.getLogger('nioflux.mq.gc').setLevel(logging.CRITICAL)
+
+SEGMENT_SIZE = 64
+PARTITIONS = 3
+
+with tempfile.TemporaryDirectory() as _dir:
+    os.environ['MQ_SNAPSHOT_DIR'] = _dir
+    mq = MessageQueue(gc_interval=1 << 30, segment_size=SEGMENT_SIZE)
+    try:
+        mq.register_topic('topic_0')
+        mq.produce_batch([b'message_%d' % i for i in range(SEGMENT_SIZE * 4)], 'topic_0')
+        for consumer in ('consumer_0', 'consumer_idle'):
+            mq.register_consumer(consumer)
+
+        # nothing is dropped before every consumer has read it, including one which has yet to read the topic
+        assert mq.compact() == 0
+        assert len(mq.consume_batch('consumer_0', 'topic_0', SEGMENT_SIZE * 4, advance=True)) == SEGMENT_SIZE * 4
+        assert mq.compact() == 0
+        assert mq.consume('consumer_idle', 'topic_0').payload == b'message_0'
+        assert len(mq.consume_batch('consumer_idle', 'topic_0', SEGMENT_SIZE * 2, advance=True)) == SEGMENT_SIZE * 2
+        assert mq.compact() == 2
+        assert mq.queues['topic_0'].base_offset == SEGMENT_SIZE * 2
+
+        # a consumer registered later starts from what is left
+        mq.register_consumer('consumer_late')
+        assert mq.consume('consumer_late', 'topic_0').payload == b'message_%d' % (SEGMENT_SIZE * 2)
+
+        # the expiry index forgets the messages of dropped segments
+        mq.register_topic('topic_ttl')
+        mq.produce_batch([b'message_%d' % i for i in range(SEGMENT_SIZE * 4)], 'topic_ttl', ttl=3600.)
+        assert mq.queues['topic_ttl'].expiring == SEGMENT_SIZE * 4
+        for consumer in ('consumer_0', 'consumer_idle', 'consumer_late'):
+            mq.consume_batch(consumer, 'topic_ttl', SEGMENT_SIZE * 4, advance=True)
+        assert mq.compact() == 3
+        assert mq.queues['topic_ttl'].expiring == SEGMENT_SIZE
+    finally:
+        mq.close()
+
+    # members of a group read at the offsets of the group, not at their own
+    mq = MessageQueue(gc_interval=1 << 30, segment_size=SEGMENT_SIZE)
+    try:
+        mq.register_topic('topic_0')
+        mq.register_consumer('consumer_0')
+        mq.produce_batch([b'message_%d' % i for i in range(SEGMENT_SIZE * 2)], 'topic_0')
+        assert mq.consume_batch('consumer_0', 'topic_0', 1, advance=True)[0].payload == b'message_0'
+        mq.join_group('consumer_0', 'group_0', 'topic_0')
+        assert mq.compact() == 0
+        assert len(mq.consume_batch('consumer_0', 'topic_0', SEGMENT_SIZE * 2, advance=True)) == SEGMENT_SIZE * 2
+        # the tail segment is kept
+        assert mq.compact() == 1
+        assert mq.queues['topic_0'].base_offset == SEGMENT_SIZE
+    finally:
+        mq.close()
+
+    # partitions and broadcasts alike are dropped once every reader of every topic has moved past them
+    mq = MessageQueue(gc_interval=1 << 30, segment_size=SEGMENT_SIZE)
+    try:
+        mq.register_topic('topic_0', partitions=PARTITIONS)
+        mq.register_topic('topic_1')
+        for consumer in ('consumer_0', 'consumer_idle'):
+            mq.register_consumer(consumer)
+        mq.produce_batch([b'broadcast_%d' % i for i in range(SEGMENT_SIZE * 4)])
+        for i in range(SEGMENT_SIZE * 4 * PARTITIONS):
+            mq.produce(b'message_%d' % i, 'topic_0')
+        n = SEGMENT_SIZE * 4 * (PARTITIONS + 1)
+        assert len(mq.consume_batch('consumer_0', 'topic_0', n, advance=True)) == n
+        assert len(mq.consume_batch('consumer_0', 'topic_1', n, advance=True)) == SEGMENT_SIZE * 4
+        assert mq.compact() == 0
+        assert mq.consume('consumer_idle', 'topic_0').payload == b'broadcast_0'
+        assert len(mq.consume_batch('consumer_idle', 'topic_0', n, advance=True)) == n
+        # broadcasts are held back by topic_1, which consumer_idle has yet to read
+        assert mq.compact() == 3 * PARTITIONS
+        assert len(mq.consume_batch('consumer_idle', 'topic_1', n, advance=True)) == SEGMENT_SIZE * 4
+        # the tail segment is kept
+        assert mq.compact() == 3
+    finally:
+        mq.close()
+print('compaction ok')
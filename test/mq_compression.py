@@ -0,0 +1,55 @@
+import logging
+import os
+import tempfile
+
+from nioflux_mq.mq import MessageQueue
+from nioflux_mq.mq.compression import CompressedPayload, compressions
+from nioflux_mq.mq.storage import STORAGES
+
+logging.getLogger('nioflux.mq').setLevel(logging.CRITICAL)
+
+MESSAGES = 500
+
+payloads = [b'{"order": %d, "status": "shipped", "region": "eu-west"}' % i for i in range(MESSAGES)]
+
+with tempfile.TemporaryDirectory() as _dir:
+    os.environ['MQ_SNAPSHOT_DIR'] = _dir
+    for storage in STORAGES:
+        mq = MessageQueue(gc_interval=1 << 30, storage=storage, segment_size=128)
+        try:
+            mq.register_topic('topic_plain')
+            mq.produce_batch(payloads, 'topic_plain')
+            for compression in compressions():
+                topic = f'topic_{compression}'
+                mq.register_topic(topic, compression=compression)
+                mq.produce_batch(payloads[:-1], topic)
+                mq.produce(payloads[-1], topic)
+                mq.register_consumer(f'consumer_{compression}')
+                # payloads read back as produced, whether read one by one or in batches
+                message = mq.consume(f'consumer_{compression}', topic)
+                assert message.payload == payloads[0], message
+                raw = mq.consume(f'consumer_{compression}', topic, decompress=False)
+                assert isinstance(raw.payload, CompressedPayload) and raw.payload.decompress() == payloads[0]
+                messages = mq.consume_batch(f'consumer_{compression}', topic, MESSAGES)
+                assert [bytes(message.payload) for message in messages] == payloads
+                # produced batches are stored compressed
+                usage = mq.usage()['topics']
+                assert usage[topic]['bytes'] < usage['topic_plain']['bytes'] // 2, usage
+                assert mq.stats()['topics'][topic]['compression'] == compression
+
+            path = os.path.join(_dir, f'snapshot_{storage}')
+            mq.save(path)
+            loaded = MessageQueue(gc_interval=1 << 30, storage=storage)
+            try:
+                loaded.load(path)
+                for compression in compressions():
+                    topic = f'topic_{compression}'
+                    messages = loaded.consume_batch(f'consumer_{compression}', topic, MESSAGES)
+                    assert [bytes(message.payload) for message in messages] == payloads, compression
+                    # an unregistered topic hands its messages back decompressed
+                    assert [bytes(message.payload) for message in loaded.unregister_topic(topic)] == payloads
+            finally:
+                loaded.close()
+        finally:
+            mq.close()
+print('compression ok')
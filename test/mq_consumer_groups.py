@@ -0,0 +1,58 @@
+import logging
+import os
+import tempfile
+
+from nioflux_mq.mq import MessageQueue
+from nioflux_mq.snapshot.write_ahead_log import WriteAheadLog
+
+logging.getLogger('nioflux.mq').setLevel(logging.CRITICAL)
+logging.getLogger('nioflux.mq.wal').setLevel(logging.CRITICAL)
+
+PARTITIONS = 3
+MESSAGES = 60
+
+
+def drain(mq: MessageQueue, consumer: str, topic: str) -> list[bytes]:
+    return [bytes(message.payload) for message in mq.consume_batch(consumer, topic, MESSAGES * 2, advance=True)]
+
+
+with tempfile.TemporaryDirectory() as _dir:
+    os.environ['MQ_SNAPSHOT_DIR'] = _dir
+    wal_dir, snapshot_path = os.path.join(_dir, 'wal'), os.path.join(_dir, 'snapshot')
+    mq = MessageQueue(gc_interval=1 << 30, wal=WriteAheadLog(directory=wal_dir, fsync='always'))
+    mq.register_topic('topic_0', partitions=PARTITIONS)
+    for consumer in ('consumer_0', 'consumer_1', 'consumer_2'):
+        mq.register_consumer(consumer)
+    mq.join_group('consumer_0', 'group_0', 'topic_0')
+    mq.join_group('consumer_1', 'group_0', 'topic_0')
+    mq.produce_batch([b'message_%d' % i for i in range(MESSAGES)], 'topic_0')
+
+    # the members of a group split the partitions, each message is read by a single one
+    assignment = mq.groups['group_0']['assignment']
+    assert sorted(partition for partitions in assignment.values() for partition in partitions) == \
+        list(range(PARTITIONS)), assignment
+    read = [drain(mq, 'consumer_0', 'topic_0'), drain(mq, 'consumer_1', 'topic_0')]
+    assert len(read[0]) > 0 and len(read[1]) > 0
+    assert sorted(read[0] + read[1]) == sorted(b'message_%d' % i for i in range(MESSAGES))
+    # a consumer outside the group reads every message on its own
+    assert len(drain(mq, 'consumer_2', 'topic_0')) == MESSAGES
+
+    # what follows the snapshot is replayed from the write-ahead log
+    mq.save(snapshot_path)
+    mq.produce_batch([b'message_%d' % i for i in range(MESSAGES, MESSAGES * 2)], 'topic_0')
+    mq.join_group('consumer_2', 'group_0', 'topic_0')
+    mq.leave_group('consumer_0', 'group_0')
+    mq.close()
+
+    mq = MessageQueue(gc_interval=1 << 30, wal=WriteAheadLog(directory=wal_dir, fsync='always'))
+    mq.load(snapshot_path)
+    try:
+        assert mq.groups['group_0']['members'] == ['consumer_1', 'consumer_2'], mq.groups
+        # the group resumes where it stopped before the restart
+        read = drain(mq, 'consumer_1', 'topic_0') + drain(mq, 'consumer_2', 'topic_0')
+        assert sorted(read) == sorted(b'message_%d' % i for i in range(MESSAGES, MESSAGES * 2)), read
+        # having left, a member reads on its own, from the start
+        assert len(drain(mq, 'consumer_0', 'topic_0')) == MESSAGES * 2
+    finally:
+        mq.close()
+print('consumer groups ok')
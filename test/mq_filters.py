@@ -0,0 +1,110 @@
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from nioflux.util.transport_layer import random_port
+
+from nioflux_mq.client.client import NioFluxMQClient
+from nioflux_mq.mq import MessageQueue
+from nioflux_mq.server import NioFluxMQServer
+
+logging.getLogger('nioflux').setLevel(logging.CRITICAL)
+logging.getLogger('nioflux.server').setLevel(logging.CRITICAL)
+logging.getLogger('nioflux.pipeline').setLevel(logging.CRITICAL)
+logging.getLogger('nioflux.mq').setLevel(logging.CRITICAL)
+
+MESSAGES = 1000
+
+os.environ['MQ_SNAPSHOT_DIR'] = tempfile.mkdtemp()
+mq = MessageQueue(gc_interval=1 << 30, segment_size=64)
+mq.register_topic('topic_0')
+mq.register_topic('topic_zlib', compression='zlib')
+mq.register_topic('topic_partitioned', partitions=3)
+for consumer in ('consumer_0', 'consumer_1', 'consumer_2'):
+    mq.register_consumer(consumer)
+for i in range(MESSAGES):
+    mq.produce(b'message_%d' % i, 'topic_0', key=f'user_{i % 10}',
+               headers={'kind': 'even' if i % 2 == 0 else 'odd', 'n': str(i % 7)})
+
+# on a key: the consumer is moved to the match, which stays put until advanced
+message = mq.consume('consumer_0', 'topic_0', key='user_3')
+assert message.payload == b'message_3' and message.headers == {'kind': 'odd', 'n': '3'}, message
+assert mq.consume('consumer_0', 'topic_0').payload == b'message_3'
+mq.advance('consumer_0', 'topic_0')
+assert mq.consume('consumer_0', 'topic_0', key='user_3').payload == b'message_13'
+assert mq.consume('consumer_0', 'topic_0', key='nobody') is None
+
+# on headers, every given header must match
+messages = mq.consume_batch('consumer_1', 'topic_0', MESSAGES, advance=True, key='user_3', headers={'n': '6'})
+assert [message.payload for message in messages] == [b'message_%d' % i for i in range(MESSAGES)
+                                                     if i % 10 == 3 and i % 7 == 6]
+polled = [mq.poll('consumer_2', 'topic_0', headers={'kind': 'even', 'n': '0'}) for _ in range(3)]
+assert [message.payload for message in polled] == [b'message_0', b'message_14', b'message_28'], polled
+
+# compressed topics and partitioned ones alike
+mq.produce_batch([b'message_%d' % i for i in range(100)], 'topic_zlib', headers=[{'h': str(i % 5)} for i in range(100)])
+messages = mq.consume_batch('consumer_0', 'topic_zlib', 100, headers={'h': '2'})
+assert [bytes(message.payload) for message in messages] == [b'message_%d' % i for i in range(2, 100, 5)]
+for i in range(30):
+    mq.produce(b'message_%d' % i, 'topic_partitioned', key=f'key_{i % 4}')
+messages = mq.consume_batch('consumer_0', 'topic_partitioned', 100, key='key_1')
+assert [message.payload for message in messages] == [b'message_%d' % i for i in range(1, 30, 4)]
+mq.close()
+
+# a long poll on a filter is only woken by a match
+server = NioFluxMQServer(host='127.0.0.1', port=random_port())
+threading.Thread(target=server.run, daemon=True).start()
+time.sleep(.5)
+client = NioFluxMQClient(host='127.0.0.1', port=server.port)
+client.register_topic('topic_0')
+client.register_consumer('consumer_eu')
+
+
+def produce_later():
+    time.sleep(.3)
+    with NioFluxMQClient(host='127.0.0.1', port=server.port) as producer:
+        producer.produce(b'noise', 'topic_0', headers={'region': 'us'})
+        time.sleep(.3)
+        producer.produce(b'order', 'topic_0', key='customer_42', headers={'region': 'eu'})
+
+
+threading.Thread(target=produce_later).start()
+started_at = time.perf_counter()
+message = client.poll('consumer_eu', 'topic_0', timeout=5, headers={'region': 'eu'}).data
+assert message.payload == b'order' and message.key == 'customer_42', message
+assert time.perf_counter() - started_at >= .6
+client.close()
+
+# a filtered consume is acknowledged once the offset it moved is durable, and survives a crash
+with tempfile.TemporaryDirectory() as _dir:
+    port = random_port()
+
+    def start() -> subprocess.Popen:
+        return subprocess.Popen([sys.executable, '-m', 'nioflux_mq.server', '--host', '127.0.0.1', '--port', str(port),
+                                 '--wal-fsync', 'group'], env={**os.environ, 'MQ_SNAPSHOT_DIR': _dir},
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    process = start()
+    try:
+        time.sleep(1.5)
+        with NioFluxMQClient(host='127.0.0.1', port=port) as client:
+            client.register_topic('topic_0')
+            client.register_consumer('consumer_0')
+            for i in range(10):
+                client.produce(b'message_%d' % i, 'topic_0', key=f'key_{i}')
+            assert client.consume('consumer_0', 'topic_0', key='key_7').data.payload == b'message_7'
+        process.kill()
+        process.wait()
+        process = start()
+        time.sleep(1.5)
+        with NioFluxMQClient(host='127.0.0.1', port=port) as client:
+            assert client.consume('consumer_0', 'topic_0').data.payload == b'message_7'
+    finally:
+        process.kill()
+        process.wait()
+print('filters ok')
+os._exit(0)
@@ -0,0 +1,62 @@
+import logging
+import threading
+import time
+
+from nioflux.util.transport_layer import random_port
+
+from nioflux_mq.client.client import NioFluxMQClient
+from nioflux_mq.server import NioFluxMQServer
+
+logging.getLogger('nioflux').setLevel(logging.CRITICAL)
+logging.getLogger('nioflux.server').setLevel(logging.CRITICAL)
+logging.getLogger('nioflux.pipeline').setLevel(logging.CRITICAL)
+logging.getLogger('nioflux.mq').setLevel(logging.CRITICAL)
+
+SUBSCRIBERS = 200
+
+server = NioFluxMQServer(host='127.0.0.1', port=random_port())
+threading.Thread(target=server.run, daemon=True).start()
+time.sleep(.5)
+
+client = NioFluxMQClient(host='127.0.0.1', port=server.port)
+client.register_topic('topic_0')
+client.register_topic('topic_1')
+
+# a caught up consumer waits out its timeout and gets nothing
+client.register_consumer('consumer_idle')
+started_at = time.perf_counter()
+assert client.consume('consumer_idle', 'topic_0', timeout=.5).data is None
+assert time.perf_counter() - started_at >= .5
+
+# fan-out: every idle subscriber is woken by a single produce
+results = [None] * SUBSCRIBERS
+woken_at = [.0] * SUBSCRIBERS
+
+
+def subscribe(i: int):
+    with NioFluxMQClient(host='127.0.0.1', port=server.port, pool_size=1) as subscriber:
+        subscriber.register_consumer(f'consumer_{i}')
+        results[i] = subscriber.poll(f'consumer_{i}', 'topic_0', timeout=10).data
+        woken_at[i] = time.perf_counter()
+
+
+threads = [threading.Thread(target=subscribe, args=(i,)) for i in range(SUBSCRIBERS)]
+for thread in threads:
+    thread.start()
+time.sleep(1)
+assert all(result is None for result in results)
+# produce to another topic must not wake them
+client.produce(b'not_for_you', 'topic_1')
+time.sleep(.2)
+assert all(result is None for result in results)
+produced_at = time.perf_counter()
+client.produce(b'message_0', 'topic_0')
+for thread in threads:
+    thread.join()
+assert all(result.payload == b'message_0' for result in results)
+print(f'{SUBSCRIBERS} subscribers woken, max wake latency {(max(woken_at) - produced_at) * 1000:.1f}ms')
+
+# a subscriber polling again after being woken has advanced past the message
+assert client.poll('consumer_0', 'topic_0', timeout=.1).data is None
+client.close()
+server.close()
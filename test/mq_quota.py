@@ -0,0 +1,95 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from nioflux.util.transport_layer import random_port
+
+from nioflux_mq.client.client import NioFluxMQClient
+from nioflux_mq.codec import JsonCodec
+from nioflux_mq.mq.quota import Quota
+from nioflux_mq.server import NioFluxMQServer
+
+logging.getLogger('nioflux').setLevel(logging.CRITICAL)
+logging.getLogger('nioflux.server').setLevel(logging.CRITICAL)
+logging.getLogger('nioflux.pipeline').setLevel(logging.CRITICAL)
+logging.getLogger('nioflux.mq').setLevel(logging.CRITICAL)
+
+MAX_MESSAGES = 20
+
+os.environ['MQ_SNAPSHOT_DIR'] = tempfile.mkdtemp()
+server = NioFluxMQServer(host='127.0.0.1', port=random_port(), block_timeout=2.,
+                         topic_quotas={'topic_reject': Quota(max_messages=MAX_MESSAGES),
+                                       'topic_block': Quota(max_messages=MAX_MESSAGES, policy='block'),
+                                       'topic_drop': Quota(max_messages=MAX_MESSAGES, policy='drop_oldest')})
+threading.Thread(target=server.run, daemon=True).start()
+time.sleep(.5)
+
+client = NioFluxMQClient(host='127.0.0.1', port=server.port)
+# a registered consumer holds back the quota of every topic until it has read it, groups those of their topic
+client.register_consumer('consumer_idle')
+client.register_consumer('member')
+for topic in ('topic_reject', 'topic_block', 'topic_drop'):
+    client.register_topic(topic)
+    client.join_group('member', f'group_{topic}', topic)
+    assert client.produce_batch([b'message_%d' % i for i in range(MAX_MESSAGES)], topic).success
+
+
+def catch_up(consumer: str, topic: str, n: int = MAX_MESSAGES) -> int:
+    return len(client.consume_batch(consumer, topic, n, advance=True).data)
+
+
+# reject: refused until every reader catches up
+response = client.produce(b'late', 'topic_reject')
+assert not response.success and 'Quota of topic "topic_reject" exceeded' in response.err[0], response
+assert catch_up('member', 'topic_reject') == MAX_MESSAGES
+assert not client.produce(b'late', 'topic_reject').success
+assert catch_up('consumer_idle', 'topic_reject') == MAX_MESSAGES
+assert client.produce(b'late', 'topic_reject').success
+assert client.usage().data['topics']['topic_reject']['messages'] == 1
+
+# block: held back until every reader catches up, refused if they do not in time
+started_at = time.perf_counter()
+response = client.produce(b'late', 'topic_block')
+assert not response.success and time.perf_counter() - started_at >= 2., response
+
+
+def catch_up_later():
+    time.sleep(.5)
+    with NioFluxMQClient(host='127.0.0.1', port=server.port) as reader:
+        for consumer in ('member', 'consumer_idle'):
+            reader.consume_batch(consumer, 'topic_block', MAX_MESSAGES, advance=True)
+
+
+threading.Thread(target=catch_up_later).start()
+started_at = time.perf_counter()
+assert client.produce(b'late', 'topic_block').success
+assert .5 <= time.perf_counter() - started_at < 2.
+
+# drop_oldest: what every reader has read is released first, then every reader is moved past
+# the messages dropped to make room
+assert catch_up('member', 'topic_drop', 5) == 5
+assert catch_up('consumer_idle', 'topic_drop', 5) == 5
+assert client.produce_batch([b'message_%d' % i for i in range(MAX_MESSAGES, MAX_MESSAGES + 10)], 'topic_drop').success
+usage = client.usage().data['topics']['topic_drop']
+assert usage['messages'] == MAX_MESSAGES and usage['dropped'] == 5, usage
+for consumer in ('member', 'consumer_idle'):
+    messages = client.consume_batch(consumer, 'topic_drop', MAX_MESSAGES * 2).data
+    assert [message.payload for message in messages] == [b'message_%d' % i for i in range(10, MAX_MESSAGES + 10)]
+client.close()
+
+# rate limits: payloads cost their UTF-8 bytes whatever the codec, a produce over the burst is refused outright
+server = NioFluxMQServer(host='127.0.0.1', port=random_port(), rate_limit=100, byte_rate_limit=1000)
+threading.Thread(target=server.run, daemon=True).start()
+time.sleep(.5)
+client = NioFluxMQClient(host='127.0.0.1', port=server.port, pool_size=1, codec=JsonCodec())
+client.register_topic('topic_0')
+response = client.produce_batch([b'message'] * 101, 'topic_0')
+assert not response.success and 'exceeds the burst' in response.err[0], response
+response = client.produce('é'.encode('utf-8') * 600, 'topic_0')
+assert not response.success and '1200 bytes' in response.err[0], response
+assert client.produce('é'.encode('utf-8') * 400, 'topic_0').success
+client.close()
+print('quota ok')
+os._exit(0)
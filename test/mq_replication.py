@@ -0,0 +1,92 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from nioflux.util.transport_layer import random_port
+
+from nioflux_mq.client.client import NioFluxMQClient
+
+
+def start(port: int, directory: str, *args: str) -> subprocess.Popen:
+    # every server keeps its snapshots and write-ahead log apart
+    return subprocess.Popen([sys.executable, '-m', 'nioflux_mq.server', '--host', '127.0.0.1', '--port', str(port),
+                             '--wal-fsync', 'group', *args], env={**os.environ, 'MQ_SNAPSHOT_DIR': directory},
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until(check, timeout: float = 10.):
+    deadline = time.perf_counter() + timeout
+    while not check():
+        assert time.perf_counter() < deadline, 'timed out'
+        time.sleep(.05)
+
+
+def payloads(client: NioFluxMQClient, consumer: str, topic: str) -> list[bytes]:
+    response = client.consume_batch(consumer, topic, n=1000)
+    return [message.payload for message in response.data] if response.success else []
+
+
+with tempfile.TemporaryDirectory() as _dir:
+    leader_port, follower_port = random_port(), random_port()
+    processes = [start(leader_port, os.path.join(_dir, 'leader'), '--replication'),
+                 start(follower_port, os.path.join(_dir, 'follower'), '--follow', f'127.0.0.1:{leader_port}')]
+    try:
+        time.sleep(1.5)
+        leader = NioFluxMQClient(host='127.0.0.1', port=leader_port)
+        follower = NioFluxMQClient(host='127.0.0.1', port=follower_port)
+        leader.register_topic('topic_0', partitions=2)
+        leader.register_consumer('consumer_0')
+        leader.produce_batch([f'message_{i}'.encode() for i in range(100)], 'topic_0', key='k')
+        # caught up from a snapshot, or from the records, whichever came first
+        wait_until(lambda: len(payloads(follower, 'consumer_0', 'topic_0')) == 100)
+        # then streamed
+        leader.register_topic('topic_1')
+        leader.produce_batch([f'message_{i}'.encode() for i in range(100, 200)], 'topic_0', key='k')
+        leader.consume_batch('consumer_0', 'topic_0', n=50, advance=True)
+        leader.produce(b'broadcast')
+        wait_until(lambda: 'topic_1' in follower.topics.data and
+                   payloads(follower, 'consumer_0', 'topic_0') == payloads(leader, 'consumer_0', 'topic_0'))
+        assert b'broadcast' in payloads(follower, 'consumer_0', 'topic_0')
+        wait_until(lambda: leader.stats().data['replication']['followers'] and all(
+            lag['records'] == 0 for lag in leader.stats().data['replication']['followers'].values()))
+        print(f'follower stats {follower.stats().data["follower"]}')
+        print(f'leader replication {leader.stats().data["replication"]}')
+
+        # a follower serves reads only
+        assert not follower.produce(b'rejected', 'topic_0').success
+        assert not follower.poll('consumer_0', 'topic_0').success
+
+        # until promoted
+        assert follower.promote().data is True
+        assert follower.produce(b'promoted', 'topic_1').success
+        assert payloads(follower, 'consumer_0', 'topic_1') == [b'broadcast', b'promoted']
+        leader.close()
+        follower.close()
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    # acknowledged by the follower: a produce returns once the follower has it
+    leader_port, follower_port = random_port(), random_port()
+    processes = [start(leader_port, os.path.join(_dir, 'leader_acked'), '--replication',
+                       '--replication-ack', 'follower'),
+                 start(follower_port, os.path.join(_dir, 'follower_acked'), '--follow', f'127.0.0.1:{leader_port}')]
+    try:
+        time.sleep(1.5)
+        leader = NioFluxMQClient(host='127.0.0.1', port=leader_port)
+        follower = NioFluxMQClient(host='127.0.0.1', port=follower_port)
+        assert leader.register_topic('topic_0').success
+        assert leader.register_consumer('consumer_0').success
+        for i in range(20):
+            assert leader.produce(f'message_{i}'.encode(), 'topic_0').success
+            assert payloads(follower, 'consumer_0', 'topic_0')[-1] == f'message_{i}'.encode()
+        print('20 produces acknowledged by the follower')
+        leader.close()
+        follower.close()
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
@@ -0,0 +1,89 @@
+import logging
+import os
+import tempfile
+import time
+
+from nioflux_mq.mq import MessageQueue
+from nioflux_mq.snapshot.write_ahead_log import WriteAheadLog
+
+logging.getLogger('nioflux.mq').setLevel(logging.CRITICAL)
+logging.getLogger('nioflux.mq.wal').setLevel(logging.CRITICAL)
+
+MESSAGES = 1000
+
+
+def read(mq: MessageQueue) -> list[int]:
+    return sorted(int(bytes(message.payload)) for message in mq.consume_batch('consumer_0', 'topic_0', MESSAGES * 2))
+
+
+with tempfile.TemporaryDirectory() as _dir:
+    os.environ['MQ_SNAPSHOT_DIR'] = _dir
+    wal_dir, snapshot_path = os.path.join(_dir, 'wal'), os.path.join(_dir, 'snapshot')
+    mq = MessageQueue(gc_interval=1 << 30, segment_size=64, wal=WriteAheadLog(directory=wal_dir, fsync='always'))
+    mq.register_topic('topic_0', partitions=2)
+    mq.register_consumer('consumer_0')
+    timestamps = [mq.produce(str(i).encode(), 'topic_0', key=str(i % 7)).timestamp for i in range(MESSAGES)]
+    middle = timestamps[MESSAGES // 2]
+    after_middle = [i for i in range(MESSAGES) if timestamps[i] >= middle]
+
+    # to a time: every partition, to its first message stamped then or later
+    mq.seek_to_time('consumer_0', 'topic_0', middle)
+    assert read(mq) == after_middle
+    mq.seek_to_time('consumer_0', 'topic_0', time.time() + 10)
+    assert read(mq) == []
+    mq.seek_to_time('consumer_0', 'topic_0', 0)
+    assert read(mq) == list(range(MESSAGES))
+
+    # to the end, and to an offset of a partition
+    mq.seek_to_end('consumer_0', 'topic_0')
+    assert read(mq) == []
+    mq.seek_to_offset('consumer_0', 'topic_0', 3, partition=1)
+    assert len(read(mq)) == len(mq.queues[[name for name in mq.queues if name != 'topic_0'][0]]) - 3
+    try:
+        mq.seek_to_offset('consumer_0', 'topic_0', 0, partition=5)
+        raise AssertionError('seeking to a missing partition')
+    except ValueError:
+        pass
+
+    # seeks are recorded, the time index is rebuilt on load
+    mq.save(snapshot_path)
+    mq.seek_to_time('consumer_0', 'topic_0', middle)
+    mq.close()
+    mq = MessageQueue(gc_interval=1 << 30, segment_size=64, wal=WriteAheadLog(directory=wal_dir, fsync='always'))
+    mq.load(snapshot_path)
+    try:
+        assert read(mq) == after_middle
+        mq.seek_to_end('consumer_0', 'topic_0')
+        mq.seek_to_time('consumer_0', 'topic_0', middle)
+        assert read(mq) == after_middle
+    finally:
+        mq.close()
+
+    # advancing past the end of a topic receiving broadcasts stops there, whether caught up with them or not
+    mq = MessageQueue(gc_interval=1 << 30, segment_size=64)
+    try:
+        mq.register_topic('topic_0')
+        mq.register_consumer('consumer_0')
+        mq.produce(b'message_0', 'topic_0')
+        mq.produce(b'broadcast_0')
+        assert [message.payload for message in mq.consume_batch('consumer_0', 'topic_0', 5, advance=True)] == [
+            b'message_0', b'broadcast_0']
+        mq.advance('consumer_0', 'topic_0', n=5)
+        mq.produce(b'broadcast_1')
+        mq.produce(b'message_1', 'topic_0')
+        assert [message.payload for message in mq.consume_batch('consumer_0', 'topic_0', 5)] == [
+            b'broadcast_1', b'message_1']
+        mq.advance('consumer_0', 'topic_0', n=5)
+        mq.produce(b'message_2', 'topic_0')
+        mq.produce(b'broadcast_2')
+        assert [message.payload for message in mq.consume_batch('consumer_0', 'topic_0', 5)] == [
+            b'message_2', b'broadcast_2']
+        # without broadcasts, the offset moves past the end and skips what arrives up to it
+        mq.register_topic('topic_1')
+        mq.produce(b'message_0', 'topic_1')
+        mq.advance('consumer_0', 'topic_1', n=3)
+        mq.produce_batch([b'message_%d' % i for i in range(1, 5)], 'topic_1')
+        assert mq.consume('consumer_0', 'topic_1').payload == b'message_3'
+    finally:
+        mq.close()
+print('seek ok')
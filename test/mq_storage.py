@@ -0,0 +1,42 @@
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+
+from nioflux_mq.mq import MessageQueue
+
+logging.getLogger('nioflux.mq').setLevel(logging.CRITICAL)
+
+MESSAGES = 200
+
+with tempfile.TemporaryDirectory() as _dir:
+    os.environ['MQ_SNAPSHOT_DIR'] = _dir
+    topic_dir = os.path.join(_dir, 'segments', 'topic_0'.encode('utf-8').hex())
+    # segment files of a process gone without cleaning up after itself
+    subprocess.run([sys.executable, '-c', 'import os\n'
+                    'from nioflux_mq.mq import MessageQueue\n'
+                    'mq = MessageQueue(gc_interval=1 << 30, storage="mmap")\n'
+                    'mq.register_topic("topic_0")\n'
+                    'mq.produce(b"message", "topic_0")\n'
+                    'os._exit(0)'], env=os.environ, check=True)
+    stale = set(name for name in os.listdir(topic_dir) if os.path.isdir(os.path.join(topic_dir, name)))
+    assert len(stale) == 1, stale
+
+    mq = MessageQueue(gc_interval=1 << 30, storage='mmap', segment_size=16, max_maps=2)
+    mq.register_topic('topic_0')
+    mq.register_consumer('consumer_0')
+    mq.produce_batch([b'message_%d' % i for i in range(MESSAGES)], 'topic_0')
+    assert stale.isdisjoint(os.listdir(topic_dir)), os.listdir(topic_dir)
+
+    # loading a snapshot builds logs alongside the live ones, whose segment files stay readable
+    path = os.path.join(_dir, 'snapshot')
+    mq.save(path)
+    loaded = MessageQueue(gc_interval=1 << 30, storage='mmap', segment_size=16, max_maps=2)
+    loaded.load(path)
+    for _mq in (mq, loaded):
+        messages = _mq.consume_batch('consumer_0', 'topic_0', MESSAGES)
+        assert [bytes(message.payload) for message in messages] == [b'message_%d' % i for i in range(MESSAGES)]
+    mq.close()
+    loaded.close()
+print('storage ok')